@@ -0,0 +1,149 @@
+""" Capture log index.
+Memory maps a device capture log, and finds offsets of all command sections ( # Output For command: <cmd> )
+in a single pass. Output of any command is then served from its offsets, without re-reading/scanning the file.
+Shared by capture (resume, validations) and compare tool (a log rebuilt from capture store can be indexed as well).
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from collections import OrderedDict
+import locale
+import mmap
+import io
+import re
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+SECTION_HEADER = b"# Output For command: "
+SECTION_START = (b"\n# " + b"="*80 + b"\n", b"\r\n# " + b"="*80 + b"\r\n")     ## blank and separator lines before header (belong to next section)
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# first of captured commands (in capture order) starting with given command, None if none.
+# (capture headers are matched by prefix, ex: `show version` finds `show version | no-more`)
+def find_command(captured_cmds, cmd):
+	return next((_cmd for _cmd in captured_cmds if _cmd.startswith(cmd)), None)
+
+# reads a capture log line into `keyed` lines ({ key: lines }) as compare tool does, line is checked against each of `cmds`:
+# a command in line (substring) starts its key, else " show " in line (section header, echoed command) starts key
+# "show <rest of line>", else line is added to current key lines. returns current key lines.
+def read_keyed_line(keyed, lines, line, cmds):
+	for cmd in cmds:
+		if cmd in line:
+			lines = keyed[cmd] = []
+		elif " show " in line:
+			lines = keyed[f"show {line.split(' show ')[-1].rstrip()}"] = []
+		elif lines is not None:
+			lines.append(line)
+	return lines
+
+# ----------------------------------------------------------------------------------------
+#  Capture Log Index class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureLogIndex():
+	file: str = None
+	encoding: str = None                          # capture file encoding, defaults to locale encoding (as files are written)
+	data: bytes = None                            # capture log content, indexed instead of file (ex: log rebuilt from capture store)
+
+	def __post_init__(self):
+		self.encoding = self.encoding or locale.getpreferredencoding(False)
+		self.f = None
+		self.mm = None
+		self.sections = OrderedDict()             ## { cmd: [ (start, end), ..] }, offsets of output of each occurrence of cmd
+		self.build()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	# single pass over mapped file (or data), records output offsets of each command section
+	def build(self):
+		if self.data is not None:
+			self.mm = self.data
+		else:
+			self.f = open(self.file, 'rb')
+			try:
+				self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+			except ValueError:                    ## empty file, cannot be mapped
+				return
+		mm, size = self.mm, len(self.mm)
+		last_cmd, pos = None, mm.find(SECTION_HEADER)
+		while pos != -1:
+			if pos == 0 or mm[pos-1] == 10:       ## header at line start only
+				line_end = mm.find(b"\n", pos)
+				if line_end == -1: line_end = size
+				if last_cmd is not None: self.sections[last_cmd][-1][1] = self.section_end(pos)
+				last_cmd = mm[pos+len(SECTION_HEADER):line_end].decode(self.encoding, errors='replace').rstrip("\r")
+				self.sections.setdefault(last_cmd, []).append([min(line_end+1, size), size])
+				pos = line_end
+			pos = mm.find(SECTION_HEADER, pos+1)
+
+	# end of previous section, before the blank and separator lines leading header at `pos`
+	def section_end(self, pos):
+		for start in SECTION_START:
+			if pos >= len(start) and self.mm[pos-len(start):pos] == start: return pos-len(start)
+		return pos
+
+	def close(self):
+		if isinstance(self.mm, mmap.mmap): self.mm.close()
+		if self.f: self.f.close()
+		self.mm = self.f = None
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ outputs ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def __contains__(self, cmd):
+		return cmd in self.sections
+
+	# commands found in capture, in capture order
+	def commands(self):
+		return list(self.sections.keys())
+
+	# first captured command starting with given command (see find_command)
+	def find(self, cmd):
+		return find_command(self.sections, cmd)
+
+	# output lines of command as in capture file (separator lines included), [] if command not found.
+	# `occurrence` selects among multiple captures of same command ( 0: first, -1: last )
+	def get_lines(self, cmd, occurrence=0):
+		if cmd not in self.sections or not self.mm: return []
+		start, end = self.sections[cmd][occurrence]
+		text = self.mm[start:end].decode(self.encoding, errors='replace')
+		return io.StringIO(text, newline=None).readlines()
+
+	# output text of command as it was captured (separator lines excluded)
+	def get_text(self, cmd, occurrence=0):
+		lines = self.get_lines(cmd, occurrence)
+		if lines and lines[0].startswith("# ="): lines = lines[1:]
+		return "".join(lines).strip("\n")
+
+	# { key: lines } of capture as compare tool reads it, header and output lines read by read_keyed_line()
+	# (lines of a section not starting a key belong to last key, a later key replaces earlier same key).
+	# lines are pre-filtered by a single pattern of all keys, only candidate lines are checked against each command
+	# (other lines are added to current key once).
+	def keyed_lines(self, cmds):
+		keyed, lines = OrderedDict(), None
+		candidate = re.compile("|".join([ re.escape(" show ") ] + [ re.escape(cmd) for cmd in cmds ]))
+		offsets = sorted([ (start, end, cmd) for cmd, occurrences in self.sections.items() for start, end in occurrences ])
+		for start, end, cmd in offsets:
+			text = self.mm[start:end].decode(self.encoding, errors='replace')
+			for line in [ f"{SECTION_HEADER.decode()}{cmd}\n" ] + io.StringIO(text, newline=None).readlines():
+				if candidate.search(line):
+					lines = read_keyed_line(keyed, lines, line, cmds)
+				elif lines is not None:
+					lines.append(line)
+		return keyed
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
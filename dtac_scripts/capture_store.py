@@ -0,0 +1,165 @@
+""" Capture store.
+Optional SQLite store of a capture run ( capture-store.sqlite in run folder ), a row per (device, hop, mode, command)
+with its output, timing, retries and status. Hop/mode section headers of capture log are rows with status 'Section'. Written by FlexLogin as commands finish, from all capture threads
+(WAL mode, a connection per thread). Validators, reports and compare tool query outputs from it instead of re-reading logs.
+Shared by flexpro_pre_capture and compare_json_pre_capture, along with the capture log section format.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from collections import OrderedDict
+from pathlib import Path
+import threading
+import sqlite3
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+STORE_FILE = 'capture-store.sqlite'
+BUSY_TIMEOUT = 30                                 ## seconds, a writer waits for lock held by other thread
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_outputs (
+	device      TEXT NOT NULL,
+	hop         TEXT NOT NULL,
+	mode        TEXT NOT NULL,
+	command     TEXT NOT NULL,
+	output      TEXT,
+	status      TEXT NOT NULL,
+	retries     INTEGER NOT NULL DEFAULT 0,
+	start_time  REAL,
+	duration    REAL,
+	PRIMARY KEY (device, hop, mode, command)
+)
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# command and its output, as written in device capture log
+def cmd_output_text(cmd, output):
+	dbl_line = f"# {'='*80}\n"
+	return f"\n{dbl_line}# Output For command: {cmd}\n{dbl_line}\n{output}\n"
+
+# command outputs ([ (cmd, output), ] in capture order) as lines of a device capture log
+def capture_lines(outputs):
+	return capture_text(outputs).splitlines(keepends=True)
+
+# capture log text of [ (cmd, output), ] (ex: device_log of store)
+def capture_text(outputs):
+	return "".join([ cmd_output_text(cmd, output) for cmd, output in outputs ])
+
+# output lines of a command, as read from its capture log section (separator lines included). [] if not captured
+def output_lines(cmd, output):
+	if output is None: return []
+	return capture_lines([(cmd, output)])[3:]
+
+# ----------------------------------------------------------------------------------------
+#  Capture Store class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureStore():
+	file: str
+	timeout: float = BUSY_TIMEOUT
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.local = threading.local()            ## connection of each thread
+		self.connections = []
+		Path(self.file).parent.mkdir(parents=True, exist_ok=True)
+		with self.connect() as conn:
+			conn.execute(SCHEMA)
+
+	# connection of calling thread (opened on first use)
+	def connect(self):
+		conn = getattr(self.local, 'conn', None)
+		if conn: return conn
+		conn = sqlite3.connect(self.file, timeout=self.timeout, check_same_thread=False)
+		conn.execute("PRAGMA journal_mode=WAL")
+		conn.execute("PRAGMA synchronous=NORMAL")
+		self.local.conn = conn
+		with self.lock:
+			self.connections.append(conn)
+		return conn
+
+	# closes connection of calling thread (ex: device thread, at end of its capture), reopened on next use
+	def disconnect(self):
+		conn = getattr(self.local, 'conn', None)
+		if not conn: return
+		self.local.conn = None
+		with self.lock:
+			if conn in self.connections: self.connections.remove(conn)
+		conn.close()
+
+	# closes connections of all threads (reopened on next use)
+	def close(self):
+		with self.lock:
+			connections, self.connections = self.connections, []
+			self.local = threading.local()
+		for conn in connections:
+			conn.close()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ writes ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# command result, replaces earlier result of same device/hop/mode/command (ex: retried device)
+	def record(self, device, hop, mode, command, output, status, retries=0, start_time=None, duration=None):
+		with self.connect() as conn:
+			conn.execute(
+				"INSERT OR REPLACE INTO command_outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+				(device, hop, mode, command, output, status, retries, start_time, duration),
+			)
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ queries ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def query(self, sql, params=()):
+		return self.connect().execute(sql, params).fetchall()
+
+	def devices(self):
+		return [ row[0] for row in self.query("SELECT DISTINCT device FROM command_outputs ORDER BY device") ]
+
+	# output of a succeeded command of device (first captured, if in multiple hops), None if not captured
+	def get_output(self, device, cmd):
+		rows = self.query(
+			"SELECT output FROM command_outputs WHERE device=? AND command=? AND status='Success' ORDER BY start_time, rowid LIMIT 1",
+			(device, cmd),
+		)
+		return rows[0][0] if rows else None
+
+	# { cmd: output } of succeeded commands of device, in capture order
+	def device_outputs(self, device):
+		rows = self.query(
+			"SELECT command, output FROM command_outputs WHERE device=? AND status='Success' ORDER BY start_time, rowid",
+			(device,),
+		)
+		return OrderedDict(rows)
+
+	# [ (cmd, output), ] of device sections and succeeded commands, in capture log order. sections ordered by
+	# their record time (parallel hop sections are recorded at merge), commands follow section of their hop/mode
+	def device_log(self, device):
+		return self.query(
+			"SELECT command, output FROM command_outputs o WHERE device=? AND status IN ('Section', 'Success') "
+			"ORDER BY (SELECT MIN(s.start_time) FROM command_outputs s WHERE s.device=o.device AND s.hop=o.hop AND s.mode=o.mode AND s.status='Section'), "
+			"status != 'Section', start_time, rowid",
+			(device,),
+		)
+
+	# { cmd: status } of all commands of device
+	def command_exec_summary(self, device):
+		rows = self.query("SELECT command, status FROM command_outputs WHERE device=? AND status != 'Section' ORDER BY start_time, rowid", (device,))
+		return OrderedDict(rows)
+
+	# rows of device as dictionaries (all columns)
+	def device_rows(self, device):
+		conn = self.connect()
+		cursor = conn.execute("SELECT * FROM command_outputs WHERE device=? ORDER BY start_time, rowid", (device,))
+		cols = [ col[0] for col in cursor.description ]
+		return [ dict(zip(cols, row)) for row in cursor.fetchall() ]
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
@@ -6,6 +6,9 @@ from collections import OrderedDict
 from dataclasses import dataclass, field
 from pathlib import Path
 
+from ..capture_store import CaptureStore, STORE_FILE, capture_text
+from ..capture_index import CaptureLogIndex
+
 # ----------------------------------------------------------------------------------------
 #  LOCAL FUNCTIONS
 # ----------------------------------------------------------------------------------------
@@ -25,13 +28,22 @@ class DevicesPara():
 
 	def get_log_files_objs(self):
 		self.Devices = {}
+		stores = {}
 		for file in self.log_files:
 			p = Path(file)
 			host = p.stem.split("_")[0]
 			DP = DevPara(file)
+			DP.capture_store = self.get_capture_store(p.parent, stores)
 			DP()
 			self.Devices[host] = DP
 
+	# capture store of run folder (if captured with store), one per folder
+	def get_capture_store(self, folder, stores):
+		if folder not in stores:
+			store_file = folder.joinpath(STORE_FILE)
+			stores[folder] = CaptureStore(str(store_file)) if store_file.exists() else None
+		return stores[folder]
+
 
 # ----------------------------------------------------------------------------------------
 #  DEVICE CAPTURE PARAMETERS READ
@@ -65,12 +77,14 @@ class DevPara():
 
 	def __post_init__(self):
 		self.commands_list_dict = OrderedDict()
+		self.capture_store = None          ## CaptureStore of capture run, outputs are read from it instead of log file (if device found in it)
 		# junos image file to be check in outputs - for availability and integrity
 		# ----- change it to S2.8 if checking for 2.8
 		self.junos_image = "jinstall-host-nfx-3-x86-64-22.4R2-S2.6-secure-signed.tgz"
 
 	def __call__(self):
-		self.get_commands_list_dict(self.read_logfile())
+		if not self.get_commands_list_dict_from_store():
+			self.get_commands_list_dict(CaptureLogIndex(self.log_file))
 		#
 		self.model = self.get_model()
 		self.serial = self.get_serial()
@@ -81,26 +95,20 @@ class DevPara():
 		self.interfaces_status = self.get_interfaces()      # seq 1
 		self.add_ints_para()                                # seq 2
 
-	# reads log file and returns its content in list format
-	def read_logfile(self):
-		with open(self.log_file, 'r') as f:
-			lines = f.readlines()
-		return lines
-
 	# store the output of defined commands in dictionary format, stores to self.commands_list_dict
-	def get_commands_list_dict(self, lines):
-		d = None
-		for line in lines:
-			for cmd in self.captured_cmds:
-				if line.find(cmd) > -1:
-					self.commands_list_dict[cmd] = []
-					d = self.commands_list_dict[cmd]
-				elif " show " in line:
-					cmd = f"show {line.split(' show ')[-1].rstrip()}"
-					self.commands_list_dict[cmd] = []
-					d = self.commands_list_dict[cmd]
-				elif d is not None:
-					d.append(line)
+	# (keyed by captured commands found in lines, or by "show .." of lines with a show command, see CaptureLogIndex.keyed_lines)
+	def get_commands_list_dict(self, index):
+		with index:
+			self.commands_list_dict = index.keyed_lines(self.captured_cmds)
+
+	# store the output of captured commands from capture store, to self.commands_list_dict
+	# (outputs are read as lines of a capture log, same as from log file). returns False if device not found in store
+	def get_commands_list_dict_from_store(self):
+		if not self.capture_store: return False
+		outputs = self.capture_store.device_log(Path(self.log_file).stem)
+		if not outputs: return False
+		self.get_commands_list_dict(CaptureLogIndex(data=capture_text(outputs).encode('utf-8'), encoding='utf-8'))
+		return True
 
 	# --------------------- [ system parameters extraction ] --------------------- #
 
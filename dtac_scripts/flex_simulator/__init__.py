@@ -0,0 +1,3 @@
+from .inventory import SimulatedInventory, SimDevice
+from .outputs import OutputProvider, load_recorded_outputs
+from .server import FlexSimulator, SimulatorConfig
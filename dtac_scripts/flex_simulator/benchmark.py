@@ -0,0 +1,355 @@
+""" Capture pipeline benchmark.
+Runs the complete capture flow (action_info, device captures, validations, reports) against flex simulator
+for fleets of given sizes. Reports devices per minute, p50/p95 device capture time, time of each stage and peak RSS.
+Results are compared with stored baseline, run fails if any of them regressed beyond tolerance.
+
+Note: baseline is machine specific, (re)create it on the machine benchmarks are compared on ( --update-baseline ).
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from pathlib import Path
+from time import time
+import argparse
+import contextlib
+import json
+import multiprocessing
+import sys
+import tempfile
+import threading
+try:
+	import resource                               ## not available on Windows, peak RSS is not reported there
+except ImportError:
+	resource = None
+
+import paramiko
+
+from .inventory import SimulatedInventory
+from .server import FlexSimulator, SimulatorConfig
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+FLEET_SIZES = (10, 100, 1000)
+BASELINE_FILE = Path(__file__).parent.joinpath('benchmark_baseline.json')
+DEFAULT_POLLERS = ['127.0.0.11', '127.0.0.12']
+DEFAULT_TOLERANCE = 0.25                          ## 25% worse than baseline is a regression
+
+## compared metrics, and minimum absolute change considered as regression (ignores noise of tiny values)
+METRICS_MIN_DELTA = {
+	'devices_per_minute': 1.0,
+	'device_p50_s': 0.5,
+	'device_p95_s': 0.5,
+	'action_info_s': 1.0,
+	'capture_s': 1.0,
+	'validation_s': 0.5,
+	'reports_s': 0.5,
+	'peak_rss_mb': 16,
+}
+HIGHER_IS_BETTER = {'devices_per_minute'}
+
+## benchmark commands, in format of pull_cmds_lists_dict
+BENCHMARK_COMMANDS = {
+	'JDM': {
+		'shell': ['virsh list', 'ifconfig'],
+		'cli': ['show version local', 'show chassis hardware'],
+	},
+	'JCP': {
+		'cli': ['show version', 'show interfaces terse | no-more', 'show lldp neighbors | no-more']
+			+ [ f'show configuration interfaces ge-0/0/{n} | display set' for n in range(12) ],
+	},
+	'NMTE': {
+		'cli': ['show version'],
+	},
+	'VRT': {
+		'shell': ['ifconfig', 'uptime'],
+	},
+}
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+def percentile(values, pct):
+	if not values: return 0.0
+	values = sorted(values)
+	k = (len(values) - 1) * pct / 100
+	f = int(k)
+	c = min(f + 1, len(values) - 1)
+	return values[f] + (values[c] - values[f]) * (k - f)
+
+# peak resident memory of current process, MB (None if not available)
+def peak_rss_mb():
+	if not resource: return None
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+# runs simulator until stop event is set (simulator process), ready event is set once listening
+def serve_simulator(pollers, devices, ready_event, stop_event, login_timeout_rate=0.0):
+	config = SimulatorConfig(pollers=pollers, login_timeout_rate=login_timeout_rate, seed=1)
+	simulator = FlexSimulator(inventory=SimulatedInventory(count=devices), config=config)
+	simulator.start()
+	ready_event.set()
+	stop_event.wait()
+	simulator.stop()
+
+# ----------------------------------------------------------------------------------------
+#  Timed capture (FlxConnectCapture recording device and validation times)
+# ----------------------------------------------------------------------------------------
+def benchmark_capture_class():
+	from dtac_scripts.flexpro_pre_capture.flex_connect import FlxConnectCapture
+
+	class BenchmarkCapture(FlxConnectCapture):
+
+		def __init__(self, AP):
+			super().__init__(AP)
+			self.lock = threading.Lock()
+			self.device_times = {}
+			self.device_attempts = {}
+			self.validation_time = 0.0
+
+		def execute(self, action_device_info):
+			device = action_device_info['device']
+			self.device_attempts[device] = self.device_attempts.get(device, 0) + 1
+			start = time()
+			try:
+				super().execute(action_device_info)
+			finally:
+				self.device_times[action_device_info['device']] = time() - start
+
+		def update_device_reports(self, device, output_file, captures_report_dict, outputs=None):
+			start = time()
+			try:
+				return super().update_device_reports(device, output_file, captures_report_dict, outputs)
+			finally:
+				self.add_validation_time(time() - start)
+
+		def add_validation_time(self, duration):
+			with self.lock:
+				self.validation_time += duration
+
+	return BenchmarkCapture
+
+# ----------------------------------------------------------------------------------------
+#  Fleet run (a child process per fleet size, peak RSS is of that run only)
+# ----------------------------------------------------------------------------------------
+def run_fleet(size, pollers, workdir, options):
+	from dtac_scripts.flexpro_pre_capture import ActionPollers, CaptureTracer
+	from dtac_scripts.flexpro_pre_capture.tracing import TRACE_FILE
+	from dtac_scripts.capture_store import CaptureStore, STORE_FILE
+	BenchmarkCapture = benchmark_capture_class()
+	#
+	key_file = str(Path(workdir).joinpath('key'))
+	if not Path(key_file).exists(): paramiko.RSAKey.generate(1024).write_private_key_file(key_file)
+	output_path = str(Path(workdir).joinpath(f'fleet-{size}'))
+	devices = SimulatedInventory(count=size).names
+	dyn_vars = {
+		'attuid': 'benchmark', 'key_file_1024bit': key_file, 'username': 'root',
+		'jdm_pw': 'benchmark', 'jcp_pw': 'benchmark', 'nm_te_pw': 'benchmark', 'vrt_un': 'root', 'vrt_pw': 'benchmark',
+	}
+	#
+	tracer = CaptureTracer() if options['trace'] else None
+	stages = {}
+	start = time()
+	AP = ActionPollers(devices=devices, servers_list=pollers, server_auth_user=dyn_vars['attuid'], server_auth_psk=key_file)
+	AP.sessions_per_poller = options['sessions_per_poller']
+	AP.tracer = tracer
+	AP()
+	AP.exit()
+	stages['action_info_s'] = time() - start
+	#
+	FCC = BenchmarkCapture(AP)
+	FCC.dyn_vars = dyn_vars
+	FCC.commands = BENCHMARK_COMMANDS
+	FCC.output_path = output_path
+	FCC.output_csv_report_file = f"{output_path}/capture-summary.csv"
+	FCC.output_intf_summary_report_file = f"{output_path}/interface-summary.xlsx"
+	FCC.output_cmds_exec_summary_report_file = f"{output_path}/commands-exec-summary.xlsx"
+	FCC.max_connections = options['max_connections']
+	FCC.pipeline_commands = options['pipeline_commands']
+	FCC.parallel_hops = options['parallel_hops']
+	FCC.retry_budget = options['retry_budget']
+	FCC.retry_backoff = 1
+	FCC.tracer = tracer
+	if options['capture_store']: FCC.capture_store = CaptureStore(f"{output_path}/{STORE_FILE}")
+	capture_start = time()
+	FCC()
+	stages['capture_s'] = time() - capture_start
+	stages['validation_s'] = FCC.validation_time
+	#
+	reports_start = time()
+	FCC.reports_gen()
+	stages['reports_s'] = time() - reports_start
+	total = time() - start
+	if tracer: tracer.export(f"{output_path}/{TRACE_FILE}")
+	#
+	device_times = list(FCC.device_times.values())
+	succeeded = sum(1 for report in FCC.devices_reports.values() if report.get('Status') == 'Success')
+	result = {
+		'devices': size,
+		'succeeded': succeeded,
+		'retried': sum(1 for attempts in FCC.device_attempts.values() if attempts > 1),
+		'total_s': total,
+		'devices_per_minute': succeeded / total * 60 if total else 0.0,
+		'device_p50_s': percentile(device_times, 50),
+		'device_p95_s': percentile(device_times, 95),
+		'peak_rss_mb': peak_rss_mb(),
+	}
+	result.update(stages)
+	return { k: round(v, 3) if isinstance(v, float) else v for k, v in result.items() }
+
+def _run_fleet_child(size, pollers, workdir, options, queue):
+	try:
+		with open(Path(workdir).joinpath(f'fleet-{size}.log'), 'w') as f, contextlib.redirect_stdout(f):
+			result = run_fleet(size, pollers, workdir, options)
+	except Exception as e:
+		result = {'devices': size, 'error': repr(e)}
+	queue.put(result)
+
+def run_fleet_isolated(size, pollers, workdir, options):
+	ctx = multiprocessing.get_context('spawn')
+	queue = ctx.Queue()
+	process = ctx.Process(target=_run_fleet_child, args=(size, pollers, workdir, options, queue))
+	process.start()
+	while True:
+		try:
+			result = queue.get(timeout=5)
+			break
+		except Exception:
+			if process.is_alive(): continue
+			result = {'devices': size, 'error': f"benchmark process exited with code {process.exitcode}"}
+			break
+	process.join()
+	return result
+
+# ----------------------------------------------------------------------------------------
+#  Baseline comparison
+# ----------------------------------------------------------------------------------------
+
+# returns list of regression messages of results against baseline (results/baseline: { fleet size: result })
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+	regressions = []
+	for size, result in results.items():
+		base = baseline.get(str(size))
+		if not base: continue
+		if result.get('error'):
+			regressions.append(f"fleet {size}: run failed, {result['error']}")
+			continue
+		if result['succeeded'] < base.get('succeeded', 0):
+			regressions.append(f"fleet {size}: succeeded devices {result['succeeded']} < baseline {base['succeeded']}")
+		for metric, min_delta in METRICS_MIN_DELTA.items():
+			value, base_value = result.get(metric), base.get(metric)
+			if value is None or base_value is None: continue
+			if metric in HIGHER_IS_BETTER:
+				regressed = value < base_value * (1 - tolerance) and base_value - value > min_delta
+			else:
+				regressed = value > base_value * (1 + tolerance) and value - base_value > min_delta
+			if regressed:
+				regressions.append(f"fleet {size}: {metric} {value} vs baseline {base_value}")
+	return regressions
+
+# devices with timed out logins are expected to be retried and captured (exits on failure)
+def check_login_timeouts_retried(results, retry_budget):
+	failures = []
+	for size, result in results.items():
+		if result.get('error'): continue
+		if not result['retried']:
+			failures.append(f"fleet {size}: no device retried")
+		elif retry_budget and result['succeeded'] < result['devices']:
+			failures.append(f"fleet {size}: {result['devices'] - result['succeeded']} device(s) not captured after retries")
+	for failure in failures:
+		print(f"[-] Login timeouts: {failure}")
+	if failures: sys.exit(1)
+	print(f"[+] Login timeouts retried")
+
+def load_baseline(baseline_file):
+	if not Path(baseline_file).exists(): return {}
+	with open(baseline_file, 'r') as f:
+		return json.load(f)
+
+def save_baseline(baseline_file, results, baseline=None):
+	baseline = dict(baseline or {})
+	baseline.update({ str(size): result for size, result in results.items() if not result.get('error') })
+	with open(baseline_file, 'w') as f:
+		json.dump(baseline, f, indent=2, sort_keys=True)
+
+def print_results(results):
+	cols = ['devices', 'succeeded', 'retried', 'devices_per_minute', 'device_p50_s', 'device_p95_s',
+		'action_info_s', 'capture_s', 'validation_s', 'reports_s', 'total_s', 'peak_rss_mb']
+	print(" ".join([ f"{col:>18}" for col in cols ]))
+	for result in results.values():
+		if result.get('error'):
+			print(f"{result['devices']:>18} failed: {result['error']}")
+			continue
+		print(" ".join([ f"{str(result.get(col)):>18}" for col in cols ]))
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="dtac capture pipeline benchmark against flex simulator")
+	parser.add_argument("--sizes", nargs="+", type=int, default=list(FLEET_SIZES), help="fleet sizes to benchmark")
+	parser.add_argument("--pollers", nargs="+", default=DEFAULT_POLLERS, help="simulator poller addresses (port 22)")
+	parser.add_argument("--max-connections", type=int, default=50)
+	parser.add_argument("--sessions-per-poller", type=int, default=4, help="action_info sessions per poller")
+	parser.add_argument("--pipeline-commands", action='store_true')
+	parser.add_argument("--parallel-hops", action='store_true')
+	parser.add_argument("--trace", action='store_true', help="export capture trace of each fleet (in its output folder)")
+	parser.add_argument("--capture-store", action='store_true', help="record outputs to capture store, validators read from it")
+	parser.add_argument("--login-timeout-rate", type=float, default=0.0, help="simulated device logins timing out (checks they are retried)")
+	parser.add_argument("--retry-budget", type=int, default=0, help="retry rounds for failed devices")
+	parser.add_argument("--baseline", default=str(BASELINE_FILE))
+	parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+	parser.add_argument("--update-baseline", action='store_true', help="store results as baseline instead of comparing")
+	parser.add_argument("--results", default='', help="write results to this json file")
+	parser.add_argument("--workdir", default='', help="folder for outputs and logs (temporary folder if not given)")
+	args = parser.parse_args()
+	options = {
+		'max_connections': args.max_connections, 'sessions_per_poller': args.sessions_per_poller,
+		'pipeline_commands': args.pipeline_commands, 'parallel_hops': args.parallel_hops, 'trace': args.trace,
+		'capture_store': args.capture_store, 'retry_budget': args.retry_budget,
+	}
+	workdir = args.workdir or tempfile.mkdtemp(prefix='dtac-benchmark-')
+	Path(workdir).mkdir(parents=True, exist_ok=True)
+	print(f"[+] Benchmark outputs/logs in {workdir}")
+	#
+	ctx = multiprocessing.get_context('spawn')
+	ready_event, stop_event = ctx.Event(), ctx.Event()
+	simulator = ctx.Process(target=serve_simulator, args=(args.pollers, max(args.sizes), ready_event, stop_event, args.login_timeout_rate), daemon=True)
+	simulator.start()
+	if not ready_event.wait(60):
+		print(f"[-] Simulator not listening on {args.pollers} port 22")
+		simulator.terminate()
+		sys.exit(2)
+	#
+	results = {}
+	try:
+		for size in args.sizes:
+			print(f"[+] Running fleet of {size} devices")
+			results[size] = run_fleet_isolated(size, args.pollers, workdir, options)
+	finally:
+		stop_event.set()
+		simulator.join(10)
+	print_results(results)
+	if args.login_timeout_rate:
+		check_login_timeouts_retried(results, args.retry_budget)
+	if args.results:
+		with open(args.results, 'w') as f:
+			json.dump(results, f, indent=2)
+	#
+	baseline = load_baseline(args.baseline)
+	if args.update_baseline:
+		save_baseline(args.baseline, results, baseline)
+		print(f"[+] Baseline updated {args.baseline}")
+		return
+	regressions = compare_with_baseline(results, baseline, args.tolerance)
+	if not baseline: print(f"[-] No baseline at {args.baseline}, run with --update-baseline to create one")
+	for regression in regressions:
+		print(f"[-] Regression: {regression}")
+	if regressions: sys.exit(1)
+	print(f"[+] No regressions")
+
+if __name__ == '__main__':
+	main()
+# ----------------------------------------------------------------------------------------
@@ -0,0 +1,93 @@
+""" Simulated devices inventory.
+Synthetic NFX devices (JDM) with management ips, VNFs and reachability, for the simulator.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass, field
+import random
+import zlib
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+NAME_PREFIX = 'SIMNYC'                            ## device names are 16 chars before role ( ex: SIMNYC0000001NFX + JDM01 )
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# /16 region of ipv4 address
+def ip_region(ip):
+	return ".".join(ip.split(".")[:2])
+
+# deterministic round trip time (ms) between a poller and a region, 5 to 80 ms
+def region_rtt(poller, ip):
+	return 5 + zlib.crc32(f"{poller}|{ip_region(ip)}".encode()) % 76
+
+# ----------------------------------------------------------------------------------------
+#  Simulated device
+# ----------------------------------------------------------------------------------------
+@dataclass
+class SimDevice():
+	index: int
+	jdm: str                                      # JDM hostname
+	ip: str                                       # management ip (action_info)
+	vnfs: list = field(default_factory=list)      # [ (vnf_id, vnf_name), ]
+	resolvable: bool = True                       # action_info knows device
+	reachable: bool = True                        # ping/ssh reachable
+
+	@property
+	def base(self):
+		return self.jdm[:16]
+
+	@property
+	def jzz(self):
+		return self.base + "JZZ" + self.jdm[19:]
+
+# ----------------------------------------------------------------------------------------
+#  Simulated inventory
+# ----------------------------------------------------------------------------------------
+@dataclass
+class SimulatedInventory():
+	count: int = 1000                             # number of devices
+	vnf_types: tuple = ('VRT',)                   # vnf types, cycled over vnfs of a device
+	vnfs_per_device: int = 1
+	unresolvable_ratio: float = 0.0               # devices unknown to action_info
+	unreachable_ratio: float = 0.0                # devices not responding to ping/ssh
+	seed: int = 1
+
+	def __post_init__(self):
+		rnd = random.Random(self.seed)
+		self.devices = {}                         # { jdm name: SimDevice }
+		self.by_ip = {}
+		for n in range(1, self.count+1):
+			base = f"{NAME_PREFIX}{n:07d}NFX"
+			ip = f"10.{100 + n // 65536}.{(n // 256) % 256}.{n % 256}"
+			vnfs = [ (str(k+2), f"{base}{self.vnf_types[k % len(self.vnf_types)]}{k+1:02d}") for k in range(self.vnfs_per_device) ]
+			device = SimDevice(index=n, jdm=f"{base}JDM01", ip=ip, vnfs=vnfs,
+				resolvable=rnd.random() >= self.unresolvable_ratio,
+				reachable=rnd.random() >= self.unreachable_ratio,
+			)
+			self.devices[device.jdm] = device
+			self.by_ip[ip] = device
+
+	# device by JDM/JZZ name or ip, None if unknown
+	def device(self, name):
+		name = name.strip()
+		if name in self.by_ip: return self.by_ip[name]
+		name = name.upper()
+		if name[16:19] == "JZZ": name = name[:16] + "JDM" + name[19:]
+		return self.devices.get(name)
+
+	@property
+	def names(self):
+		return list(self.devices.keys())
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
@@ -0,0 +1,117 @@
+""" Simulated command outputs.
+Recorded outputs (from an earlier dtac capture log) are replayed as is, synthetic outputs are generated otherwise.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# reads a dtac capture log (<device>.log) and returns dictionary of { command: output }
+def load_recorded_outputs(capture_file):
+	with open(capture_file, 'r') as f:
+		lines = f.read().splitlines()
+	outputs, cmd, output = {}, None, []
+	for line in lines:
+		if line.startswith("# Output For command: "):
+			if cmd: outputs[cmd] = "\n".join(output).strip("\n")
+			cmd, output = line[len("# Output For command: "):].strip(), []
+			continue
+		if line.startswith("# ====="): continue
+		if cmd: output.append(line)
+	if cmd: outputs[cmd] = "\n".join(output).strip("\n")
+	return { cmd: output for cmd, output in outputs.items() if not cmd.startswith("//") }
+
+def virsh_list(device):
+	lines = [
+		" Id    Name                           State",
+		"----------------------------------------------------",
+		" 1     vjunos0                        running",
+	]
+	lines += [ f" {vnf_id:<5} {vnf_name:<30} running" for vnf_id, vnf_name in device.vnfs ]
+	return "\n".join(lines)
+
+def ifconfig(device):
+	return (
+		"eth0      Link encap:Ethernet  HWaddr 52:54:00:00:00:01\n"
+		f"          inet addr:{device.ip}  Bcast:0.0.0.0  Mask:255.255.255.0\n"
+		"lo        Link encap:Local Loopback"
+	)
+
+def show_version(device):
+	return (
+		f"Hostname: {device.base}JCP01\n"
+		"Model: nfx250_s2_10_t\n"
+		"Junos: 18.4R1-S7.1\n"
+		"JUNOS Host Software Suite [18.4R1-S7.1]"
+	)
+
+def show_chassis_hardware(device):
+	return (
+		"Hardware inventory:\n"
+		"Item             Version  Part number  Serial number     Description\n"
+		f"Chassis                                SIM{device.index:07d}        NFX250-S2\n"
+		"Routing Engine   REV 01   650-075201   SIMRE0000001      RE-NFX250"
+	)
+
+def show_interfaces_terse(device):
+	lines = ["Interface               Admin Link Proto    Local                 Remote"]
+	lines += [ f"ge-0/0/{n:<16} up    {'up' if n in (0, 3, 8) else 'down'}" for n in range(12) ]
+	return "\n".join(lines)
+
+def show_configuration_interface(device, cmd):
+	intf = cmd.split()[3]
+	return "\n".join([
+		f"set interfaces {intf} speed 1g",
+		f"set interfaces {intf} link-mode full-duplex",
+		f"set interfaces {intf} unit 0 family ethernet-switching interface-mode trunk",
+		f"set interfaces {intf} unit 0 family ethernet-switching vlan members vlan-{100 + int(intf.split('/')[-1])}",
+	])
+
+def show_lldp_neighbors(device):
+	return (
+		"Local Interface    Parent Interface    Chassis Id          Port info          System Name\n"
+		f"ge-0/0/3           -                   00:00:5e:00:53:01   ge-0/0/3           {device.base}JSW02"
+	)
+
+def generic_output(device, hop, cmd):
+	return "\n".join([ f"{hop} {device.jdm}: simulated output of `{cmd}` line {n}" for n in range(1, 6) ])
+
+## synthetic outputs of known commands
+SYNTHETIC_OUTPUTS = {
+	'virsh list': virsh_list,
+	'ifconfig': ifconfig,
+	'show version': show_version,
+	'show version local': show_version,
+	'show chassis hardware': show_chassis_hardware,
+	'show interfaces terse | no-more': show_interfaces_terse,
+	'show lldp neighbors | no-more': show_lldp_neighbors,
+}
+
+# ----------------------------------------------------------------------------------------
+#  Output provider
+# ----------------------------------------------------------------------------------------
+@dataclass
+class OutputProvider():
+	recorded_file: str = ''                       # dtac capture log to replay outputs from (optional)
+
+	def __post_init__(self):
+		self.recorded = load_recorded_outputs(self.recorded_file) if self.recorded_file else {}
+
+	# output of command on device hop (ex: jdm-shell, jcp-cli)
+	def output(self, device, hop, cmd):
+		if cmd in self.recorded: return self.recorded[cmd]
+		if cmd in SYNTHETIC_OUTPUTS: return SYNTHETIC_OUTPUTS[cmd](device)
+		if cmd.startswith("show configuration interfaces "): return show_configuration_interface(device, cmd)
+		return generic_output(device, hop, cmd)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
@@ -0,0 +1,272 @@
+""" Flex simulator SSH server.
+Local paramiko server listening as one or more pollers. Poller shell resolves simulated devices
+(action_info), pings/probes them and logs in to JDM, and on to JCP, NMTE and VNF consoles.
+direct-tcpip channels to a device ip are served as SSH sessions to JDM (ProxyJump).
+
+Note: dtac connects pollers on port 22, use loopback addresses as poller names
+( ex: 127.0.0.11, 127.0.0.12 ) and run with privileges required to bind port 22.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass, field
+from collections import Counter
+import argparse
+import logging
+import random
+import socket
+import threading
+from time import sleep
+
+import paramiko
+
+from .inventory import SimulatedInventory, region_rtt
+from .outputs import OutputProvider
+from .sessions import SimSession
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+DEFAULT_POLLERS = ['127.0.0.11', '127.0.0.12']
+DEFAULT_PORT = 22
+LOG_CHANNEL = 'flex_simulator.transport'            ## server transports log here (client disconnects are not reported on console)
+
+logging.getLogger(LOG_CHANNEL).addHandler(logging.NullHandler())
+
+# ----------------------------------------------------------------------------------------
+#  Simulator configuration
+# ----------------------------------------------------------------------------------------
+@dataclass
+class SimulatorConfig():
+	pollers: list = field(default_factory=lambda: list(DEFAULT_POLLERS))   # listening addresses, one per poller
+	port: int = DEFAULT_PORT
+	passwords: dict = field(default_factory=dict)  # { hop: password } ( hop: poller, jdm, jcp, nmte, vrt.. ), any password accepted for missing hop
+	usernames: dict = field(default_factory=dict)  # { hop: username } checked for vnf console logins
+	command_latency: float = 0.0                  # seconds, mean delay of a command (+/- 50% jitter)
+	login_latency: float = 0.0                    # seconds, mean delay of a login
+	connect_timeout: float = 2.0                  # seconds, before an unreachable device ssh times out
+	action_info_failure_rate: float = 0.0         # action_info backend errors
+	login_failure_rate: float = 0.0               # rejected passwords on device logins
+	login_timeout_rate: float = 0.0               # device (JDM, JCP, NMTE) ssh logins hanging after password, till ^C
+	session_drop_rate: float = 0.0                # commands after which session is dropped
+	poller_refuse_rate: float = 0.0               # refused poller connections
+	host_key_prompt_rate: float = 0.0             # device ssh logins asking to confirm host key
+	seed: int = None
+
+# ----------------------------------------------------------------------------------------
+#  paramiko server interface
+# ----------------------------------------------------------------------------------------
+class SimServerInterface(paramiko.ServerInterface):
+
+	def __init__(self, simulator, poller='', device=None):
+		self.sim = simulator
+		self.poller = poller
+		self.device = device                      ## set for sessions served over direct-tcpip (JDM)
+		self.tunnels = {}                         ## { chanid: device } of accepted direct-tcpip channels
+
+	def get_allowed_auths(self, username):
+		return "publickey,password"
+
+	def check_auth_publickey(self, username, key):
+		return paramiko.AUTH_SUCCESSFUL
+
+	def check_auth_password(self, username, password):
+		hop = 'jdm' if self.device else 'poller'
+		return paramiko.AUTH_SUCCESSFUL if self.sim.password_ok(hop, password) else paramiko.AUTH_FAILED
+
+	def check_auth_none(self, username):
+		return paramiko.AUTH_FAILED
+
+	def check_channel_request(self, kind, chanid):
+		if kind == 'session': return paramiko.OPEN_SUCCEEDED
+		return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+	def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+		if self.device: return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+		device = self.sim.inventory.device(destination[0])
+		if not device or not device.reachable: return paramiko.OPEN_FAILED_CONNECT_FAILED
+		self.tunnels[chanid] = device
+		return paramiko.OPEN_SUCCEEDED
+
+	def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+		return True
+
+	def check_channel_window_change_request(self, channel, width, height, pixelwidth, pixelheight):
+		return True
+
+	def check_channel_shell_request(self, channel):
+		session = SimSession(self.sim, channel, poller=self.poller, device=self.device)
+		threading.Thread(target=session.run, daemon=True).start()
+		return True
+
+# ----------------------------------------------------------------------------------------
+#  Flex Simulator
+# ----------------------------------------------------------------------------------------
+@dataclass
+class FlexSimulator():
+	inventory: SimulatedInventory = field(default_factory=SimulatedInventory)
+	config: SimulatorConfig = field(default_factory=SimulatorConfig)
+	outputs: OutputProvider = field(default_factory=OutputProvider)
+	host_key_file: str = ''                       # server host key, generated if not given
+
+	def __post_init__(self):
+		self.host_key = paramiko.RSAKey(filename=self.host_key_file) if self.host_key_file else paramiko.RSAKey.generate(2048)
+		self.random = random.Random(self.config.seed)
+		self.lock = threading.Lock()
+		self.stats = Counter()
+		self.sockets = []
+		self.transports = []
+		self.running = False
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		self.stop()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ behaviour ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def count(self, key, n=1):
+		with self.lock:
+			self.stats[key] += n
+
+	# True with probability of configured rate ( ex: fails('login_failure_rate') )
+	def fails(self, rate_name):
+		rate = getattr(self.config, rate_name)
+		if not rate: return False
+		with self.lock:
+			failed = self.random.random() < rate
+			if failed: self.stats[rate_name.replace('_rate', '')] += 1
+		return failed
+
+	def should_drop(self):
+		return self.fails('session_drop_rate')
+
+	def password_ok(self, hop, password, username=None):
+		if hop in self.config.usernames and username is not None and username != self.config.usernames[hop]: return False
+		return hop not in self.config.passwords or self.config.passwords[hop] == password
+
+	def rtt(self, poller, ip):
+		return region_rtt(poller, ip)
+
+	def delay(self, seconds):
+		if seconds > 0: sleep(seconds)
+
+	def _jitter(self, mean):
+		if mean <= 0: return 0
+		with self.lock:
+			return mean * self.random.uniform(0.5, 1.5)
+
+	def command_delay(self):
+		self.delay(self._jitter(self.config.command_latency))
+
+	def login_delay(self):
+		self.delay(self._jitter(self.config.login_latency))
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ server ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def start(self):
+		self.running = True
+		for poller in self.config.pollers:
+			sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+			sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			sock.bind((poller, self.config.port))
+			sock.listen(1024)
+			self.sockets.append(sock)
+			threading.Thread(target=self.accept_connections, args=(sock, poller), daemon=True).start()
+
+	def stop(self):
+		self.running = False
+		for sock in self.sockets:
+			try:
+				sock.close()
+			except Exception:
+				pass
+		for transport in list(self.transports):
+			try:
+				transport.close()
+			except Exception:
+				pass
+		self.sockets, self.transports = [], []
+
+	def accept_connections(self, sock, poller):
+		while self.running:
+			try:
+				client, _ = sock.accept()
+			except OSError:
+				break
+			if self.fails('poller_refuse_rate'):
+				client.close()
+				continue
+			threading.Thread(target=self.serve, args=(client, poller), daemon=True).start()
+
+	# serves an ssh transport over `sock` (client socket, or direct-tcpip channel for device sessions)
+	def serve(self, sock, poller, device=None):
+		self.count('connections')
+		transport = paramiko.Transport(sock)
+		transport.set_log_channel(LOG_CHANNEL)
+		transport.add_server_key(self.host_key)
+		self.transports.append(transport)
+		server = SimServerInterface(self, poller=poller, device=device)
+		try:
+			transport.start_server(server=server)
+		except Exception:
+			self.transports.remove(transport)
+			return
+		while self.running and transport.is_active():
+			chan = transport.accept(1)
+			if chan is None: continue
+			tunnel_device = server.tunnels.pop(chan.get_id(), None)
+			if tunnel_device:
+				self.count('tunnels')
+				threading.Thread(target=self.serve, args=(chan, poller, tunnel_device), daemon=True).start()
+		if transport in self.transports: self.transports.remove(transport)
+
+	def report(self):
+		with self.lock:
+			return dict(self.stats)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+def main():
+	parser = argparse.ArgumentParser(description="Local SSH simulator of pollers and NFX devices, for dtac captures")
+	parser.add_argument("--pollers", nargs="+", default=DEFAULT_POLLERS, help="listening addresses, one per poller")
+	parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+	parser.add_argument("--devices", type=int, default=1000, help="number of simulated devices")
+	parser.add_argument("--vnfs", type=int, default=1, help="vnfs per device")
+	parser.add_argument("--outputs", default='', help="dtac capture log to replay command outputs from")
+	parser.add_argument("--command-latency", type=float, default=0.0)
+	parser.add_argument("--login-latency", type=float, default=0.0)
+	parser.add_argument("--unreachable", type=float, default=0.0, help="ratio of unreachable devices")
+	parser.add_argument("--unresolvable", type=float, default=0.0, help="ratio of devices unknown to action_info")
+	parser.add_argument("--action-info-failure-rate", type=float, default=0.0)
+	parser.add_argument("--login-failure-rate", type=float, default=0.0)
+	parser.add_argument("--login-timeout-rate", type=float, default=0.0)
+	parser.add_argument("--session-drop-rate", type=float, default=0.0)
+	parser.add_argument("--poller-refuse-rate", type=float, default=0.0)
+	parser.add_argument("--seed", type=int, default=None)
+	args = parser.parse_args()
+	#
+	inventory = SimulatedInventory(count=args.devices, vnfs_per_device=args.vnfs,
+		unreachable_ratio=args.unreachable, unresolvable_ratio=args.unresolvable, seed=args.seed or 1)
+	config = SimulatorConfig(pollers=args.pollers, port=args.port,
+		command_latency=args.command_latency, login_latency=args.login_latency,
+		action_info_failure_rate=args.action_info_failure_rate, login_failure_rate=args.login_failure_rate,
+		login_timeout_rate=args.login_timeout_rate, session_drop_rate=args.session_drop_rate, poller_refuse_rate=args.poller_refuse_rate, seed=args.seed)
+	simulator = FlexSimulator(inventory=inventory, config=config, outputs=OutputProvider(args.outputs))
+	simulator.start()
+	print(f"[+] Simulating {args.devices} devices on pollers {', '.join(args.pollers)} port {args.port}, Ctrl+C to stop")
+	try:
+		while True: sleep(60)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		simulator.stop()
+		print(f"[+] {simulator.report()}")
+
+if __name__ == '__main__':
+	main()
+# ----------------------------------------------------------------------------------------
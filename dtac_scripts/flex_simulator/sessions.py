@@ -0,0 +1,364 @@
+""" Simulated interactive sessions.
+Emulates a poller shell and the NFX hops behind it (JDM shell/cli, JCP, NMTE, VNF console),
+as a stack of contexts over one SSH channel.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from time import sleep
+import re
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+CTRL_C = '\x03'
+CONSOLE_ESCAPE = '\x1d'                           ## ^] detaches virsh console
+
+SSH_COMMAND = re.compile(r"^ssh\s+(?:(\S+)@)?(\S+)$")
+PROBE_COMMAND = re.compile(r"^(?:sh -c ')?for ip in (.+?); do .*ping -c (\d+)")
+PING_COMMAND = re.compile(r"^ping\s+(?:-\S+\s+)*(\S+)$")
+VIRSH_CONSOLE = re.compile(r"^virsh console (\S+)")
+
+## sub hops reachable by `ssh <name>` from JDM: { name: (hop, shell prompt, cli prompt) }
+SUB_HOPS = {
+	'vjunos0': ('jcp', 'root@vjunos0:RE:0% ', 'root@vjunos0> '),
+	'ipsec-nm': ('nmte', 'root@ipsec-nm:~# ', 'root@ipsec-nm> '),
+}
+
+# ----------------------------------------------------------------------------------------
+#  Context of a session (one entry of session stack)
+# ----------------------------------------------------------------------------------------
+@dataclass
+class Context():
+	hop: str                                      # poller, jdm, jcp, nmte, vnf, console (vnf login)
+	mode: str                                     # shell, cli
+	prompt: str
+	device: object = None                         # SimDevice
+	vnf: tuple = None                             # (vnf_id, vnf_name) for console/vnf
+
+# ----------------------------------------------------------------------------------------
+#  Simulated session over a channel
+# ----------------------------------------------------------------------------------------
+class SimSession():
+
+	def __init__(self, simulator, channel, poller='', device=None):
+		self.sim = simulator
+		self.chan = channel
+		self.poller = poller
+		self.stack = []
+		self.pending = None                       ## handler of next line (yes/no, password, console login), instead of command
+		self.echo = True
+		self.pinging = None                       ## (ip, replies) of running ping, until ^C
+		self.closed = False
+		if device:
+			self.stack.append(Context('jdm', 'shell', f"root@{device.jdm}:~# ", device))
+		else:
+			self.stack.append(Context('poller', 'shell', f"{poller.split('.')[0]}  :~$ "))
+
+	@property
+	def context(self):
+		return self.stack[-1]
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ channel ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def send(self, text):
+		if self.closed: return
+		try:
+			self.chan.sendall(text.replace("\r\n", "\n").replace("\n", "\r\n"))
+		except Exception:
+			self.close()
+
+	def prompt(self):
+		self.send(self.context.prompt)
+
+	def close(self):
+		if self.closed: return
+		self.closed = True
+		try:
+			self.chan.close()
+		except Exception:
+			pass
+
+	def run(self):
+		self.sim.count('sessions')
+		self.send(f"Last login: simulated session on {self.poller or self.context.device.jdm}\n")
+		self.prompt()
+		line, skip_lf = "", False
+		while not self.closed:
+			try:
+				data = self.chan.recv(4096)
+			except Exception:
+				break
+			if not data: break
+			for char in data.decode(errors='ignore'):
+				if self.closed: break
+				if skip_lf and char == "\n":
+					skip_lf = False
+					continue
+				skip_lf = char == "\r"
+				if char == CTRL_C:
+					line = ""
+					self.interrupt()
+				elif char == CONSOLE_ESCAPE:
+					line = ""
+					self.detach_console()
+				elif char in "\r\n":
+					if self.echo: self.send("\n")
+					self.handle_line(line)
+					line = ""
+				else:
+					line += char
+					if self.echo: self.send(char)
+		self.close()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ control characters ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def interrupt(self):
+		self.pending, self.echo = None, True
+		if self.pinging:
+			ip, replies = self.pinging
+			self.pinging = None
+			loss = 0 if replies else 100
+			self.send(f"^C\n--- {ip} ping statistics ---\n{max(replies, 1)} packets transmitted, {replies} received, {loss}% packet loss, time 0ms\n")
+		else:
+			self.send("^C\n")
+		if self.context.hop == 'console': return
+		self.prompt()
+
+	# login not answering, typed lines are swallowed till ^C
+	def hang(self):
+		self.pending = self.swallow
+
+	def swallow(self, line):
+		self.pending = self.swallow
+
+	def detach_console(self):
+		self.pending, self.echo = None, True
+		while self.context.hop in ('console', 'vnf'):
+			self.stack.pop()
+		self.send("\n")
+		self.prompt()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ lines ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def handle_line(self, line):
+		if self.pending:
+			handler, self.pending = self.pending, None
+			return handler(line)
+		if self.pinging: return
+		line = line.strip()
+		ctx = self.context
+		if ctx.hop == 'console':
+			return self.console_login_prompt(line)
+		if not line:
+			return self.prompt()
+		self.sim.count('commands')
+		if self.sim.should_drop():
+			return self.close()
+		self.sim.command_delay()
+		if line in ('exit', 'logout', 'quit'):
+			return self.exit()
+		if ctx.mode == 'shell' and ';' in line and not PROBE_COMMAND.match(line):
+			for part in line.split(';'):
+				self.run_command(part.strip(), prompt=False)
+				if self.closed or self.pending: return
+			return self.prompt()
+		self.run_command(line)
+
+	def run_command(self, cmd, prompt=True):
+		ctx = self.context
+		if not cmd: return
+		if cmd.startswith("echo "):
+			self.send(cmd[5:].strip("'\"") + "\n")
+		elif ctx.hop == 'poller':
+			if self.poller_command(cmd): return
+		elif ctx.hop == 'jdm' and self.jdm_command(cmd):
+			return
+		elif cmd == 'cli' and ctx.mode == 'shell' and ctx.hop in ('jdm', 'jcp', 'nmte'):
+			cli_prompt = f"root@{ctx.device.jdm}> " if ctx.hop == 'jdm' else [ v[2] for v in SUB_HOPS.values() if v[0] == ctx.hop ][0]
+			self.stack.append(Context(ctx.hop, 'cli', cli_prompt, ctx.device, ctx.vnf))
+		else:
+			self.send(self.sim.outputs.output(ctx.device, f"{ctx.hop}-{ctx.mode}", cmd) + "\n")
+		if prompt: self.prompt()
+
+	def exit(self):
+		ctx = self.stack.pop()
+		if not self.stack:
+			self.send("logout\n")
+			return self.close()
+		if ctx.hop == 'vnf':
+			self.send(f"logout\n\n{ctx.vnf[1]} login: ")
+			return
+		if ctx.mode == 'shell' and ctx.hop in ('jdm', 'jcp', 'nmte'):
+			self.send(f"logout\nConnection to {ctx.device.ip if ctx.hop == 'jdm' else ctx.hop} closed.\n")
+		self.prompt()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ poller ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def poller_command(self, cmd):
+		if cmd.startswith("action_info"):
+			self.action_info(cmd[len("action_info"):].strip())
+			return False
+		m = PROBE_COMMAND.match(cmd)
+		if m:
+			self.probe(m.group(1).split(), int(m.group(2)))
+			return False
+		m = PING_COMMAND.match(cmd)
+		if m:
+			self.ping(m.group(1))
+			return True
+		m = SSH_COMMAND.match(cmd)
+		if m:
+			self.ssh_device(m.group(1), m.group(2))
+			return True
+		self.send(f"-bash: {cmd.split()[0]}: command not found\n")
+		return False
+
+	def action_info(self, name):
+		device = self.sim.inventory.device(name)
+		self.sim.count('action_info')
+		if self.sim.fails('action_info_failure_rate'):
+			self.send("action_info: backend timeout, try again later\n")
+			return
+		if not device or not device.resolvable:
+			self.send(f"No records found for {name}\n")
+			return
+		self.send(f"{device.jdm},NFX250,{device.ip},SIM-SITE-{device.index:07d}\n")
+
+	def probe(self, ips, count):
+		results = []
+		for ip in ips:
+			device = self.sim.inventory.device(ip)
+			if device and device.reachable:
+				results.append(f"PROBE {ip} UP {self.sim.rtt(self.poller, ip):.3f}")
+			else:
+				results.append(f"PROBE {ip} DOWN")
+		self.sim.delay(min(count, 2) * 0.05)
+		self.send("\n".join(results) + "\n")
+
+	def ping(self, ip):
+		device = self.sim.inventory.device(ip)
+		self.send(f"PING {ip} ({ip}) 56(84) bytes of data.\n")
+		if device and device.reachable:
+			self.send(f"64 bytes from {ip}: icmp_seq=1 ttl=62 time={self.sim.rtt(self.poller, ip):.1f} ms\n")
+			self.pinging = (ip, 1)
+		else:
+			self.pinging = (ip, 0)
+
+	def ssh_device(self, username, host):
+		device = self.sim.inventory.device(host)
+		if not device:
+			self.send(f"ssh: Could not resolve hostname {host}: Name or service not known\n")
+			return self.prompt()
+		if not device.reachable:
+			self.sim.delay(self.sim.config.connect_timeout)
+			self.send(f"ssh: connect to host {host} port 22: Connection timed out\n")
+			return self.prompt()
+		self.sim.login_delay()
+
+		def login(password):
+			self.echo = True
+			self.send("\n")
+			if self.sim.fails('login_timeout_rate'):
+				return self.hang()
+			if self.sim.fails('login_failure_rate') or not self.sim.password_ok('jdm', password):
+				self.send("Permission denied, please try again.\n")
+				return ask_password()
+			self.stack.append(Context('jdm', 'shell', f"root@{device.jdm}:~# ", device))
+			self.send(f"Last login: simulated login on {device.jdm}\n")
+			self.prompt()
+
+		def ask_password():
+			self.echo = False
+			self.pending = login
+			self.send(f"{username or 'root'}@{host}'s password: ")
+
+		def confirm(answer):
+			if answer.strip() != 'yes':
+				self.send("Host key verification failed.\n")
+				return self.prompt()
+			self.send(f"Warning: Permanently added '{host}' (ECDSA) to the list of known hosts.\n")
+			ask_password()
+
+		if self.sim.fails('host_key_prompt_rate'):
+			self.pending = confirm
+			self.send(f"The authenticity of host '{host} ({device.ip})' can't be established.\n"
+				"ECDSA key fingerprint is SHA256:simulated.\n"
+				"Are you sure you want to continue connecting (yes/no/[fingerprint])? ")
+			return
+		ask_password()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ JDM ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def jdm_command(self, cmd):
+		ctx = self.context
+		m = SSH_COMMAND.match(cmd)
+		if m and m.group(2) in SUB_HOPS:
+			self.ssh_sub_hop(m.group(2))
+			return True
+		m = VIRSH_CONSOLE.match(cmd)
+		if m and ctx.mode == 'shell':
+			self.virsh_console(m.group(1))
+			return True
+		return False
+
+	def ssh_sub_hop(self, name):
+		hop, shell_prompt, _ = SUB_HOPS[name]
+		device = self.context.device
+		self.sim.login_delay()
+
+		def login(password):
+			self.echo = True
+			self.send("\n")
+			if self.sim.fails('login_timeout_rate'):
+				return self.hang()
+			if self.sim.fails('login_failure_rate') or not self.sim.password_ok(hop, password):
+				self.send("Permission denied, please try again.\n")
+				return ask_password()
+			self.stack.append(Context(hop, 'shell', shell_prompt, device))
+			self.prompt()
+
+		def ask_password():
+			self.echo = False
+			self.pending = login
+			self.send("Password:")
+
+		ask_password()
+
+	def virsh_console(self, vnf_id):
+		device = self.context.device
+		vnf = dict(device.vnfs).get(vnf_id)
+		if not vnf:
+			self.send(f"error: failed to get domain '{vnf_id}'\n")
+			return self.prompt()
+		self.sim.login_delay()
+		self.send(f"Connected to domain {vnf}\nEscape character is ^]\n")
+		self.stack.append(Context('console', 'shell', f"\n{vnf} login: ", device, (vnf_id, vnf)))
+
+	def console_login_prompt(self, line):
+		ctx = self.context
+		if not line:
+			return self.prompt()
+		username = line
+
+		def login(password):
+			self.echo = True
+			self.send("\n")
+			if self.sim.fails('login_failure_rate') or not self.sim.password_ok(ctx.vnf[1][16:19].lower(), password, username):
+				self.send("\nLogin incorrect")
+				return self.prompt()
+			self.stack.append(Context('vnf', 'shell', f"edge-{ctx.vnf[1]}:~# ", ctx.device, ctx.vnf))
+			self.prompt()
+
+		self.echo = False
+		self.pending = login
+		self.send("Password: ")
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
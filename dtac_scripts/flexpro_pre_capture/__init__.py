@@ -4,5 +4,12 @@
 
 from .flex_connect import FlxConnectCapture
 from .identify_pollers import ActionPollers
+from .poller_pool import PollerPool
+from .poller_health import PollerHealth
+from .poller_scheduler import PollerScheduler
+from .capture_daemon import CaptureDaemon
+from .tracing import CaptureTracer
+from .capture_metrics import CaptureMetrics
+from ..capture_store import CaptureStore
 from .common import pull_variables, pull_cmds_lists_dict
 from .colorprint import print_banner
@@ -0,0 +1,399 @@
+""" Capture Daemon.
+Long running capture service. Keeps authenticated poller sessions warm, and accepts capture jobs
+(device list + commands file) over a local HTTP API. Jobs share pollers within their session limits,
+and write the same output folder layout as GUI ( <output folder>/<date>/<time LT> ).
+
+API is served on 127.0.0.1 only, every request requires header `Authorization: Bearer <token>`,
+token is generated at start and written to <output folder>/.dtac_daemon_token (readable by owner only).
+
+API (json)
+	POST /jobs                 {"devices": [..], "commands_file": "..", "options": {..}}  ==> {"job_id": ..}
+	GET  /jobs                 all jobs summary
+	GET  /jobs/<id>            job status, with per device progress
+	GET  /jobs/<id>/events     progress events stream (a json per line), ends when job finishes
+	GET  /jobs/<id>/metrics    live capture metrics (?format=prometheus for Prometheus text)
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass, field
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import time
+from itertools import count
+import threading
+import argparse
+import getpass
+import secrets
+import hmac
+import json
+import os
+
+from .flex_connect import FlxConnectCapture
+from .identify_pollers import ActionPollers
+from .poller_pool import PollerPool
+from .poller_health import PollerHealth
+from .poller_scheduler import PollerScheduler
+from .ip_cache import DeviceIPCache
+from .timeout_profile import CommandTimeoutProfile
+from .tracing import CaptureTracer, TRACE_FILE
+from .capture_metrics import CaptureMetrics
+from ..capture_store import CaptureStore, STORE_FILE
+from .common import pull_variables, pull_cmds_lists_dict, get_run_output_path, MAX_CONNECTIONS
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+HOST = '127.0.0.1'                                              ## api is served on loopback only
+DEFAULT_PORT = 8765
+TOKEN_FILE = '.dtac_daemon_token'                               ## api token file, within output folder
+IP_CACHE_FILE = '.dtac_ip_cache.json'                           ## device ip cache file, within output folder
+TIMEOUT_PROFILE_FILE = '.dtac_cmd_timeouts.json'                ## learned command timeouts file, within output folder
+KEEPALIVE = 30                                                  ## seconds, ssh keepalive on warm poller transports
+REPORT_FILES = {
+	'csv_report_file': 'capture-summary.csv',
+	'interface_summary_report_file': 'interface-summary.xlsx',
+	'cmds_exec_summary_report_file': 'commands-exec-summary.xlsx',
+}
+## job options, which are passed on to FlxConnectCapture attributes as is
+JOB_CAPTURE_OPTIONS = ('max_connections', 'pipeline_commands', 'jdm_proxy_jump', 'parallel_hops', 'retry_budget')
+## job options, handled by daemon
+JOB_RUN_OPTIONS = ('capture_store',)
+
+# ----------------------------------------------------------------------------------------
+#  Capture Job class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureJob():
+	job_id: str
+	devices: list
+	commands_file: str
+	options: dict = field(default_factory=dict)
+
+	def __post_init__(self):
+		self.state = 'queued'                     ## queued, resolving, capturing, reporting, finished, failed
+		self.output_path = None
+		self.metrics = None                       ## CaptureMetrics, while/after capturing
+		self.devices_progress = {}                ## { device: {'state': .., ..} }
+		self.events = []
+		self.cv = threading.Condition()
+
+	@property
+	def done(self):
+		return self.state in ('finished', 'failed')
+
+	def add_event(self, **event):
+		event = dict(event, job_id=self.job_id, time=round(time(), 3))
+		with self.cv:
+			if event.get('device'):
+				self.devices_progress.setdefault(event['device'], {}).update({k: v for k, v in event.items() if k not in ('job_id', 'device')})
+			self.events.append(event)
+			self.cv.notify_all()
+
+	def set_state(self, state, **info):
+		self.state = state
+		self.add_event(state=state, **info)
+
+	# events from index `start`, waits max `timeout` seconds for a new one. returns (events, next index)
+	def wait_events(self, start, timeout=1):
+		with self.cv:
+			if start >= len(self.events) and not self.done:
+				self.cv.wait(timeout)
+			return self.events[start:], len(self.events)
+
+	def summary(self, detailed=False):
+		s = {'job_id': self.job_id, 'state': self.state, 'output_path': self.output_path, 'devices': len(self.devices)}
+		if detailed: s['devices_progress'] = self.devices_progress
+		return s
+
+# ----------------------------------------------------------------------------------------
+#  Capture Daemon class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureDaemon():
+	creds_file: str                               # creds.txt, read once at start
+	pollers: list                                 # available pollers
+	output_folder: str                            # jobs output root folder (same as GUI `Output folder`)
+	passphrase: str = ''
+	port: int = DEFAULT_PORT
+	max_sessions_per_poller: int = None           # device sessions ceiling per poller, shared by all jobs (default/capped: pool channels per transport)
+	max_parallel_jobs: int = 2
+
+	def __post_init__(self):
+		self.jobs = {}
+		self.jobs_lock = threading.Lock()
+		self.job_counter = 0
+		self.executor = ThreadPoolExecutor(max_workers=self.max_parallel_jobs)
+		self.server = None
+		self.dyn_vars = {}
+		self.token = secrets.token_urlsafe(32)    ## api token, required as `Authorization: Bearer <token>`
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ service ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# read creds, connect pollers and serve api (blocking)
+	def __call__(self):
+		self.dyn_vars = pull_variables(self.creds_file)
+		if not self.dyn_vars: raise ValueError(f"Unable to read creds file {self.creds_file}")
+		self.poller_pool = PollerPool(
+			server_auth_user = self.dyn_vars['attuid'],
+			server_auth_psk  = self.dyn_vars['key_file_1024bit'],
+			passphrase       = self.passphrase,
+			keepalive        = KEEPALIVE,
+		)
+		self.poller_health = PollerHealth()
+		self.max_sessions_per_poller = self.poller_pool.max_sessions_per_server(self.max_sessions_per_poller)
+		self.scheduler = PollerScheduler(self.pollers, max_inflight=self.max_sessions_per_poller, health=self.poller_health)
+		self.ip_cache = DeviceIPCache(f"{self.output_folder}/{IP_CACHE_FILE}")
+		self.timeout_profile = CommandTimeoutProfile(f"{self.output_folder}/{TIMEOUT_PROFILE_FILE}")
+		#
+		print_banner(f"[+] Warming up poller sessions")
+		failed = self.poller_pool.warm_up(self.pollers)
+		for server in failed: self.poller_health.record_failure(server)
+		#
+		token_file = self.write_token()
+		self.server = ThreadingHTTPServer((HOST, self.port), CaptureDaemonRequestHandler)
+		self.server.capture_daemon = self
+		print_banner(f"[+] Capture daemon listening on http://{HOST}:{self.port}, api token in {token_file}")
+		try:
+			self.server.serve_forever()
+		finally:
+			self.close()
+
+	def stop(self):
+		if self.server: self.server.shutdown()
+
+	# api token to file, readable by owner only. returns file
+	def write_token(self):
+		token_file = Path(self.output_folder).joinpath(TOKEN_FILE)
+		token_file.parent.mkdir(parents=True, exist_ok=True)
+		fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+		with os.fdopen(fd, 'w') as f:
+			f.write(self.token)
+		os.chmod(token_file, 0o600)                   ## existing file keeps its mode on open
+		return token_file.as_posix()
+
+	def is_authorized(self, authorization):
+		return hmac.compare_digest((authorization or '').encode(), f"Bearer {self.token}".encode())
+
+	def close(self):
+		self.executor.shutdown(wait=True)
+		self.poller_pool.close_all()
+		self.ip_cache.save()
+		self.timeout_profile.save()
+		if self.server: self.server.server_close()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ jobs ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def submit(self, devices, commands_file, options=None):
+		if not devices: raise ValueError("Mandatory Input missing Device(s) List")
+		if not commands_file: raise ValueError("Mandatory Input missing Commands file")
+		unknown = set(options or {}) - set(JOB_CAPTURE_OPTIONS) - set(JOB_RUN_OPTIONS) - set(REPORT_FILES)
+		if unknown: raise ValueError(f"Unknown job options {sorted(unknown)}")
+		options = dict(options or {})
+		if 'max_connections' in options:
+			options['max_connections'] = self.max_connections(options['max_connections'])
+		with self.jobs_lock:
+			self.job_counter += 1
+			job = CaptureJob(f"{self.job_counter}", devices, commands_file, options)
+			self.jobs[job.job_id] = job
+		job.add_event(state='queued')
+		self.executor.submit(self.run_job, job)
+		return job
+
+	# job max_connections, capped as in GUI
+	def max_connections(self, value):
+		try:
+			value = int(value)
+		except (TypeError, ValueError):
+			raise ValueError(f"Invalid max_connections {value}")
+		if value < 1: raise ValueError(f"Invalid max_connections {value}")
+		return min(value, MAX_CONNECTIONS)
+
+	def get_job(self, job_id):
+		return self.jobs.get(job_id)
+
+	# same steps as GUI start, with daemon wide (warm) pool, health, scheduler and caches
+	def run_job(self, job):
+		tracer = CaptureTracer()
+		try:
+			commands = pull_cmds_lists_dict(job.commands_file)
+			if not commands: raise ValueError(f"Unable to read commands file {job.commands_file}")
+			job.output_path = self.new_output_path()
+			#
+			# ---------- 1. Identify device ips
+			job.set_state('resolving', output_path=job.output_path)
+			servers = self.poller_health.healthy_servers(self.pollers) or self.pollers
+			AP = ActionPollers(
+				devices          = job.devices,
+				servers_list     = self.pollers,
+				server           = servers[0],
+				server_auth_user = self.dyn_vars['attuid'],
+				server_auth_psk  = self.dyn_vars['key_file_1024bit'],
+				passphrase       = self.passphrase,
+			)
+			AP.poller_pool = self.poller_pool
+			AP.poller_health = self.poller_health
+			AP.scheduler = self.scheduler
+			AP.ip_cache = self.ip_cache
+			AP.tracer = tracer
+			AP()
+			AP.exit()
+			for device, report in AP.devices_report.items():
+				job.add_event(device=device, state=report.get('Status', 'Unresolved'))
+			#
+			# ---------- 2. Capture
+			job.set_state('capturing')
+			FCC = FlxConnectCapture(AP)
+			FCC.dyn_vars = self.dyn_vars
+			FCC.commands = commands
+			FCC.output_path = job.output_path
+			FCC.output_csv_report_file = f"{job.output_path}/{job.options.get('csv_report_file', REPORT_FILES['csv_report_file'])}"
+			FCC.output_intf_summary_report_file = f"{job.output_path}/{job.options.get('interface_summary_report_file', REPORT_FILES['interface_summary_report_file'])}"
+			FCC.output_cmds_exec_summary_report_file = f"{job.output_path}/{job.options.get('cmds_exec_summary_report_file', REPORT_FILES['cmds_exec_summary_report_file'])}"
+			FCC.poller_pool = self.poller_pool
+			FCC.timeout_profile = self.timeout_profile
+			FCC.tracer = tracer
+			FCC.metrics = job.metrics = CaptureMetrics(job.output_path)
+			for option in JOB_CAPTURE_OPTIONS:
+				if option in job.options: setattr(FCC, option, job.options[option])
+			if job.options.get('capture_store'):
+				FCC.capture_store = CaptureStore(f"{job.output_path}/{STORE_FILE}")
+			FCC.progress_callback = lambda device, state, **info: job.add_event(device=device, state=state, **info)
+			FCC()
+			#
+			# ---------- 3. Reports
+			job.set_state('reporting')
+			FCC.reports_gen()
+			self.ip_cache.save()
+			job.set_state('finished')
+		except Exception as e:
+			print_banner(f"[-] Job {job.job_id} failed\n{e}")
+			job.set_state('failed', error=str(e))
+		finally:
+			if job.output_path: tracer.export(f"{job.output_path}/{TRACE_FILE}")
+
+	# new run folder, created here so that jobs started in same minute don't share it
+	# ( next free of <time LT>, <time>-2 LT, <time>-3 LT ..)
+	def new_output_path(self):
+		base = get_run_output_path(self.output_folder)[:-3]
+		for n in count(1):
+			output_path = f"{base} LT" if n == 1 else f"{base}-{n} LT"
+			try:
+				Path(output_path).mkdir(parents=True, exist_ok=False)
+				return output_path
+			except FileExistsError:
+				continue
+
+# ----------------------------------------------------------------------------------------
+#  HTTP API request handler
+# ----------------------------------------------------------------------------------------
+class CaptureDaemonRequestHandler(BaseHTTPRequestHandler):
+
+	@property
+	def capture_daemon(self):
+		return self.server.capture_daemon
+
+	def send_json(self, obj, status=200):
+		body = json.dumps(obj, indent=2).encode()
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def path_parts(self):
+		return [ part for part in self.path.split("?")[0].split("/") if part ]
+
+	# sends 401 if request doesn't carry api token
+	def authorized(self):
+		if self.capture_daemon.is_authorized(self.headers.get('Authorization')): return True
+		self.send_json({'error': 'unauthorized'}, 401)
+		return False
+
+	def do_GET(self):
+		if not self.authorized(): return
+		parts = self.path_parts()
+		if parts == ['jobs']:
+			return self.send_json([ job.summary() for job in list(self.capture_daemon.jobs.values()) ])
+		if len(parts) < 2 or parts[0] != 'jobs':
+			return self.send_json({'error': 'not found'}, 404)
+		job = self.capture_daemon.get_job(parts[1])
+		if not job:
+			return self.send_json({'error': f'job {parts[1]} not found'}, 404)
+		if len(parts) == 2:
+			return self.send_json(job.summary(detailed=True))
+		if parts[2:] == ['events']:
+			return self.stream_events(job)
+		if parts[2:] == ['metrics']:
+			return self.send_metrics(job)
+		return self.send_json({'error': 'not found'}, 404)
+
+	def do_POST(self):
+		if not self.authorized(): return
+		if self.path_parts() != ['jobs']:
+			return self.send_json({'error': 'not found'}, 404)
+		try:
+			request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+			job = self.capture_daemon.submit(request.get('devices'), request.get('commands_file'), request.get('options'))
+		except (ValueError, AttributeError) as e:
+			return self.send_json({'error': str(e)}, 400)
+		self.send_json({'job_id': job.job_id}, 202)
+
+	def send_text(self, text, content_type='text/plain; version=0.0.4', status=200):
+		body = text.encode()
+		self.send_response(status)
+		self.send_header('Content-Type', content_type)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	# job capture metrics, json (default) or Prometheus text
+	def send_metrics(self, job):
+		if not job.metrics:
+			return self.send_json({'error': f'job {job.job_id} not capturing yet'}, 404)
+		if 'format=prometheus' in self.path:
+			return self.send_text(job.metrics.prometheus_text(labels=f'job="{job.job_id}"'))
+		return self.send_json(job.metrics.snapshot())
+
+	# writes job events as they arrive (a json per line), until job finishes
+	def stream_events(self, job):
+		self.send_response(200)
+		self.send_header('Content-Type', 'application/x-ndjson')
+		self.end_headers()
+		index = 0
+		while True:
+			events, index = job.wait_events(index)
+			for event in events:
+				self.wfile.write((json.dumps(event) + "\n").encode())
+			self.wfile.flush()
+			if job.done and index >= len(job.events): break
+
+	def log_message(self, format, *args):
+		print_banner(f"[+] API {self.address_string()} {format % args}")
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="DTAC capture daemon")
+	parser.add_argument('--creds-file', required=True)
+	parser.add_argument('--pollers', required=True, nargs='+')
+	parser.add_argument('--output-folder', required=True)
+	parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+	parser.add_argument('--max-sessions-per-poller', type=int, default=None)
+	parser.add_argument('--max-parallel-jobs', type=int, default=2)
+	args = parser.parse_args()
+	CD = CaptureDaemon(
+		creds_file              = args.creds_file,
+		pollers                 = args.pollers,
+		output_folder           = args.output_folder,
+		passphrase              = getpass.getpass("Pass-phrase: "),
+		port                    = args.port,
+		max_sessions_per_poller = args.max_sessions_per_poller,
+		max_parallel_jobs       = args.max_parallel_jobs,
+	)
+	CD()
+# ----------------------------------------------------------------------------------------
@@ -0,0 +1,136 @@
+""" Capture checkpoint manifest.
+Records per device, per hop and per command completion of a capture run within its output folder.
+An interrupted run can be resumed from it, by re-capturing only incomplete devices/hops/commands.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from pathlib import Path
+from time import monotonic
+import threading
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+MANIFEST_FILE = 'capture-manifest.json'
+SAVE_INTERVAL = 2                                 ## seconds, updates within are written together
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# returns latest run folder (ex: <output_folder>/<date>/<time LT>) having a capture manifest, None if no such run.
+def get_last_run_folder(output_folder):
+	manifests = sorted(Path(output_folder).glob(f"*/* LT/{MANIFEST_FILE}"), key=lambda p: p.stat().st_mtime)
+	if not manifests: return None
+	return manifests[-1].parent.as_posix()
+
+# ----------------------------------------------------------------------------------------
+#  Capture Manifest class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureManifest():
+	output_path: str                              # run output folder
+	save_interval: float = SAVE_INTERVAL          # seconds, minimum gap between two manifest writes
+
+	def __post_init__(self):
+		self.manifest_file = f"{self.output_path}/{MANIFEST_FILE}"
+		self.lock = threading.RLock()
+		self.devices = self.load()                # { device: {'info': {}, 'status': str, 'hops': {hop: status}, 'commands': {hop-mode: [cmds]}} }
+		self.pending = False                      ## updates not yet written to file
+		self.last_save = 0
+
+	# read manifest from file, empty on missing/corrupt file
+	def load(self):
+		try:
+			with open(self.manifest_file, 'r') as f:
+				return json.load(f)
+		except FileNotFoundError:
+			return {}
+		except Exception as e:
+			print_banner(f"[-] Capture manifest read error, ignoring manifest\n{e}")
+			return {}
+
+	# write manifest to file (via temporary file, to avoid partial writes)
+	def save(self):
+		Path(self.output_path).mkdir(parents=True, exist_ok=True)
+		tmp_file = f"{self.manifest_file}.tmp"
+		with self.lock:
+			with open(tmp_file, 'w') as f:
+				json.dump(self.devices, f)
+			os.replace(tmp_file, self.manifest_file)
+			self.pending = False
+			self.last_save = monotonic()
+
+	# writes pending updates, call at end of run (or before reading manifest file)
+	def flush(self):
+		with self.lock:
+			if self.pending: self.save()
+
+	# update is written if last write is older than save_interval, else left pending for next write/flush.
+	# whole manifest is rewritten on each write, writing on every update grows quadratic with fleet size.
+	def _changed(self):
+		self.pending = True
+		if monotonic() - self.last_save >= self.save_interval: self.save()
+
+	def _device(self, device):
+		return self.devices.setdefault(device, {'info': {}, 'status': 'Not Initiated', 'hops': {}, 'commands': {}})
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ updates ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# device level details, (ex: action_device_info, action_info report, final status)
+	def mark_device(self, device, status=None, **info):
+		with self.lock:
+			d = self._device(device)
+			d['info'].update(info)
+			if status: d['status'] = status
+			self._changed()
+
+	def mark_hop(self, device, hop, status):
+		with self.lock:
+			self._device(device)['hops'][hop] = status
+			self._changed()
+
+	def mark_commands(self, device, hop_mode, cmds):
+		with self.lock:
+			done = self._device(device)['commands'].setdefault(hop_mode, [])
+			done.extend([ cmd for cmd in cmds if cmd not in done ])
+			self._changed()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ queries ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def is_device_complete(self, device):
+		return self.devices.get(device, {}).get('status') == 'Success'
+
+	def is_hop_complete(self, device, hop):
+		return self.devices.get(device, {}).get('hops', {}).get(hop) == 'OK'
+
+	def completed_commands(self, device, hop_mode):
+		return set(self.devices.get(device, {}).get('commands', {}).get(hop_mode, []))
+
+	def has_progress(self, device):
+		return bool(self.devices.get(device, {}).get('commands'))
+
+	def device_info(self, device):
+		return self.devices.get(device, {}).get('info', {})
+
+	def hops_status(self, device):
+		return dict(self.devices.get(device, {}).get('hops', {}))
+
+	# devices captured completely
+	@property
+	def completed_devices(self):
+		return [ device for device in self.devices if self.is_device_complete(device) ]
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
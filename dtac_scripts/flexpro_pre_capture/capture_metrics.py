@@ -0,0 +1,201 @@
+""" Capture run metrics.
+Live throughput counters of a capture run (devices completed / in flight / failed, commands per second,
+bytes received, active sessions per poller, ETA), updated by FlxConnectCapture and FlexLogin.
+Periodically rewritten in run folder as json and as Prometheus text (node_exporter textfile collector format).
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from collections import Counter, deque
+from pathlib import Path
+from time import time
+import threading
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+METRICS_FILE = 'capture-metrics.json'
+PROMETHEUS_FILE = 'capture-metrics.prom'
+COMPLETED_STATUS = ('Success', 'Partial Captures')          ## device finished with these is completed, else failed
+NOT_ATTEMPTED_STATUS = ('Not Initiated',)                   ## device finished with these was not attempted, neither completed nor failed
+COMMANDS_WINDOW = 60                                        ## seconds, commands per second is measured over
+DEVICES_WINDOW = 300                                        ## seconds, device finish rate (for ETA) is measured over
+
+## ( metric, type, help ) of Prometheus text, in order
+PROMETHEUS_METRICS = (
+	('devices_total', 'gauge', 'Devices to be captured in run'),
+	('devices_completed', 'gauge', 'Devices captured (Success or Partial Captures)'),
+	('devices_failed', 'gauge', 'Devices finished without captures'),
+	('devices_in_flight', 'gauge', 'Devices being captured'),
+	('devices_per_minute', 'gauge', 'Devices finished per minute (recent)'),
+	('commands_total', 'counter', 'Commands executed'),
+	('commands_failed_total', 'counter', 'Commands failed'),
+	('commands_per_second', 'gauge', 'Commands executed per second (recent)'),
+	('bytes_received_total', 'counter', 'Command output bytes received'),
+	('eta_seconds', 'gauge', 'Estimated seconds to finish remaining devices'),
+	('elapsed_seconds', 'gauge', 'Seconds since run started'),
+)
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# writes text to file via temporary file (readers never see a partial file)
+def write_file_atomic(file, text):
+	tmp_file = f"{file}.tmp"
+	with open(tmp_file, 'w') as f:
+		f.write(text)
+	os.replace(tmp_file, file)
+
+# ----------------------------------------------------------------------------------------
+#  Capture Metrics class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureMetrics():
+	output_path: str                              # run output folder, metrics files are written in
+	interval: float = 5                           # seconds, between two metrics file writes
+	prefix: str = 'dtac'                          # Prometheus metric names prefix
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.devices_total = 0
+		self.in_flight = {}                       ## { device: start time }
+		self.finished = {}                        ## { device: final status }, of attempted devices (retried device counted once)
+		self.not_attempted = set()                ## devices finished without being attempted
+		self.finish_times = deque()
+		self.command_times = deque()
+		self.commands = 0
+		self.commands_failed = 0
+		self.bytes_received = 0
+		self.poller_sessions = Counter()
+		self.start_time = time()
+		self.stop_event = threading.Event()
+		self.writer = None
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ updates ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def set_devices_total(self, n):
+		with self.lock:
+			self.devices_total = n
+
+	def device_started(self, device):
+		with self.lock:
+			self.in_flight[device] = time()
+
+	# a retried device replaces its earlier status, its finish is counted in device rate only once
+	def device_finished(self, device, status):
+		with self.lock:
+			self.in_flight.pop(device, None)
+			if status in NOT_ATTEMPTED_STATUS:
+				if device not in self.finished: self.not_attempted.add(device)
+				return
+			self.not_attempted.discard(device)
+			if device not in self.finished: self.finish_times.append(time())
+			self.finished[device] = status
+
+	def command_done(self, output):
+		with self.lock:
+			self.commands += 1
+			self.bytes_received += len(output)
+			self.command_times.append(time())
+
+	def command_failed(self):
+		with self.lock:
+			self.commands_failed += 1
+
+	def session_opened(self, poller):
+		with self.lock:
+			self.poller_sessions[poller] += 1
+
+	def session_closed(self, poller):
+		with self.lock:
+			self.poller_sessions[poller] -= 1
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ snapshot ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	@staticmethod
+	def _rate(times, window, now):
+		while times and times[0] < now - window: times.popleft()
+		return len(times) / window
+
+	# current values of all metrics
+	def snapshot(self):
+		now = time()
+		with self.lock:
+			elapsed = now - self.start_time
+			completed = sum(1 for status in self.finished.values() if status in COMPLETED_STATUS)
+			commands_per_second = self._rate(self.command_times, min(COMMANDS_WINDOW, max(elapsed, 1)), now)
+			devices_per_second = self._rate(self.finish_times, min(DEVICES_WINDOW, max(elapsed, 1)), now)
+			remaining = max(self.devices_total - len(self.finished) - len(self.not_attempted), 0)
+			return {
+				'devices_total': self.devices_total,
+				'devices_completed': completed,
+				'devices_failed': len(self.finished) - completed,
+				'devices_in_flight': len(self.in_flight),
+				'devices_per_minute': round(devices_per_second * 60, 2),
+				'commands_total': self.commands,
+				'commands_failed_total': self.commands_failed,
+				'commands_per_second': round(commands_per_second, 2),
+				'bytes_received_total': self.bytes_received,
+				'eta_seconds': round(remaining / devices_per_second) if devices_per_second else None,
+				'elapsed_seconds': round(elapsed),
+				'poller_sessions': { poller: n for poller, n in self.poller_sessions.items() if n },
+				'time': round(now, 3),
+			}
+
+	# Prometheus text exposition of snapshot
+	def prometheus_text(self, snapshot=None, labels=''):
+		snapshot = snapshot or self.snapshot()
+		lines = []
+		for metric, metric_type, help_text in PROMETHEUS_METRICS:
+			if snapshot[metric] is None: continue
+			name = f"{self.prefix}_{metric}"
+			lines += [ f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name}{{{labels}}} {snapshot[metric]}" if labels else f"{name} {snapshot[metric]}" ]
+		name = f"{self.prefix}_poller_sessions"
+		lines += [ f"# HELP {name} Active device sessions on poller", f"# TYPE {name} gauge" ]
+		for poller, n in snapshot['poller_sessions'].items():
+			lines.append(f'{name}{{{labels + "," if labels else ""}poller="{poller}"}} {n}')
+		return "\n".join(lines) + "\n"
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ files ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def write(self):
+		snapshot = self.snapshot()
+		try:
+			Path(self.output_path).mkdir(parents=True, exist_ok=True)
+			write_file_atomic(f"{self.output_path}/{METRICS_FILE}", json.dumps(snapshot, indent=2))
+			write_file_atomic(f"{self.output_path}/{PROMETHEUS_FILE}", self.prometheus_text(snapshot))
+		except Exception as e:
+			print_banner(f"[-] Writing capture metrics failed\n{e}")
+
+	# starts periodic writer (background thread)
+	def start(self):
+		if self.writer: return
+		self.stop_event.clear()
+		self.writer = threading.Thread(target=self._run_writer, daemon=True)
+		self.writer.start()
+
+	def _run_writer(self):
+		while not self.stop_event.wait(self.interval):
+			self.write()
+
+	# stops periodic writer, and writes final values
+	def stop(self):
+		if self.writer:
+			self.stop_event.set()
+			self.writer.join()
+			self.writer = None
+		self.write()
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
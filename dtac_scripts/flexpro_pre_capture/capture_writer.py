@@ -0,0 +1,79 @@
+""" Capture file writer.
+Per device writer of capture outputs (.log and .html). Files are opened on first write and kept open
+for the device session, written through a buffer and flushed periodically, closed at end of session.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from time import monotonic
+
+from ..capture_store import cmd_output_text
+from .save_to_html import html_header_text, html_h2_header_text, cmd_output_html_text, html_footer_text
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+FLUSH_INTERVAL = 2                                ## seconds, buffered outputs are flushed to files at least this often
+BUFFER_SIZE = 64*1024                             ## bytes, write buffer of each file
+
+# ----------------------------------------------------------------------------------------
+#  Capture File Writer class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureFileWriter():
+	output_file: str                              # device capture log file
+	output_file_html: str                         # device capture html file
+	flush_interval: float = FLUSH_INTERVAL
+	buffer_size: int = BUFFER_SIZE
+
+	def __post_init__(self):
+		self.handles = {}                         ## { file: open handle }, files are opened on first write
+		self.last_flush = monotonic()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ capture outputs ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# starts a new html file (earlier content is overwritten)
+	def html_header(self, device):
+		self.write(self.output_file_html, html_header_text(device), mode='w')
+
+	# hop/mode section header (ex: // JDM CLI //)
+	def section(self, title, output=""):
+		self.write(self.output_file, cmd_output_text(title, output))
+		self.write(self.output_file_html, html_h2_header_text(title))
+
+	def command(self, cmd, output):
+		self.write(self.output_file, cmd_output_text(cmd, output))
+		self.write(self.output_file_html, cmd_output_html_text(cmd, output))
+
+	def html_footer(self):
+		self.write(self.output_file_html, html_footer_text())
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ files ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# writes text to file, mode 'w' truncates file first
+	def write(self, file, text, mode='a'):
+		if mode == 'w' and file in self.handles:
+			self.handles.pop(file).close()
+		if file not in self.handles:
+			self.handles[file] = open(file, mode, buffering=self.buffer_size)
+		self.handles[file].write(text)
+		if monotonic() - self.last_flush >= self.flush_interval: self.flush()
+
+	def flush(self):
+		for handle in self.handles.values():
+			handle.flush()
+		self.last_flush = monotonic()
+
+	# flushes and closes all files (files are reopened on next write)
+	def close(self):
+		while self.handles:
+			self.handles.popitem()[1].close()
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
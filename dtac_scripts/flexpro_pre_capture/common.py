@@ -4,14 +4,17 @@
 #  Imports
 # ----------------------------------------------------------------------------------------
 import pandas as pd
+import datetime as dt
 from tabulate import tabulate
 from nettoolkit.nettoolkit_db import write_to_xl
 
 from .colorprint import print_banner
+from ..capture_index import CaptureLogIndex
 
 # ----------------------------------------------------------------------------------------
 #  Some PreDefined Static Entries
 # ----------------------------------------------------------------------------------------
+MAX_CONNECTIONS = 50                                             ## concurrent connections cap (GUI and daemon jobs)
 
 # ----------------------------------------------------------------------------------------
 #  Some common Functions
@@ -85,6 +88,13 @@ def pull_cmds_lists_dict(pre_capture_command_file):
 
 # ------------------------ [ OPERATIONS ] ------------------------ #
 
+# returns output path of a new capture run ( Sample path will be  ==> "C:/NFV-PreCheck/date/time LT" )
+def get_run_output_path(output_folder):
+	CAPTURED_DATE_TIME = str(dt.datetime.today()).split(".")[0].replace(":", ".") 
+	CAPTURED_DATE = CAPTURED_DATE_TIME.split()[0]
+	CAPTURED_TIME = CAPTURED_DATE_TIME.split()[1][:5] + " LT"
+	return f"{output_folder}/{CAPTURED_DATE}/{CAPTURED_TIME}"
+
 # returns list of vnf list (except vjunos0) containing its (type, index) tuple
 # requires output of commands "show virsh list" to retrive the same.
 def get_vm_device_n_type(op):
@@ -106,7 +116,7 @@ def get_vm_device_n_type(op):
 		return [(None, None)]
 	return vnf_list
 
-# returns dictionary of vnf type and respective vnf ids
+# returns dictionary of vnf type and list of respective vnf ids
 # requires command and output of commands "show virsh list" to retrive the same.
 def get_vnf_type_id(cmd, output):
 	if cmd != "virsh list": return {}
@@ -114,7 +124,8 @@ def get_vnf_type_id(cmd, output):
 	vnf_type_id_list = get_vm_device_n_type(output)
 	for (vnf_type, vnf_id) in vnf_type_id_list:
 		if vnf_type == None or vnf_id == None: continue
-		VNF_TYPE_ID[vnf_type] = vnf_id 
+		VNF_TYPE_ID.setdefault(vnf_type, [])
+		if vnf_id not in VNF_TYPE_ID[vnf_type]: VNF_TYPE_ID[vnf_type].append(vnf_id)
 	return VNF_TYPE_ID
 
 # convert string repr of vlan numbers to integer Ex: Vlan3001 to 3001
@@ -128,32 +139,13 @@ def get_digits(s):
 
 # ------------------------ [ RETRIVE OUTPUT ] ------------------------ #
 
-# get output dictionary from command
+# get output dictionary from command (or list of commands).
+# output of a command is of first captured command starting with it.
 def get_output_from_capture(file, cmd=None):
 	if not cmd: return {}
-	with open(file, 'r') as f:
-		lines = f.readlines()
-	cmd_op_dict = {}
-	if isinstance(cmd, str):
-		cmd_op_dict[cmd] = get_a_cmd_output_from_capture(cmd, lines)
-	elif isinstance(cmd, (list, set, tuple)):
-		for _cmd in cmd:
-			cmd_op_dict[cmd] = get_a_cmd_output_from_capture(cmd, lines)
-	return cmd_op_dict
-
-# get a single command output in list format from full capture lines list
-def get_a_cmd_output_from_capture(cmd, lines):
-	start = False
-	cmd_list = []
-	for line in lines:
-		if line.startswith(f"# Output For command: {cmd}"):
-			start = True
-			continue
-		if start and line.startswith("# Output For command: "):
-			break
-		if not start: continue
-		cmd_list.append(line)
-	return cmd_list
+	cmds = [cmd] if isinstance(cmd, str) else cmd
+	with CaptureLogIndex(file) as index:
+		return { _cmd: index.get_lines(index.find(_cmd)) for _cmd in cmds }
 
 
 # ------------------------ [ WRITE / OUTPUT ] ------------------------ #
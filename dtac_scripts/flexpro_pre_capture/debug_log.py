@@ -0,0 +1,166 @@
+""" Debug log writer.
+Single background writer of device debug logs, shared by all capture threads. Records are queued by
+threads and written by writer thread in batches, as json lines, over one open handle per log file.
+Log files are rotated on size ( <file>.1, <file>.2 .. ).
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from collections import OrderedDict
+from pathlib import Path
+from time import time
+import threading
+import atexit
+import queue
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+MAX_BYTES = 10*1024*1024                          ## debug log file size, rotated beyond
+BACKUP_COUNT = 3                                  ## rotated files kept
+MAX_OPEN_FILES = 256                              ## least recently written files are closed beyond
+BATCH_SIZE = 500                                  ## records written before handles are flushed
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# debug log record of a message, level from message prefix ( [-] error, else info )
+def debug_record(device, msg, pfx="[+]"):
+	return {'time': round(time(), 3), 'device': device, 'level': 'error' if pfx == "[-]" else 'info', 'msg': msg}
+
+# ----------------------------------------------------------------------------------------
+#  Debug Log Writer class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class DebugLogWriter():
+	max_bytes: int = MAX_BYTES
+	backup_count: int = BACKUP_COUNT
+	max_open_files: int = MAX_OPEN_FILES
+	batch_size: int = BATCH_SIZE
+
+	def __post_init__(self):
+		self.queue = queue.Queue()
+		self.handles = OrderedDict()              ## { file: open handle }, most recently written last
+		self.sizes = {}                           ## { file: bytes written }
+		self.lock = threading.Lock()
+		self.writer = None
+		self.error_reported = False
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ producers ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# queue a record for file (returns immediately)
+	def write(self, file, record):
+		self.start()
+		self.queue.put((file, record))
+
+	def start(self):
+		if self.writer: return
+		with self.lock:
+			if self.writer: return
+			self.writer = threading.Thread(target=self._run, name='debug-log-writer', daemon=True)
+			self.writer.start()
+
+	# waits till all queued records are written and flushed
+	def flush(self):
+		if self.writer: self.queue.join()
+
+	# writes queued records, stops writer and closes all files
+	def close(self):
+		with self.lock:
+			writer, self.writer = self.writer, None
+		if not writer: return
+		self.queue.put(None)
+		writer.join()
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ writer ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def _run(self):
+		while True:
+			batch = [self.queue.get()]
+			while batch[-1] is not None and len(batch) < self.batch_size:
+				try:
+					batch.append(self.queue.get_nowait())
+				except queue.Empty:
+					break
+			stop = batch[-1] is None
+			try:
+				self._write_batch([ item for item in batch if item is not None ])
+			except Exception as e:
+				self._report_error(e)
+			finally:
+				for _ in batch: self.queue.task_done()
+			if stop:
+				self._close_handles()
+				return
+
+	# records grouped per file, written with one write call per file, and flushed
+	def _write_batch(self, batch):
+		lines = OrderedDict()
+		for file, record in batch:
+			lines.setdefault(file, []).append(json.dumps(record) + "\n")
+		for file, file_lines in lines.items():
+			text = "".join(file_lines)
+			try:
+				handle = self._handle(file, len(text))
+				handle.write(text)
+				self.sizes[file] += len(text)
+			except Exception as e:
+				self._report_error(e)
+		for handle in self.handles.values():
+			handle.flush()
+
+	# open handle of file (rotated first if text would exceed max size)
+	def _handle(self, file, length):
+		if file in self.handles:
+			self.handles.move_to_end(file)
+			if self.sizes[file] and self.sizes[file] + length > self.max_bytes: self._rotate(file)
+		if file not in self.handles:
+			while len(self.handles) >= self.max_open_files:
+				self.handles.popitem(last=False)[1].close()
+			Path(file).parent.mkdir(parents=True, exist_ok=True)
+			self.handles[file] = open(file, 'a')
+			self.sizes[file] = self.handles[file].tell()
+			if self.sizes[file] and self.sizes[file] + length > self.max_bytes: self._rotate(file)
+		return self.handles[file]
+
+	# <file> => <file>.1 => <file>.2 .. (oldest beyond backup count is removed)
+	def _rotate(self, file):
+		self.handles.pop(file).close()
+		for n in range(self.backup_count - 1, 0, -1):
+			if os.path.exists(f"{file}.{n}"): os.replace(f"{file}.{n}", f"{file}.{n+1}")
+		if self.backup_count:
+			os.replace(file, f"{file}.1")
+		else:
+			os.remove(file)
+		self.handles[file] = open(file, 'a')
+		self.sizes[file] = 0
+
+	def _close_handles(self):
+		for handle in self.handles.values():
+			handle.close()
+		self.handles.clear()
+
+	def _report_error(self, e):
+		if self.error_reported: return
+		self.error_reported = True
+		print_banner(f"[-] Writing debug log failed\n{e}")
+
+# ----------------------------------------------------------------------------------------
+#  Shared writer, of all capture threads
+# ----------------------------------------------------------------------------------------
+DEBUG_LOG_WRITER = DebugLogWriter()
+atexit.register(DEBUG_LOG_WRITER.close)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
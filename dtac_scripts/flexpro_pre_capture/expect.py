@@ -0,0 +1,61 @@
+""" Pattern driven channel reads.
+Waits for an expected prompt/string to appear on channel instead of sleeping a fixed delay.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+import re
+from time import monotonic, sleep
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+POLL_INTERVAL = 0.1                                            ## seconds between two channel reads
+
+## patterns are (name, regex) tuples, evaluated in given sequence (first one has priority)
+YES_NO_PATTERN     = ('yes_no', r"\(yes/no(/\[fingerprint\])?\)")
+PASSWORD_PATTERN   = ('password', r"(asscode|sword)[^\n]*$")
+LOGIN_PATTERN      = ('login', r"login:\s*$")
+LOGIN_ERR_PATTERN  = ('error', r"(Could not resolve|Connection refused|Connection timed out|No route to host|Permission denied|Connection closed)")
+PROMPT_PATTERN     = ('prompt', r"[\$#%>]\s*$")
+CLI_PROMPT_PATTERN = ('prompt', r">\s*$")
+LOGOUT_PATTERN     = ('logout', r"(logout|closed\.)")
+PING_REPLY_PATTERN = ('reply', r"(bytes from|[Uu]nreachable|unknown host|100% packet loss)")
+PING_STATS_PATTERN = ('stats', r"packet loss")
+
+## device prompt is appended to below by caller, as prompt_pattern_except(<jump server prompt>)
+DEVICE_LOGIN_PATTERNS = [YES_NO_PATTERN, PASSWORD_PATTERN, LOGIN_ERR_PATTERN]
+AFTER_PASSWORD_PATTERNS = [LOGIN_ERR_PATTERN, PASSWORD_PATTERN]
+EXIT_PATTERNS = [LOGOUT_PATTERN, PROMPT_PATTERN]
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# prompt pattern, not matching when last line of output ends with given prompt (ex: jump server prompt, still in buffer)
+def prompt_pattern_except(prompt):
+	prompt = prompt.strip()
+	if not prompt: return PROMPT_PATTERN
+	return ('prompt', rf"(?m)^(?![^\n]*{re.escape(prompt)}\s*\Z)[^\n]*[\$#%>]\s*\Z")
+
+# keeps on reading channel until any of given patterns appears in collected output or timeout expires.
+# `read_channel` is a non-blocking read function (ex: netmiko read_channel)
+# returns tuple of (matched pattern name, collected output), pattern name will be None on timeout.
+def read_until(read_channel, patterns, timeout=10, poll_interval=POLL_INTERVAL):
+	compiled = [ (name, re.compile(pattern)) for name, pattern in patterns ]
+	end_time = monotonic() + timeout
+	output = ""
+	while True:
+		output += read_channel()
+		for name, rx in compiled:
+			if rx.search(output): return name, output
+		if monotonic() >= end_time: return None, output
+		sleep(poll_interval)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == "__main__":
+	pass
+# ----------------------------------------------------------------------------------------
@@ -8,13 +8,21 @@ from nettoolkit.nettoolkit_common import Multi_Execution, create_folders
 from nettoolkit.nettoolkit_common import print_banner as display_banner
 from dataclasses import dataclass, field
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from time import sleep, time
 
-from .flex_login import FlexLogin, cmd_output_to_file
+from .flex_login import FlexLogin, is_timeout_error
 from .common import get_output_from_capture, write_csv, write_interface_summary, write_cmd_exec_summary, print_report
 from .colorprint import print_banner
 from .validations import InteractiveOutputValidators, ExternalOutputValidators, Interface_Output_Capture_Validations, InterfaceOutputValidators
-from .save_to_html import html_file_header, html_file_footer, html_file_h2_header
+from .capture_writer import CaptureFileWriter
+from ..capture_store import output_lines
+from ..capture_index import CaptureLogIndex, find_command
+from .capture_manifest import CaptureManifest
+from .poller_scheduler import ACQUIRE_TIMEOUT
+from .tracing import trace_span
+from .debug_log import DEBUG_LOG_WRITER, debug_record
 
 
 # ------------------------------------------------------------------------------------------------------------------
@@ -31,13 +39,39 @@ class DeviceCapture():
 	commands: dict = field(default_factory={})
 	debug: bool = True
 
+	## class variable
+	max_parallel_hops = 6                         ## max concurrent hop sub captures (JCP/NMTE/VNFs) of a device
+	acquire_timeout = ACQUIRE_TIMEOUT             ## seconds, wait for a free scheduler slot before going to planned poller anyway
+
 	def __post_init__(self):
 		self.FL = None
 		self.pc_jcp = True
 		self.pc_nmte = True
 		self.pc_velovm = True
+		self.poller_pool = None
+		self.jdm_proxy_jump = False
+		self.reachability = {}
+		self.pipeline_commands = False
+		self.timeout_profile = None
+		self.manifest = None                      ## CaptureManifest, completed hops/commands are not captured again
+		self.poller_health = None                 ## PollerHealth, device is moved to a healthy poller if assigned one is unhealthy
+		self.pollers = [self.poller]              ## candidate pollers for failover
+		self.scheduler = None                     ## PollerScheduler, poller is chosen by rtt/load at connect time
+		self.scheduled_poller = None              ## poller whose scheduler slot is held by this device
+		self.parallel_hops = False                ## capture JCP/NMTE/VNFs concurrently, each over own poller channel and JDM session
+		self.parallel_vnfs = True                 ## capture multiple VNFs concurrently (each over own virsh console)
+		self.vnfs_status = {}                     ## { vnf_type: { vnf_id: status } }
+		self.outputs = OrderedDict()              ## { cmd: output } of all hops in capture order (first capture of a command kept, as in capture file)
+		self.tracer = None                        ## CaptureTracer, hop logins (and session commands) are timed as spans
+		self.metrics = None                       ## CaptureMetrics, session commands and poller sessions are counted to it
+		self.capture_store = None                 ## CaptureStore, session command outputs are recorded to it
+		self.hop_login_timeouts = []              ## login timeouts of merged hop captures
+		self.hop_sections = []                    ## [ (hop, mode, title, output), ] sections of hop capture, recorded to capture store at merge
 		self.p = Path(self.output_file)
 		self.output_file_html = str(self.p.parent.joinpath(self.p.stem + ".html"))
+		self.resume_file = self.output_file       ## capture file, outputs of commands completed in earlier run are read from
+		self.debug_log_file = f"{self.output_file}-debug.log"
+		self.capture_writer = CaptureFileWriter(self.output_file, self.output_file_html)    ## output files are kept open for device session
 		self.captures_report_dict = OrderedDict()
 		self.captures_report_dict['Status'] = 'Not Initiated'
 		self.captures_report_dict['JDM'] = 'Not Initiated'
@@ -45,8 +79,19 @@ class DeviceCapture():
 		self.captures_report_dict['NMTE'] = 'Not Initiated'
 		self.captures_report_dict['VNF-VRT'] = 'Not Initiated'
 
+	# tracing span, tagged with device and poller (no-op without tracer)
+	def span(self, name, cat='capture', **tags):
+		return trace_span(self.tracer, name, cat=cat, **dict({'device': self.device, 'poller': self.poller}, **tags))
+
 	def __call__(self):
+		try:
+			self.capture()
+		finally:
+			self.capture_writer.close()
+
+	def capture(self):
 		# 1. Server connection
+		self.restore_hops_status()
 		server_init = self.initialize_jump_server_connection()
 		if not server_init: return
 
@@ -54,13 +99,13 @@ class DeviceCapture():
 		jdm_shell_connection = self.connect_to_jdm()
 		if jdm_shell_connection['connected']:
 
-			html_file_header(self.device, file=self.output_file_html)
+			if not (self.manifest and self.manifest.has_progress(self.device)):
+				self.capture_writer.html_header(self.device)
 
 			# 2.1 JDM CLI Captures 
 			mode = 'shell'
 			if self.output_file:
-				cmd_output_to_file(" // JDM SHELL // ", output="", file=self.output_file)
-				html_file_h2_header(" // JDM SHELL // ", file=self.output_file_html)
+				self.capture_section(" // JDM SHELL // ", 'JDM', mode)
 			op_dict = self.get_commands_output_dict(dev='JDM', mode=mode, at_prompt=jdm_shell_connection['prompt'])
 			self.FL.captured_outputs[self.device_ip][mode].update(op_dict)
 
@@ -71,18 +116,17 @@ class DeviceCapture():
 				# 2.2.1 JDM CLI Captures
 				mode = 'cli'
 				if self.output_file:
-					cmd_output_to_file(" // JDM CLI // ", output="", file=self.output_file)
-					html_file_h2_header(" // JDM CLI // ", file=self.output_file_html)
+					self.capture_section(" // JDM CLI // ", 'JDM', mode)
 				op_dict = self.get_commands_output_dict(dev='JDM', mode=mode, at_prompt=jdm_cli_connection['prompt'])
 				self.FL.captured_outputs[self.device_ip][mode].update(op_dict)
-				self.captures_report_dict['JDM'] = 'OK'
+				self.hop_completed('JDM')
 
 				# 2.2.2 JCP Login 
-				if self.pc_jcp:
+				if self.pc_jcp and not self.is_hop_complete('JCP') and not self.parallel_hops:
 					self.jcp_login()
 
 				# 2.2.3 NMTE Login 
-				if self.pc_nmte:
+				if self.pc_nmte and not self.is_hop_complete('NMTE') and not self.parallel_hops:
 					self.nmte_login()
 
 				# 2.2.9 come out of cli
@@ -92,7 +136,9 @@ class DeviceCapture():
 					self.write_debug_log(f"Premature Exited", pfx="[-]", onscreen=True)
 
 			# 2.3 VNFS Login
-			if self.pc_velovm:
+			if self.parallel_hops:
+				self.parallel_hops_capture(jdm_cli_connected=jdm_cli_connection['connected'])
+			elif self.pc_velovm:
 				self.vnfs_login()
 
 			# 2.9 Exit jdm shell
@@ -101,7 +147,7 @@ class DeviceCapture():
 			except OSError:
 				self.write_debug_log(f"Premature Exited", pfx="[-]", onscreen=True)
 
-			html_file_footer(file=self.output_file_html)
+			self.capture_writer.html_footer()
 
 		else:
 			pass
@@ -111,11 +157,41 @@ class DeviceCapture():
 			self.FL.exit()                                 ## /// exit from server
 		except OSError:
 			self.write_debug_log(f"Premature Exited", pfx="[-]", onscreen=True)
+		self.FL.release_jump_server()
 
 		#
-		if (self.captures_report_dict['JDM'] == self.captures_report_dict['JCP'] == self.captures_report_dict['NMTE'] == self.captures_report_dict['VNF-VRT'] == 'OK'):
+		if all(status == 'OK' for hop, status in self.captures_report_dict.items() if hop != 'Status'):
 			self.captures_report_dict['Status'] = 'Success'
 
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ checkpoints ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# hops completed in earlier (interrupted) run, are reported OK
+	def restore_hops_status(self):
+		if not self.manifest: return
+		for hop, status in self.manifest.hops_status(self.device).items():
+			if status == 'OK' and hop in self.captures_report_dict: self.captures_report_dict[hop] = status
+
+	def is_hop_complete(self, hop):
+		return bool(self.manifest) and self.manifest.is_hop_complete(self.device, hop)
+
+	def hop_completed(self, hop):
+		self.captures_report_dict[hop] = 'OK'
+		if self.manifest: self.manifest.mark_hop(self.device, hop, 'OK')
+
+	# outputs of commands captured in earlier run, retrived from capture file. evaluators are re-run on them.
+	# commands missing in capture file (ex: earlier run stopped before its output was written) are not returned.
+	def load_captured_outputs(self, cmds):
+		op_dict = OrderedDict()
+		if not cmds: return op_dict
+		with CaptureLogIndex(self.resume_file) as index:
+			for cmd in cmds:
+				if cmd not in index:
+					self.write_debug_log(f"{cmd}: output of earlier run not found in capture, capturing again", pfx="[-]", onscreen=False)
+					continue
+				op_dict[cmd] = index.get_text(cmd)
+				self.FL.run_command_evaluator(cmd, op_dict[cmd])
+				self.FL.command_exec_summary[cmd] = 'Success'
+		return op_dict
 
 
 
@@ -130,26 +206,77 @@ class DeviceCapture():
 			self.write_debug_log(f"Unable to Initialize Server {self.poller} instance", pfx="[-]", onscreen=True)
 			return False
 		try:
+			self.FL.poller_pool = self.poller_pool
+			self.FL.jdm_proxy_jump = self.jdm_proxy_jump
+			self.FL.reachability = self.reachability
+			self.FL.pipeline_commands = self.pipeline_commands
+			self.FL.timeout_profile = self.timeout_profile
+			self.FL.poller_health = self.poller_health
+			self.FL.tracer = self.tracer
+			self.FL.metrics = self.metrics
+			self.FL.capture_store = self.capture_store
 			self.FL.interactive_command_evaluator = InteractiveOutputValidators
 			self.FL.instance_identifier = self.device
 			self.FL.output_file = self.output_file
 			self.FL.output_file_html = self.output_file_html
+			self.FL.capture_writer = self.capture_writer
 			self.FL.debug = self.debug
 		except:
 			self.write_debug_log(f"Unable to set Server {self.poller} Initial Parameters", pfx="[-]", onscreen=True)
 			return False
 		try:
-			self.FL.connect_jump_server()
+			self.connect_jump_server()
 			return True
-		except:
+		except Exception as e:
 			self.write_debug_log(f"Unable to connect to Server {self.poller}", pfx="[-]", onscreen=True)
+			if is_timeout_error(e): self.FL.login_timeouts.append(self.poller)
 			return {'connected': False}
 
+	# devices (or poller) whose login/connect timed out, in device session and its hop captures
+	@property
+	def login_timeouts(self):
+		return (self.FL.login_timeouts if self.FL else []) + self.hop_login_timeouts
+
+	# connects poller, device is reassigned to another poller when 
+	# scheduler finds a better (nearer/less loaded) one, assigned poller is unhealthy, or fails to connect.
+	def connect_jump_server(self):
+		tried = []
+		while True:
+			poller = self.select_poller(exclude=tried)
+			if not poller: raise Exception("No healthy poller available")
+			if poller != self.poller:
+				self.write_debug_log(f"Reassigned from poller {self.poller} to {poller}", pfx="[+]", onscreen=True)
+				self.poller = poller
+				self.FL.change_server(poller)
+			try:
+				return self.FL.connect_jump_server()
+			except:
+				tried.append(self.poller)
+				self.release_poller()
+				if not (self.scheduler or self.poller_health): raise
+
+	# planned poller (self.poller, as assigned by dict_info) is preferred by scheduler while it has a free slot
+	def select_poller(self, exclude):
+		if self.scheduler:
+			self.scheduled_poller = self.scheduler.acquire(self.device_ip, preferred=self.poller, exclude=exclude, timeout=self.acquire_timeout)
+			return self.scheduled_poller
+		if self.poller_health:
+			return self.poller_health.pick(self.poller, self.pollers, exclude=exclude)
+		return self.poller
+
+	# frees scheduler slot held on poller
+	def release_poller(self):
+		if self.scheduler and self.scheduled_poller:
+			self.scheduler.release(self.scheduled_poller)
+			self.scheduled_poller = None
+
 	def connect_to_jdm(self):
 		try:
-			jdm_shell_connection = self.FL.connect_device(device=self.device_ip, 
-														 username=self.dyn_vars['username'], 
-										  				 password=self.dyn_vars['jdm_pw'])
+			with self.span('login', cat='login', hop='JDM') as tags:
+				jdm_shell_connection = self.FL.connect_device(device=self.device_ip, 
+															 username=self.dyn_vars['username'], 
+											  				 password=self.dyn_vars['jdm_pw'])
+				tags['connected'] = jdm_shell_connection['connected']
 			if not jdm_shell_connection['connected']:
 				self.captures_report_dict['Status'] = "Unable to Login"
 				self.write_debug_log(f"Unable to connect to JDM", pfx="[-]", onscreen=True)
@@ -161,7 +288,8 @@ class DeviceCapture():
 
 	def change_to_jdm_cli(self):
 		try:
-			jdm_cli_connection = self.FL.change_mode_to_cli()
+			with self.span('cli', cat='login', hop='JDM'):
+				jdm_cli_connection = self.FL.change_mode_to_cli()
 			if not jdm_cli_connection['connected']:
 				self.captures_report_dict['Status'] = "Partial Captures"
 				self.write_debug_log(f"Unable to connect to JDM CLI", pfx="[-]", onscreen=True)
@@ -178,9 +306,11 @@ class DeviceCapture():
 
 		### Connect to switch ###
 		try:
-			jcp_shell_connection = self.FL.connect_device(device=login_string, 
-														  username='', 
-														  password=self.dyn_vars['jcp_pw'])
+			with self.span('login', cat='login', hop='JCP') as tags:
+				jcp_shell_connection = self.FL.connect_device(device=login_string, 
+															  username='', 
+															  password=self.dyn_vars['jcp_pw'])
+				tags['connected'] = jcp_shell_connection['connected']
 			if not jcp_shell_connection['connected']: 
 				self.captures_report_dict['Status'] = "Partial Captures"
 				self.write_debug_log(f"Unable to connect to JCP", pfx="[-]", onscreen=True)
@@ -191,7 +321,8 @@ class DeviceCapture():
 
 		### Change to CLI ###
 		try:
-			jcp_cli_connection = self.FL.change_mode_to_cli()
+			with self.span('cli', cat='login', hop='JCP'):
+				jcp_cli_connection = self.FL.change_mode_to_cli()
 			if not jcp_cli_connection['connected']:
 				self.captures_report_dict['Status'] = "Partial Captures"
 				self.write_debug_log(f"Unable to connect to JCP CLI", pfx="[-]", onscreen=True)
@@ -204,8 +335,7 @@ class DeviceCapture():
 		if jcp_cli_connection['connected']:
 			mode = 'cli'
 			if self.output_file:
-				cmd_output_to_file(" // JCP - SWITCH CLI // ", output="", file=self.output_file)
-				html_file_h2_header(" // JCP - SWITCH CLI // ", file=self.output_file_html)
+				self.capture_section(" // JCP - SWITCH CLI // ", 'JCP', mode)
 			op_dict = self.get_commands_output_dict(dev='JCP', mode=mode, at_prompt=jcp_cli_connection['prompt'])
 			self.FL.captured_outputs[self.device_ip][mode].update(op_dict)
 			# ------------------------------------------------------------------------------------------------------ #
@@ -216,7 +346,7 @@ class DeviceCapture():
 			# 	additional_show_int_commands = self.FL.command_evaluation_results['show interfaces terse | no-more']
 			# 	self.FL.captured_outputs[login_string][mode].update(self.FL.execute_commands( additional_show_int_commands, at_prompt=jcp_cli_connection['prompt'] ))
 			# ------------------------------------------------------------------------------------------------------ #
-			self.captures_report_dict['JCP'] = 'OK'
+			self.hop_completed('JCP')
 			self.FL.exit()                             ## /// exit from jcp cli
 		#
 		self.FL.exit()                                 ## /// exit from jcp shell
@@ -227,9 +357,11 @@ class DeviceCapture():
 
 		### Connect to NMTE ###
 		try:
-			nmte_shell_connection = self.FL.connect_device(device=login_string, 
-														  username='', 
-														  password=self.dyn_vars['nm_te_pw'])
+			with self.span('login', cat='login', hop='NMTE') as tags:
+				nmte_shell_connection = self.FL.connect_device(device=login_string, 
+															  username='', 
+															  password=self.dyn_vars['nm_te_pw'])
+				tags['connected'] = nmte_shell_connection['connected']
 			if not nmte_shell_connection['connected']: 
 				self.captures_report_dict['Status'] = "Partial Captures"
 				self.write_debug_log(f"Unable to connect to NMTE", pfx="[-]", onscreen=True)
@@ -240,7 +372,8 @@ class DeviceCapture():
 
 		### Change to CLI ###
 		try:
-			nmte_cli_connection = self.FL.change_mode_to_cli()
+			with self.span('cli', cat='login', hop='NMTE'):
+				nmte_cli_connection = self.FL.change_mode_to_cli()
 			if not nmte_cli_connection['connected']:
 				self.captures_report_dict['Status'] = "Partial Captures"
 				self.write_debug_log(f"Unable to connect to NMTE CLI", pfx="[-]", onscreen=True)
@@ -253,86 +386,275 @@ class DeviceCapture():
 		if nmte_cli_connection['connected']:
 			mode = 'cli'
 			if self.output_file:
-				cmd_output_to_file(" // NMTE CLI // ", output="", file=self.output_file)
-				html_file_h2_header(" // NMTE CLI // ", file=self.output_file_html)
+				self.capture_section(" // NMTE CLI // ", 'NMTE', mode)
 			op_dict = self.get_commands_output_dict(dev='NMTE', mode=mode, at_prompt=nmte_cli_connection['prompt'])
 			self.FL.captured_outputs[self.device_ip][mode].update(op_dict)
-			self.captures_report_dict['NMTE'] = 'OK'
+			self.hop_completed('NMTE')
 			self.FL.exit()                             ## /// exit from nmte cli
 		#
 		self.FL.exit()                                 ## /// exit from nmte shell
 
-	#  VELO VNF Login and command capture from existing session
-	def velo_vm_login(self, vnf_type, vnf_id):
-		# // VNF - Velo Login and capture //
+	#  VNF Login (over virsh console) and command capture from existing session, commands selected by VNF type.
+	#  VNF login credentials are taken from creds as `<type>_un` and `<type>_pw` (ex: vrt_un, vrt_pw)
+	def vnf_console_login(self, vnf_type, vnf_id):
 		GS = "\x1D"                                 	## ==> CTRL+"]"
+		vnf_name = f"{vnf_type}-{vnf_id}"
 		try:
-			velo_console = self.FL.connect_device_other(login_string=f"virsh console {vnf_id}\n\n", 
-													device='VRT',
-													username=self.dyn_vars['vrt_un'], 
-													password=self.dyn_vars['vrt_pw'])
+			with self.span('console login', cat='login', hop=f"VNF-{vnf_name}") as tags:
+				vnf_console = self.FL.connect_device_other(login_string=f"virsh console {vnf_id}\n\n", 
+														device=vnf_name,
+														username=self.dyn_vars.get(f'{vnf_type.lower()}_un', ''), 
+														password=self.dyn_vars.get(f'{vnf_type.lower()}_pw', ''))
+				tags['connected'] = vnf_console['connected']
 		except:
-			self.captures_report_dict['VNF-VRT'] = "Console Connect Failed"
-			self.write_debug_log(f"Unable to connect to VNF-Velo Console", pfx="[-]", onscreen=True)
+			self.set_vnf_status(vnf_type, vnf_id, "Console Connect Failed")
+			self.write_debug_log(f"Unable to connect to VNF-{vnf_name} Console", pfx="[-]", onscreen=True)
 			return False
 		#
-		if velo_console['connected']:
+		if vnf_console['connected']:
 			mode = 'shell'                          ## default
+			title = " // VELO VM CONSOLE // " if vnf_type == 'VRT' else f" // VNF {vnf_type} CONSOLE // "
 			if self.output_file:
-				cmd_output_to_file(" // VELO VM CONSOLE // ", output="", file=self.output_file)
-				html_file_h2_header(" // VELO VM CONSOLE // ", file=self.output_file_html)
-			op_dict = self.FL.execute_commands(self.commands[vnf_type][mode], at_prompt=velo_console['prompt'])
-			self.FL.captured_outputs[vnf_type][mode].update()
-			self.captures_report_dict['VNF-VRT'] = 'OK'
-			self.FL.exit()                             ## /// exit from nmte cli
+				self.capture_section(title, vnf_name, mode, output=f"VNF ID: {vnf_id}")
+			op_dict = self.get_commands_output_dict(dev=vnf_type, mode=mode, at_prompt=vnf_console['prompt'], hop=vnf_name)
+			self.FL.captured_outputs[vnf_name][mode].update(op_dict)
+			self.set_vnf_status(vnf_type, vnf_id, 'OK')
+			self.FL.exit()                             ## /// exit from vnf shell
 			self.FL.exit(spl_char=GS)
 			return True
 		else:
 			self.captures_report_dict['Status'] = "Partial Captures"
-			self.write_debug_log(f"Unable to connect to Velo-VNF", pfx="[-]", onscreen=True)
-			self.captures_report_dict['VNF-VRT'] = "Console Failed"
+			self.write_debug_log(f"Unable to connect to VNF-{vnf_name}", pfx="[-]", onscreen=True)
+			self.set_vnf_status(vnf_type, vnf_id, "Console Failed")
 			return False
 
+	# updates status of a vnf. report key `VNF-<type>` is OK only if all vnfs of that type are OK, 
+	# else lists failed ones (ex: 'Console Failed (3)').
+	def set_vnf_status(self, vnf_type, vnf_id, status):
+		self.vnfs_status.setdefault(vnf_type, OrderedDict())[vnf_id] = status
+		failed = [ f"{st} ({i})" for i, st in self.vnfs_status[vnf_type].items() if st != 'OK' ]
+		self.captures_report_dict[f"VNF-{vnf_type}"] = ", ".join(failed) if failed else 'OK'
+		if status == 'OK' and self.manifest: 
+			self.manifest.mark_hop(self.device, f"VNF-{vnf_type}-{vnf_id}", 'OK')
 
 
-	## Add more vm_login methods as and when identified
-
-
-	#  Retrive VNF Types and VNF IDs from virsh list output
-	#  Login to VNFS from existing session
-	def vnfs_login(self):
-		# ---- RETRIVE VM TYPE AND ID LIST
+	#  Retrive VNF Types and VNF IDs from virsh list output, returns { vnf_type: [vnf_ids,] }
+	def get_vnf_type_id(self):
 		try:
 			VNF_TYPE_ID = {}
 			if self.FL.command_evaluation_results.get('virsh list'):
 				VNF_TYPE_ID = self.FL.command_evaluation_results['virsh list']
 		except:
 			self.write_debug_log(f"Unable to parse `virsh list` output, VNFs unidentified", pfx="[-]", onscreen=True)
-			return False
+			return None
 		##
 		if not VNF_TYPE_ID:
 			self.write_debug_log(f"No VNFs unidentified", pfx="[-]", onscreen=True)
-			return False
+			return None
+		return VNF_TYPE_ID
+
+	#  list of (vnf_type, vnf_id) to be captured. VNFs without commands are skipped, 
+	#  VNFs captured in earlier run are reported OK.
+	def pending_vnfs(self):
+		vnfs = []
+		for vnf_type, vnf_ids in (self.get_vnf_type_id() or {}).items():
+			if not self.commands.get(vnf_type):
+				self.write_debug_log(f"No Commands defined yet for VNF {vnf_type}", pfx="[-]", onscreen=True)
+				continue
+			for vnf_id in vnf_ids:
+				if self.is_hop_complete(f"VNF-{vnf_type}-{vnf_id}"):
+					self.set_vnf_status(vnf_type, vnf_id, 'OK')
+					continue
+				vnfs.append((vnf_type, vnf_id))
+		return vnfs
+
+	#  Login to VNFS. single VNF from existing session, 
+	#  multiple VNFs concurrently, each over own poller channel, JDM session and virsh console.
+	def vnfs_login(self):
+		vnfs = self.pending_vnfs()
+		if len(vnfs) > 1 and self.parallel_vnfs:
+			self.run_hop_captures([ (f"VNF-{vnf_type}-{vnf_id}", 'vnf_console_login', (vnf_type, vnf_id), False) for vnf_type, vnf_id in vnfs ])
+			return
 		#
 		# ---- Capture of VMs
-		for vnf_type, vnf_id in VNF_TYPE_ID.items():
-			if vnf_type == 'VRT':
-				self.velo_vm_login(vnf_type, vnf_id)
-			### ---- ADD MORE AS NEED ---- ####
-			else:
-				self.write_debug_log(f"No Commands defined yet for VNF {vnf_type}", pfx="[-]", onscreen=True)
-
-
-	def get_commands_output_dict(self, dev, mode, at_prompt):
-		return self.FL.execute_commands(self.commands[dev][mode], at_prompt=at_prompt)
+		for vnf_type, vnf_id in vnfs:
+			self.vnf_console_login(vnf_type, vnf_id)
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ parallel hops ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# captures JCP, NMTE and each VNF concurrently, each one over own poller channel and JDM session.
+	def parallel_hops_capture(self, jdm_cli_connected):
+		hops = []                                 ## [ (report key, login method, args, login from jdm cli), ]
+		if jdm_cli_connected and self.pc_jcp and not self.is_hop_complete('JCP'):
+			hops.append(('JCP', 'jcp_login', (), True))
+		if jdm_cli_connected and self.pc_nmte and not self.is_hop_complete('NMTE'):
+			hops.append(('NMTE', 'nmte_login', (), True))
+		if self.pc_velovm:
+			for vnf_type, vnf_id in self.pending_vnfs():
+				hops.append((f"VNF-{vnf_type}-{vnf_id}", 'vnf_console_login', (vnf_type, vnf_id), False))
+		self.run_hop_captures(hops)
+
+	# runs hop sub captures concurrently (max `max_parallel_hops` at a time).
+	# outputs are captured in part files, merged to device capture files in given hops order.
+	def run_hop_captures(self, hops):
+		if not hops: return
+		sub_captures = [ self.hop_capture(*hop) for hop in hops ]
+		with ThreadPoolExecutor(max_workers=min(len(sub_captures), self.max_parallel_hops)) as executor:
+			list(executor.map(lambda sub_capture: sub_capture(), sub_captures))
+		for sub_capture in sub_captures:
+			self.merge_hop_capture(sub_capture)
+
+	def hop_capture(self, hop, login_method, login_args, at_jdm_cli):
+		part_file = str(self.p.parent.joinpath(f"{self.p.stem}.{hop}.part.log"))
+		sub_capture = HopCapture(
+			poller=self.poller,
+			device=self.device,
+			device_ip=self.device_ip,
+			output_file=part_file,
+			passphrase=self.passphrase,
+			dyn_vars=self.dyn_vars,
+			commands=self.commands,
+			debug=self.debug,
+			hop=hop,
+			login_method=login_method,
+			login_args=login_args,
+			at_jdm_cli=at_jdm_cli,
+		)
+		sub_capture.poller_pool = self.poller_pool
+		sub_capture.poller_health = self.poller_health
+		sub_capture.pollers = self.pollers
+		sub_capture.scheduler = self.scheduler
+		sub_capture.jdm_proxy_jump = self.jdm_proxy_jump
+		sub_capture.reachability = self.reachability
+		sub_capture.pipeline_commands = self.pipeline_commands
+		sub_capture.timeout_profile = self.timeout_profile
+		sub_capture.manifest = self.manifest
+		sub_capture.tracer = self.tracer
+		sub_capture.metrics = self.metrics
+		sub_capture.capture_store = self.capture_store
+		sub_capture.resume_file = self.output_file
+		sub_capture.debug_log_file = self.debug_log_file
+		return sub_capture
+
+	# merge sub capture outputs, results and part files to device capture
+	def merge_hop_capture(self, sub_capture):
+		if sub_capture.login_method == 'vnf_console_login':
+			vnf_type, vnf_id = sub_capture.login_args
+			status = sub_capture.vnfs_status.get(vnf_type, {}).get(vnf_id) or sub_capture.captures_report_dict.get(sub_capture.hop)
+			self.set_vnf_status(vnf_type, vnf_id, status)
+		else:
+			status = sub_capture.captures_report_dict.get(sub_capture.hop)
+			self.captures_report_dict[sub_capture.hop] = status
+		if status != 'OK': self.captures_report_dict['Status'] = "Partial Captures"
+		if sub_capture.FL:
+			for dev, modes in sub_capture.FL.captured_outputs.items():
+				for mode, op_dict in modes.items():
+					self.FL.captured_outputs.setdefault(dev, {}).setdefault(mode, {}).update(op_dict)
+			self.FL.command_exec_summary.update(sub_capture.FL.command_exec_summary)
+			self.FL.command_evaluation_results.update(sub_capture.FL.command_evaluation_results)
+		for cmd, output in sub_capture.outputs.items():
+			self.outputs.setdefault(cmd, output)
+		self.hop_login_timeouts.extend(sub_capture.login_timeouts)
+		for section in sub_capture.hop_sections:
+			self.store_section(*section)
+		for part_file, file in ((sub_capture.output_file, self.output_file), (sub_capture.output_file_html, self.output_file_html)):
+			part = Path(part_file)
+			if not part.exists(): continue
+			self.capture_writer.write(file, part.read_text())
+			part.unlink()
+
+
+	# hop/mode section header to capture files and capture store (compare tool rebuilds capture log from store)
+	def capture_section(self, title, hop, mode, output=""):
+		self.capture_writer.section(title, output=output)
+		self.store_section(hop, mode, title, output)
+
+	def store_section(self, hop, mode, title, output):
+		if not self.capture_store: return
+		try:
+			self.capture_store.record(self.device, hop, mode, title, output, 'Section', start_time=time())
+		except Exception as e:
+			self.write_debug_log(f"storing section {title} failed\n{e}", pfx="[-]", onscreen=False)
+
+	# executes commands of device/mode, commands already completed (as per manifest) are read from capture file instead.
+	# `hop` distinguishes multiple instances of same device type (ex: VNFs), defaults to dev
+	def get_commands_output_dict(self, dev, mode, at_prompt, hop=None):
+		hop_mode = f"{hop or dev}-{mode}"
+		self.FL.current_hop = f"{dev}-{mode}"
+		self.FL.capture_hop, self.FL.capture_mode = hop or dev, mode
+		cmds = self.commands[dev][mode]
+		done = self.manifest.completed_commands(self.device, hop_mode) if self.manifest else set()
+		outputs = self.load_captured_outputs([ cmd for cmd in cmds if cmd in done ])
+		outputs.update(self.FL.execute_commands([ cmd for cmd in cmds if cmd not in outputs ], at_prompt=at_prompt))
+		if self.manifest: 
+			self.capture_writer.flush()                    ## outputs are on disk before commands are checkpointed
+			self.manifest.mark_commands(self.device, hop_mode, [ cmd for cmd, output in outputs.items() if output != 'failed' ])
+		for cmd in cmds:
+			if outputs.get(cmd, 'failed') != 'failed': self.outputs.setdefault(cmd, outputs[cmd])
+		return OrderedDict([ (cmd, outputs[cmd]) for cmd in cmds if cmd in outputs ])
 
 	# print and/or write log message ( debug write controlled via local debug variable)
 	def write_debug_log(self, msg, pfx="[+]", onscreen=True):
-		s = f"{pfx} {self.device}: {msg}"
-		if onscreen: print_banner(s)
+		if onscreen: print_banner(f"{pfx} {self.device}: {msg}")
 		if self.debug:
-			with open(f"{self.output_file}-debug.log", 'a') as f:
-				f.write(s)
+			DEBUG_LOG_WRITER.write(self.debug_log_file, debug_record(self.device, msg, pfx))
+
+# ------------------------------------------------------------------------------------------------------------------
+#  A single hop (JCP/NMTE/VNF) sub-capture of device, over own poller channel and JDM session (parallel hops)
+# ------------------------------------------------------------------------------------------------------------------
+@dataclass
+class HopCapture(DeviceCapture):
+	hop: str = ''                                 # report key of hop (ex: JCP, NMTE, VNF-VRT)
+	login_method: str = ''                        # DeviceCapture hop login method name (ex: jcp_login)
+	login_args: tuple = ()
+	at_jdm_cli: bool = False                      # hop login from JDM cli (True) or JDM shell (False)
+
+	## class variable
+	acquire_timeout = 10                          ## seconds, short wait for a scheduler slot, as device slot is held meanwhile (slots held by devices waiting for their hops would stall)
+
+	def __call__(self):
+		Path(self.output_file).unlink(missing_ok=True)             ## part file of an interrupted earlier run
+		Path(self.output_file_html).unlink(missing_ok=True)
+		try:
+			with self.span('hop capture', cat='device', hop=self.hop):
+				self.capture_hop()
+		except Exception as e:
+			self.captures_report_dict[self.hop] = "Capture Failed"
+			self.write_debug_log(f"{self.hop} capture failed\n{e}", pfx="[-]", onscreen=True)
+		finally:
+			self.release_poller()
+			if self.FL: self.FL.release_jump_server()
+			self.capture_writer.close()                                ## part files are complete before merge
+			if self.capture_store: self.capture_store.disconnect()     ## store connection of hop thread
+
+	def capture_hop(self):
+		if self.initialize_jump_server_connection() is not True:
+			self.captures_report_dict[self.hop] = "Poller Connect Failed"
+			return
+		jdm_shell_connection = self.connect_to_jdm()
+		if not jdm_shell_connection['connected']:
+			self.captures_report_dict[self.hop] = "JDM Login Failed"
+		else:
+			at_prompt_ok = True
+			if self.at_jdm_cli:
+				at_prompt_ok = self.change_to_jdm_cli()['connected']
+				if not at_prompt_ok: self.captures_report_dict[self.hop] = "JDM CLI Failed"
+			if at_prompt_ok:
+				self.__getattribute__(self.login_method)(*self.login_args)
+			if self.at_jdm_cli and at_prompt_ok:
+				self.exit_session()                        ## /// exit from jdm cli
+			self.exit_session()                            ## /// exit from jdm shell
+		self.exit_session()                                ## /// exit from server
+
+	# sections are recorded by device capture at merge (part files are merged in hops order)
+	def store_section(self, *section):
+		self.hop_sections.append(section)
+
+	def exit_session(self):
+		try:
+			self.FL.exit()
+		except OSError:
+			self.write_debug_log(f"Premature Exited", pfx="[-]", onscreen=True)
 
 # ========================================== ========================================== #
 
@@ -368,17 +690,99 @@ class FlxConnectCapture(Multi_Execution):
 		self.pc_nmte = True
 		self.pc_velovm = True
 		self.debug = True
+		self.poller_pool = None                          ## PollerPool shared by all device sessions (optional)
+		self.jdm_proxy_jump = False                      ## connect JDM over direct-tcpip tunnel through poller
+		self.reachability = AP.reachability              ## reachability probe results, to skip repeated ping before login
+		self.pipeline_commands = False                   ## write commands in batches instead of one round trip per command
+		self.timeout_profile = None                      ## CommandTimeoutProfile, learned per command read timeouts
+		self.manifest = None                             ## CaptureManifest of output_path, checkpoints for resuming an interrupted run
+		self.poller_health = AP.poller_health            ## PollerHealth shared with action_info, for poller failover
+		self.pollers = AP.servers_list
+		self.scheduler = AP.scheduler                    ## PollerScheduler shared with action_info (rtt measured by probe)
+		self.parallel_hops = False                       ## capture JCP/NMTE/VNFs of a device concurrently
+		self.parallel_vnfs = True                        ## capture multiple VNFs of a device concurrently
+		self.progress_callback = None                    ## function(device, state, **info), called on device capture progress
+		self.retry_budget = 0                            ## retry rounds for failed devices, at end of run (0 to disable)
+		self.retry_backoff = 10                          ## seconds before first retry round, doubled on each next round
+		self.tracer = None                               ## CaptureTracer, capture stages are timed as spans (exported by caller)
+		self.metrics = None                              ## CaptureMetrics, live run counters, written periodically in output_path while capturing
+		self.capture_store = None                        ## CaptureStore of run (optional), offline validations read outputs from it instead of capture files
+		self.login_timed_out_devices = set()             ## devices with a hop login/connect timed out in their last attempt (retriable)
 
 	def __call__(self):
 		create_folders([self.output_path,], silent=False)
+		self.manifest = CaptureManifest(self.output_path)
+		if self.metrics:
+			self.metrics.set_devices_total(len(self.items))
+			self.metrics.start()
+		try:
+			self.run_captures()
+			self.retry_failed_devices()
+		finally:
+			self.manifest.flush()                        ## pending checkpoints, also on interrupted run
+			if self.metrics: self.metrics.stop()
+			if self.capture_store: self.capture_store.close()
+			if self.AP.ip_cache: self.AP.ip_cache.save()    ## ips of devices failed to connect are removed
+			DEBUG_LOG_WRITER.flush()                     ## queued debug records of run
+		if self.timeout_profile:
+			self.timeout_profile.save()
+
+	def run_captures(self):
 		self.start()
 
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ retries ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# devices failed due to login/connect failures are requeued at end of run, with exponential backoff between rounds.
+	# hops and commands completed in earlier attempt are not captured again (as per manifest).
+	def retry_failed_devices(self):
+		all_items = self.items
+		for attempt in range(1, self.retry_budget+1):
+			failed_items = [ item for item in all_items if self.is_retriable(item['device']) ]
+			if not failed_items: break
+			delay = self.retry_backoff * 2**(attempt-1)
+			print_banner(f"[+] Retry {attempt}/{self.retry_budget}: {len(failed_items)} device(s) failed, retrying in {delay} seconds")
+			sleep(delay)
+			for item in failed_items:
+				self.reset_device_capture(item['device'])
+			self.items = failed_items
+			self.run_captures()
+		self.items = all_items
+
+	# device is retriable if it couldn't be accessed, or login/connect of any of its hops timed out.
+	# other hop failures (ex: login rejected) are not retried.
+	def is_retriable(self, device):
+		report = self.devices_reports.get(device)
+		if not report: return True
+		return report.get('Status') == 'Not Accessible' or device in self.login_timed_out_devices
+
+	# device without any captured command is captured afresh, remove its partial output files.
+	def reset_device_capture(self, device):
+		if self.manifest.has_progress(device): return
+		for file in (f"{self.output_path}/{device}.log", f"{self.output_path}/{device}.html"):
+			Path(file).unlink(missing_ok=True)
+
 	# Kick
 	def execute(self, action_device_info):
+		try:
+			self.capture_device(action_device_info)
+		finally:
+			if self.capture_store: self.capture_store.disconnect()      ## store connection of device thread
+
+	def capture_device(self, action_device_info):
 		#
 		device    = action_device_info['device'] 
 		device_ip = action_device_info['device_ip']
 		output_file = f"{self.output_path}/{device}.log"
+		self.report_progress(device, 'capturing', server=action_device_info['server'])
+		#
+		if self.manifest.is_device_complete(device):
+			print_banner(f"[+] {device}: Captured in earlier run, skipping capture.")
+			info = self.manifest.device_info(device)
+			self.update_device_reports(device, output_file, info['captures_report'])
+			if info.get('command_exec_summary'):
+				self.devices_command_exec_summary[device] = info['command_exec_summary']
+			self.report_progress(device, 'finished', status=info['captures_report'].get('Status'))
+			return
 		#
 		DC = DeviceCapture(
 			poller=action_device_info['server'],
@@ -393,53 +797,114 @@ class FlxConnectCapture(Multi_Execution):
 		DC.pc_jcp = self.pc_jcp
 		DC.pc_nmte = self.pc_nmte
 		DC.pc_velovm = self.pc_velovm
-		DC()
+		DC.poller_pool = self.poller_pool
+		DC.jdm_proxy_jump = self.jdm_proxy_jump
+		DC.reachability = self.reachability
+		DC.pipeline_commands = self.pipeline_commands
+		DC.timeout_profile = self.timeout_profile
+		DC.manifest = self.manifest
+		DC.poller_health = self.poller_health
+		DC.pollers = self.pollers
+		DC.scheduler = self.scheduler
+		DC.parallel_hops = self.parallel_hops
+		DC.parallel_vnfs = self.parallel_vnfs
+		DC.tracer = self.tracer
+		DC.metrics = self.metrics
+		DC.capture_store = self.capture_store
+		try:
+			with DC.span('device capture', cat='device') as tags:
+				DC()
+				tags['status'] = DC.captures_report_dict['Status']
+		finally:
+			DC.release_poller()
+			if DC.FL: DC.FL.release_jump_server()          ## if capture aborted before releasing it
 		FL = DC.FL
 		captures_report_dict = DC.captures_report_dict
+		if DC.login_timeouts:
+			self.login_timed_out_devices.add(device)
+		else:
+			self.login_timed_out_devices.discard(device)
 		#
 		if FL.captured_outputs[device_ip]['shell']:
-
-			### collect reports
-			int_validation_dict, int_para_dict, int_to_sys_para = self.int_var_validator(output_file)
-			system_validation_dict = self.sys_var_validator(output_file)
-			
-			### update reports
-			self.devices_interface_reports[device] = int_para_dict
-
-			system_validation_dict.update(int_validation_dict)
-			system_validation_dict.update(int_to_sys_para)
-
-			self.devices_reports[device] = {}
-			self.devices_reports[device].update(system_validation_dict)
-			self.devices_reports[device].update(self.AP.devices_report[device])
-			self.devices_reports[device].update(captures_report_dict)
+			self.update_device_reports(device, output_file, captures_report_dict, outputs=DC.outputs)
 		else:
 			self.devices_reports[device] = {'Hostname':device, 'Status': "Not Accessible"}
+			self.AP.forget_device_ip(device)
 			print_banner(f"[-] {device}: Unable to Access Device.")
 
 		if FL.command_exec_summary:
 			self.devices_command_exec_summary[device] = FL.command_exec_summary
 
+		self.manifest.mark_device(device, status=captures_report_dict['Status'], 
+			captures_report=dict(captures_report_dict), command_exec_summary=FL.command_exec_summary,
+		)
+		self.report_progress(device, 'finished', status=self.devices_reports[device].get('Status'))
+
+	def report_progress(self, device, state, **info):
+		if self.metrics and state == 'capturing': self.metrics.device_started(device)
+		if self.metrics and state == 'finished': self.metrics.device_finished(device, info.get('status'))
+		if not self.progress_callback: return
+		try:
+			self.progress_callback(device, state, **info)
+		except Exception as e:
+			print_banner(f"[-] {device}: progress update failed\n{e}")
+
+	# collect and update reports of a device, from its in-memory captured outputs ( {cmd: output} ) if given, 
+	# else offline from its capture store / capture file (ex: device captured in earlier run)
+	def update_device_reports(self, device, output_file, captures_report_dict, outputs=None):
+		### collect reports
+		with trace_span(self.tracer, 'validations', cat='validation', device=device, offline=outputs is None):
+			validation_outputs = self.get_validation_outputs(output_file, outputs)
+			int_validation_dict, int_para_dict, int_to_sys_para = self.int_var_validator(validation_outputs)
+			system_validation_dict = self.sys_var_validator(validation_outputs)
+		
+		### update reports
+		self.devices_interface_reports[device] = int_para_dict
+
+		system_validation_dict.update(int_validation_dict)
+		system_validation_dict.update(int_to_sys_para)
+
+		self.devices_reports[device] = {}
+		self.devices_reports[device].update(system_validation_dict)
+		self.devices_reports[device].update(self.AP.devices_report[device])
+		self.devices_reports[device].update(captures_report_dict)
+
+	# output lines of a command, from capture store outputs of device (if has it), else from capture file index.
+	# output is of first captured command starting with cmd (as in capture file).
+	def get_capture_output(self, cmd, store_outputs, capture_index):
+		captured_cmd = find_command(store_outputs, cmd)
+		if captured_cmd: return output_lines(captured_cmd, store_outputs[captured_cmd])
+		return capture_index.get_lines(capture_index.find(cmd))
+
+	# { cmd: output lines } of validator commands, from captured outputs if given, else read from capture store / file
+	def get_validation_outputs(self, output_file, outputs=None):
+		cmds = list(ExternalOutputValidators) + list(InterfaceOutputValidators)
+		if outputs is not None:
+			return { cmd: output_lines(cmd, outputs.get(find_command(outputs, cmd))) for cmd in cmds }
+		store_outputs = self.capture_store.device_outputs(Path(output_file).stem) if self.capture_store else {}
+		with CaptureLogIndex(output_file) as capture_index:
+			return { cmd: self.get_capture_output(cmd, store_outputs, capture_index) for cmd in cmds }
 
 	# a device system variable validations
-	@staticmethod
-	def sys_var_validator(output_file):
+	def sys_var_validator(self, validation_outputs):
 		validation_dict = {}
 		for cmd, fn in ExternalOutputValidators.items():
-			output = get_output_from_capture(output_file, cmd)[cmd]
-			dic = fn(cmd, output)
+			with trace_span(self.tracer, fn.__name__, cat='validation', cmd=cmd):
+				output = validation_outputs[cmd]
+				dic = fn(cmd, output)
 			if output:
 				validation_dict.update(dic)
 		return validation_dict
 
 	# a device interfaces variables validations
-	def int_var_validator(self, output_file):
+	def int_var_validator(self, validation_outputs):
 		int_validation_dict = {}
 		IOCV = Interface_Output_Capture_Validations()
 		for cmd, fn in InterfaceOutputValidators.items():
-			output = get_output_from_capture(output_file, cmd)[cmd]
-			if not output: continue
-			IOCV.__getattribute__(fn)(cmd, output)
+			with trace_span(self.tracer, fn, cat='validation', cmd=cmd):
+				output = validation_outputs[cmd]
+				if not output: continue
+				IOCV.__getattribute__(fn)(cmd, output)
 		flatten_int_para_dict = IOCV.flatten_int_para_dict
 		flatten_int_para_dict.update(IOCV.lan_connected_interfaces)
 		flatten_int_para_dict.update(IOCV.wan_connected_interfaces)
@@ -471,9 +936,10 @@ class FlxConnectCapture(Multi_Execution):
 	def write_csv(self):
 		try:
 			if self.output_csv_report_file:
-				write_csv(self.devices_reports, self.output_csv_report_file, 
-					report_cols=self.output_csv_report_file_col_seq
-				)
+				with trace_span(self.tracer, 'write_csv', cat='report', file=self.output_csv_report_file):
+					write_csv(self.devices_reports, self.output_csv_report_file, 
+						report_cols=self.output_csv_report_file_col_seq
+					)
 		except:
 			print_banner(f"[-] Writing CSV Report Failed...")
 
@@ -481,16 +947,18 @@ class FlxConnectCapture(Multi_Execution):
 	def write_interface_summary(self):
 		try:
 			if self.output_intf_summary_report_file:
-				write_interface_summary(self.devices_interface_reports, self.output_intf_summary_report_file,
-					rows=self.INTERFACE_SUMMARY_REPORT_FILE_ROWS_SEQ, cols=self.INTERFACE_SUMMARY_REPORT_FILE_COLS_SEQ
-				)
+				with trace_span(self.tracer, 'write_interface_summary', cat='report', file=self.output_intf_summary_report_file):
+					write_interface_summary(self.devices_interface_reports, self.output_intf_summary_report_file,
+						rows=self.INTERFACE_SUMMARY_REPORT_FILE_ROWS_SEQ, cols=self.INTERFACE_SUMMARY_REPORT_FILE_COLS_SEQ
+					)
 		except:
 			print_banner(f"[-] Writing Interface Summary Report Failed...")
 
 	def write_cmd_exec_summary(self):
 		try:
 			if self.output_cmds_exec_summary_report_file:
-				write_cmd_exec_summary(self.devices_command_exec_summary, self.output_cmds_exec_summary_report_file)
+				with trace_span(self.tracer, 'write_cmd_exec_summary', cat='report', file=self.output_cmds_exec_summary_report_file):
+					write_cmd_exec_summary(self.devices_command_exec_summary, self.output_cmds_exec_summary_report_file)
 		except:
 			print_banner(f"[-] Writing Command Execution Summary Report Failed...")
 
@@ -7,28 +7,70 @@
 from dataclasses import dataclass
 from netmiko import ConnectHandler, redispatch
 import netmiko
-from time import sleep
+import re
+from time import time, sleep
+from uuid import uuid4
+import socket
 from collections import OrderedDict
 
 from .colorprint import print_banner
 from .save_to_html import cmd_output_to_html_file
+from .tracing import trace_span
+from .debug_log import DEBUG_LOG_WRITER, debug_record
+from ..capture_store import cmd_output_text
+from .expect import read_until, prompt_pattern_except, DEVICE_LOGIN_PATTERNS, AFTER_PASSWORD_PATTERNS, EXIT_PATTERNS, PROMPT_PATTERN, CLI_PROMPT_PATTERN, PING_REPLY_PATTERN, PING_STATS_PATTERN
 
 # ----------------------------------------------------------------------------------------
 #  Some PreDefined Static Entries
 # ----------------------------------------------------------------------------------------
 SERVER_TYPE = 'terminal_server'
 CTRL_C = '\003'
+PIPELINE_MARKER = 'DTAC-END'
+TERMINAL_WIDTH = 511                            ## pty width requested by netmiko (and pool channels), ssh hops from it inherit it
+CONSOLE_WIDTH = 80                              ## serial console (virsh console) sessions, pty width is not propagated
 
 # ------------------------------------------------------------------------------------------------------
 #  Local Functions
 # ------------------------------------------------------------------------------------------------------
 
+# True for connect/read timeouts (transient, login can be retried), False for others (ex: authentication failure)
+def is_timeout_error(e):
+	return isinstance(e, (socket.timeout, TimeoutError, netmiko.exceptions.NetmikoTimeoutException, netmiko.exceptions.ReadTimeout))
+
 # writes provided command and its output to given file (append mode)
 def cmd_output_to_file(cmd, output, file):
-	dbl_line = f"# {'='*80}\n"
-	s = f"\n{dbl_line}# Output For command: {cmd}\n{dbl_line}\n{output}\n"
 	with open(file, 'a') as f:
-		f.write(s)
+		f.write(cmd_output_text(cmd, output))
+
+# boundary patterns of a pipelined shell batch: echo of chained command line, then marker line echoed after each command
+def shell_pipeline_boundaries(markers):
+	return [ rf"echo {re.escape(markers[-1])}[ \t]*\n" ] + [ rf"\n{re.escape(marker)}[ \t]*\n" for marker in markers ]
+
+# boundary patterns of a pipelined cli batch: echo line of each command (typed ahead, echoed after prompt), then final prompt
+def cli_pipeline_boundaries(cmds, prompt):
+	prompt = re.escape(prompt.strip())
+	echoes = [ rf"(?:^|\n)(?:{prompt})?[ \t]*{re.escape(cmds[0])}[ \t]*\n" ]
+	echoes += [ rf"\n{prompt}[ \t]*{re.escape(cmd)}[ \t]*\n" for cmd in cmds[1:] ]
+	return echoes + [ rf"\n{prompt}[ \t]*$" ]
+
+# finds boundaries of pipelined output, in sequence, from `found` boundaries onwards.
+# `found` is list of (arrival time, match start, match end) of boundaries found so far, extended in place.
+def find_pipeline_boundaries(output, boundaries, found, arrival_time):
+	pos = found[-1][2] if found else 0
+	for boundary in boundaries[len(found):]:
+		m = re.search(boundary, output[pos:])
+		if not m: break
+		found.append((arrival_time, pos + m.start(), pos + m.end()))
+		pos += m.end()
+	return found
+
+# splits pipelined output by found boundaries (output of n-th command is between boundaries n and n+1)
+# returns dictionary of {cmd: (output, start time, duration)} for commands whose both boundaries found.
+def split_pipelined_output(cmds, output, found):
+	cmd_op_dict = OrderedDict()
+	for cmd, (start_time, _, start), (end_time, end, _) in zip(cmds, found, found[1:]):
+		cmd_op_dict[cmd] = (output[start:end].strip("\n"), start_time, end_time - start_time)
+	return cmd_op_dict
 
 # ------------------------------------------------------------------------------------------------------
 #   FLEX LOGIN BASE CLASS
@@ -45,6 +87,9 @@ class FlexLogin():
 	# Class variables
 	read_timeout_override = 18                  ## overriding netmiko `read_timeout` from 10 to 18 seconds for sluggish output (ex. MD5 check)
 	GS = "\x1D"                                 ## hex code of CTRL+"]"
+	jdm_device_type = 'terminal_server'         ## netmiko device type for JDM session opened over tunnel (any prompt: shell, cli, sub hops)
+	reachability_ttl = 300                      ## seconds, a reachability probe result younger than this skips device ping
+	pipeline_batch_size = 10                    ## number of commands written at once in pipelined mode
 
 	def __post_init__(self):
 		# other instance variables initializations
@@ -55,9 +100,26 @@ class FlexLogin():
 		self.interactive_command_evaluator = None
 		self.output_file = None
 		self.output_file_html = None
+		self.capture_writer = None                ## CaptureFileWriter, keeps output files open for device session (else files are opened per command)
 		self.command_evaluation_results = {}
 		self.max_connections = 100
 		self.command_exec_summary = {}
+		self.poller_pool = None                     ## PollerPool, if set poller session is a channel on pooled transport
+		self.jdm_proxy_jump = False                 ## reach JDM over direct-tcpip channel through poller instead of typing ssh on poller shell
+		self.jump_conn = None                       ## poller connection, while JDM tunnel session is active
+		self.tunnel_prompt = None
+		self.reachability = {}                      ## shared probe results { ip: {'reachable': bool, 'time': epoch, ..} } (ActionPollers)
+		self.pipeline_commands = False              ## write batch of commands at once, instead of waiting prompt for each command
+		self.timeout_profile = None                 ## CommandTimeoutProfile, learned per command read timeouts
+		self.current_hop = ''                       ## hop name of active session (ex: JDM-cli), key for timeout profile
+		self.capture_hop = ''                       ## hop (ex: JDM, VNF-VRT-1) and mode (ex: cli) of active session, as recorded in capture store
+		self.capture_mode = ''
+		self.capture_store = None                   ## CaptureStore, command outputs/results are recorded to it as commands finish
+		self.poller_health = None                   ## PollerHealth, poller connect latency/failures are recorded to it
+		self.tracer = None                          ## CaptureTracer, poller connect, ping and commands are timed as spans
+		self.metrics = None                         ## CaptureMetrics, commands, output bytes and poller sessions are counted to it
+		self.login_timeouts = []                    ## devices (or poller) whose login/connect timed out in this session
+		self.terminal_width = TERMINAL_WIDTH        ## width of active session terminal, chained command lines are kept within it
 		self._set_jump_server_initial_parameters()
 
 	## ~~~~~~~~~~~~~~~~~~~~~~~~ Locals ~~~~~~~~~~~~~~~~~~~~~~~~ ##
@@ -74,10 +136,34 @@ class FlexLogin():
 		if not self.conn: return 
 		return self.conn.write_channel(command)
 
-	def get_output(self, cmd):
+	def get_output(self, cmd, read_timeout=None):
 		if not self.conn: return "" 
+		if read_timeout: return self.conn.send_command(cmd, read_timeout=read_timeout)
 		return self.conn.send_command(cmd)
 
+	# wait till any of given patterns appears on channel (or timeout), returns (matched pattern name, output)
+	def wait_for(self, patterns, timeout):
+		return read_until(self.read_channel, patterns, timeout=timeout)
+
+	# discards pending channel output (ex: prompt echoed after a break), till channel is quiet for `quiet` seconds
+	def clear_channel(self, quiet=0.1, timeout=2):
+		end_time = time() + timeout
+		while time() < end_time:
+			sleep(quiet)
+			if not self.read_channel(): return
+
+	# tracing span, tagged with device, poller and hop of session (no-op without tracer)
+	def span(self, name, cat='capture', **tags):
+		return trace_span(self.tracer, name, cat=cat, **self.trace_tags(tags))
+
+	# tracing span timed by caller, epoch start/end times (ex: command of a pipelined batch)
+	def trace_timed(self, name, start_time, end_time, cat='capture', **tags):
+		if not self.tracer: return
+		self.tracer.add_timed(name, cat, start_time, end_time, self.trace_tags(tags))
+
+	def trace_tags(self, tags):
+		return dict({'device': self.instance_identifier, 'poller': self.server, 'hop': self.current_hop}, **tags)
+
 	## ~~~~~~~~~~~~~~~~~~~~~~~~ internals ~~~~~~~~~~~~~~~~~~~~~~~~ ##
 
 	def _set_jump_server_initial_parameters(self):
@@ -106,25 +192,23 @@ class FlexLogin():
 		if device_type:
 			redispatch(self.conn, device_type)
 
-	def _connect_vnf_prompts(self, expected_string, enter_string):
+	def _connect_vnf_prompts(self, expected_string, enter_string, prompt_timeout=5):
 		RETRY_COUNT= 2
 		expected_string_appear = False
 		for x in range(RETRY_COUNT):
-			output = self.read_channel()
-			if expected_string in str(output):
+			matched, output = self.wait_for([('expected', re.escape(expected_string))], timeout=prompt_timeout)
+			if matched:
 				self.write_channel(f"{enter_string}\n")
-				sleep(1)
 				expected_string_appear = True
 				break
 			self.write_channel("\n")
-			sleep(1)
 		return expected_string_appear or not enter_string
 
-	def connect_vnf_login_username(self, username):
-		return self._connect_vnf_prompts('login', username)
+	def connect_vnf_login_username(self, username, prompt_timeout=5):
+		return self._connect_vnf_prompts('login', username, prompt_timeout)
 
-	def connect_vnf_login_password(self, password):
-		return self._connect_vnf_prompts('assword', password)
+	def connect_vnf_login_password(self, password, prompt_timeout=5):
+		return self._connect_vnf_prompts('assword', password, prompt_timeout)
 
 
 	## ~~~~~~~~~~~~~~~~~~~~~~~~ Connections ~~~~~~~~~~~~~~~~~~~~~~~~ ##
@@ -132,26 +216,69 @@ class FlexLogin():
 	# Login to Jump Server
 	def connect_jump_server(self):
 		self.write_debug_log(f"Connecting to {self.server}", pfx="[+]")
-		self.conn = ConnectHandler(**self.jump_server_parameters)
+		start = time()
+		try:
+			with self.span('poller connect', cat='poller', pooled=bool(self.poller_pool)):
+				if self.poller_pool:
+					self.conn = self.poller_pool.get_connection(self.server)
+				else:
+					self.conn = ConnectHandler(**self.jump_server_parameters)
+		except:
+			if self.poller_health: self.poller_health.record_failure(self.server, time()-start)
+			raise
+		if self.poller_health: self.poller_health.record_success(self.server, time()-start)
+		if self.metrics: self.metrics.session_opened(self.server)
 		self.write_debug_log(f"Connected to {self.server}", pfx="[+]")
 
-	# pinging device (3 attempts default)
+	# switch to another poller (before connecting)
+	def change_server(self, server):
+		self.server = server
+		self._set_jump_server_initial_parameters()
+
+	# Release pooled poller channel (transport remains open for other sessions),
+	# or disconnect own poller connection (its transport would otherwise stay open till end of run)
+	def release_jump_server(self):
+		self.close_tunnel()
+		if not self.conn: return
+		if self.metrics: self.metrics.session_closed(self.server)
+		if self.poller_pool:
+			self.poller_pool.release(self.conn)
+		else:
+			try:
+				self.conn.disconnect()
+			except:
+				pass
+		self.conn = None
+
+	# True if device was found reachable by a recent probe
+	def is_recently_reachable(self, device):
+		probe = self.reachability.get(device)
+		return bool(probe and probe['reachable'] and time() - probe['time'] <= self.reachability_ttl)
+
+	# pinging device, waits max `timer` seconds for a reply before breaking it.
 	def ping_device(self, device, timer=3):
 		self.write_debug_log(f"Pinging device {device}", pfx="[+]")
 		command = f"ping {device}\n"
-		self.write_channel(command)
-		sleep(timer)
-		output = self.read_channel()
-		self.write_channel(CTRL_C)
-		self.write_debug_log(output, pfx="[+]", onscreen=False)
-
-	# connecting to device, manipulate delays if disconnect happen prematurely
-	def connect_device(self, device, username, password, device_type='', pass_prompt_delay=5, device_login_delay=1):
+		with self.span('ping', cat='reachability', target=device) as tags:
+			self.write_channel(command)
+			matched, output = self.wait_for([PING_REPLY_PATTERN], timeout=timer)
+			self.write_channel(CTRL_C)
+			_, stats = self.wait_for([PING_STATS_PATTERN], timeout=2)
+			tags['replied'] = bool(matched)
+		self.write_debug_log(output+stats, pfx="[+]", onscreen=False)
+
+	# connecting to device, returns as soon as expected prompt appears. 
+	# manipulate timeouts if device is sluggish in responding.
+	def connect_device(self, device, username, password, device_type='', pass_prompt_timeout=15, device_login_timeout=15):
+		if username and self.jdm_proxy_jump:
+			return self.connect_device_via_tunnel(device, username, password, device_type, conn_timeout=pass_prompt_timeout)
 		self.device = device
 		self.captured_outputs[self.device] = {"shell": {}}
 		if username:
-			self.ping_device(device)
-			sleep(1)
+			if self.is_recently_reachable(device):
+				self.write_debug_log(f"Device {device} reachable in recent probe, skipping ping", pfx="[+]", onscreen=False)
+			else:
+				self.ping_device(device)
 			command = f"ssh {username}@{device}\n" 
 		else:
 			command = f"ssh {device}\n"
@@ -161,29 +288,38 @@ class FlexLogin():
 			self.write_debug_log(f"Connecting to device {device}, {attempt}", pfx="[+]")
 			self.write_debug_log(f"SENDING CMD >>>>\n{command}", pfx="[+]", onscreen=False)
 			current_prompt = self.find_prompt()
+			device_prompt = prompt_pattern_except(current_prompt)       ## jump server prompt is not a device login
+			self.clear_channel()
 			self.write_channel(command)
-			sleep(pass_prompt_delay)
-			output = self.read_channel()
+			matched, output = self.wait_for(DEVICE_LOGIN_PATTERNS + [device_prompt], timeout=pass_prompt_timeout)
 			self.write_debug_log(f"GOT OUTOUT >>>>\n{output}", pfx="[+]", onscreen=False)
-			if output.strip().endswith(device):
+			if not matched and output.strip().endswith(device):
 				self.write_channel(CTRL_C)
 				continue
 			break
 		#
-		if self._is_fingerprint_msg(device, output) or self._is_to_connect_msg(device, output):
+		if matched == 'yes_no':
 			self.write_debug_log(f"sending 'yes'", pfx="[+]", onscreen=False)
 			self.write_channel(f"yes\n")
-			sleep(1)
-			output = self.read_channel()
+			matched, output = self.wait_for(DEVICE_LOGIN_PATTERNS[1:] + [device_prompt], timeout=pass_prompt_timeout)
 		self.write_debug_log(f"GOT OUTOUT >>>>\n{output}", pfx="[+]", onscreen=False)
-		if not self._is_device_login_banner(device, output): 
+		if matched is None:                                          ## neither login prompt nor device prompt appeared
+			return self._login_timed_out(device)
+		if matched == 'error' or not self._is_device_login_banner(device, output): 
 			self.write_debug_log(f"Unable to Connected to device {device}", pfx="[-]", onscreen=False)
 			return {'connected': False, 'prompt': False}
-		if self._is_password_prompt(output):
+		if matched == 'password':
 			self.write_debug_log(f"password Prompt appeared entering password", pfx="[+]", onscreen=False)
 			self.write_debug_log(f"Trying for known password to connect to device {device}")
 			self.write_channel(f"{password}\n")
-		sleep(device_login_delay)
+			matched, output = self.wait_for(AFTER_PASSWORD_PATTERNS + [device_prompt], timeout=device_login_timeout)
+			self.write_debug_log(f"GOT OUTOUT >>>>\n{output}", pfx="[+]", onscreen=False)
+			if matched in ('error', 'password'):
+				self.write_debug_log(f"Login rejected by device {device}", pfx="[-]")
+				self.write_channel(CTRL_C)
+				return {'connected': False, 'prompt': False}
+			if matched is None:                                      ## password accepted, but device prompt didn't appear
+				return self._login_timed_out(device)
 
 		try:
 			self.write_debug_log(f"checking prompt", pfx="[+]", onscreen=False)
@@ -194,42 +330,83 @@ class FlexLogin():
 			self.write_debug_log(f"updating device type {device_type}", pfx="[+]", onscreen=False)
 			self.write_debug_log(f"Connected to device {device}")
 			return {'connected': True, 'prompt': new_prompt}
-		except:
+		except Exception as e:
 			self.write_debug_log(f"Unable to Connect to device {device}", pfx="[-]")
+			if is_timeout_error(e): self.login_timeouts.append(device)
+			return {'connected': False, 'prompt': False}
+
+	# device login which didn't reach device prompt in time, breaks it (back to jump server prompt).
+	def _login_timed_out(self, device):
+		self.write_debug_log(f"Login to device {device} timed out", pfx="[-]")
+		self.login_timeouts.append(device)
+		self.write_channel(CTRL_C)
+		self.clear_channel()
+		return {'connected': False, 'prompt': False}
+
+	# connecting to device over a direct-tcpip channel through poller transport (ProxyJump).
+	# a real SSH session is established to device, poller shell is not in the path.
+	def connect_device_via_tunnel(self, device, username, password, device_type='', conn_timeout=15):
+		self.device = device
+		self.captured_outputs[self.device] = {"shell": {}}
+		self.write_debug_log(f"Connecting to device {device} via tunnel through {self.server}", pfx="[+]")
+		try:
+			transport = self.conn.remote_conn_pre.get_transport()
+			sock = transport.open_channel('direct-tcpip', (device, 22), ('127.0.0.1', 0), timeout=conn_timeout)
+			tunnel_conn = ConnectHandler(ip=device, device_type=device_type or self.jdm_device_type, 
+				username=username, password=password, port=22, sock=sock, conn_timeout=conn_timeout)
+		except Exception as e:
+			self.write_debug_log(f"Unable to Connect to device {device} via tunnel\n{e}", pfx="[-]")
+			if is_timeout_error(e): self.login_timeouts.append(device)
 			return {'connected': False, 'prompt': False}
+		self.jump_conn, self.conn = self.conn, tunnel_conn
+		self.tunnel_prompt = self.find_prompt()
+		self.write_debug_log(f"Connected to device {device}, prompt {self.tunnel_prompt}")
+		return {'connected': True, 'prompt': self.tunnel_prompt}
+
+	# close device tunnel session (if any) and fall back to poller connection
+	def close_tunnel(self):
+		if not self.jump_conn: return
+		self.write_debug_log(f"Closing tunnel to device {self.device}")
+		try:
+			self.conn.disconnect()
+		except:
+			pass
+		self.conn, self.jump_conn, self.tunnel_prompt = self.jump_conn, None, None
 
 	# change device mode to cli mode
-	def change_mode_to_cli(self, device_type='', prompt_delay=2, display_change=False):
+	def change_mode_to_cli(self, device_type='', prompt_timeout=10, display_change=False):
 		self.write_debug_log(f"Changing mode to CLI ")
 		self.captured_outputs[self.device]['cli'] = {}
 		current_prompt = self.find_prompt()
 		self.write_channel(f"cli\n")
-		sleep(prompt_delay)
-		output = self.read_channel()
+		matched, output = self.wait_for([CLI_PROMPT_PATTERN], timeout=prompt_timeout)
+		if not matched:
+			self.write_debug_log(f"CLI prompt did not appear within {prompt_timeout} seconds", pfx="[-]", onscreen=False)
 		self.redispatch(device_type)
 		new_prompt = self.find_prompt()
 		self.write_debug_log(f"Prompt Changed: from {current_prompt} to {new_prompt}")
 		self.write_debug_log(f"mode changed to CLI")
 		return {'connected': True, 'prompt': new_prompt}
 
-	# connect to other sub-device from main devie. tweak delays if need more wait time for next prompt.
-	def connect_device_other(self, login_string, device, username='', password='', device_type='', user_prompt_delay=2, pass_prompt_delay=2, display_change=True):
+	# connect to other sub-device from main devie. tweak timeouts if need more wait time for next prompt.
+	def connect_device_other(self, login_string, device, username='', password='', device_type='', user_prompt_timeout=5, pass_prompt_timeout=5, display_change=True):
 		self.device = device
 		self.captured_outputs[device] = {"shell": {}}
 		enter_user, enter_pass = False, False
 		##
 		self.write_debug_log(f"connecting to device via custom string {login_string}")
 		self.write_channel(f"{login_string}\n")
-		sleep(user_prompt_delay)
 		##
 		self.write_debug_log(f"Trying {username} user login")
-		enter_user = self.connect_vnf_login_username(username)
+		enter_user = self.connect_vnf_login_username(username, prompt_timeout=user_prompt_timeout)
 		##
 		if enter_user: 
 			self.write_debug_log(f"Trying with known password to login")
-			enter_pass = self.connect_vnf_login_password(password)
+			enter_pass = self.connect_vnf_login_password(password, prompt_timeout=pass_prompt_timeout)
 			if not enter_pass:
 				self.write_debug_log(f"No Login Password Prompt appeared")
+			else:
+				self.wait_for([PROMPT_PATTERN], timeout=pass_prompt_timeout)
 		else:
 			self.write_debug_log(f"No Login User Prompt appeared")
 		##
@@ -237,14 +414,17 @@ class FlexLogin():
 		if new_prompt.strip().find("edge") > -1 or new_prompt.strip().find("active") > -1 or new_prompt.strip().find("stand") > -1:
 			self.redispatch(device_type)
 			self.write_debug_log(f"connected to device with custom string {login_string}")
+			self.terminal_width = CONSOLE_WIDTH
 			return {'connected': True, 'prompt': new_prompt}
 		else:
 			ifconfig_op = self._verify_ifconfig_op_for_velo_vm_connection()
 			if ifconfig_op:
 				new_prompt = self.find_prompt()
+				self.terminal_width = CONSOLE_WIDTH
 				return {'connected': True, 'prompt': new_prompt}
 			else:
 				self.write_debug_log(f"connection failed to device with custom string {login_string}", pfx="[-]")
+				if not enter_user: self.login_timeouts.append(device)          ## no login prompt appeared
 				return {'connected': False, 'prompt': False}
 
 	def _verify_ifconfig_op_for_velo_vm_connection(self):
@@ -263,31 +443,173 @@ class FlexLogin():
 	def execute_commands(self, cmds, at_prompt, failed_retry=2, increase_read_timeout_by=5):
 		self.write_debug_log(f"Start Executing list of commands")
 		command_exec_dict = OrderedDict()
-		all_ok = True
-		for cmd in cmds:
-			# _prompt = self.find_prompt()
-			self.write_debug_log(f"  capturing command: {cmd}")
-			cmd_exec = False
-			for _ in range(failed_retry):
-				try:
-					command_exec_dict[cmd] = self.get_output(cmd)
-					if self.output_file:
-						cmd_output_to_file(cmd, output=command_exec_dict[cmd], file=self.output_file)
-						cmd_output_to_html_file(cmd, output=command_exec_dict[cmd], file=self.output_file_html)
-					self.run_command_evaluator(cmd, command_exec_dict[cmd])
-					cmd_exec = True
-					self.command_exec_summary[cmd] = 'Success'
-					break
-				except netmiko.exceptions.ReadTimeout:
-					self.conn.read_timeout_override = self.read_timeout_override
-			if not cmd_exec:
-				self.command_exec_summary[cmd] = 'Failed'
-				self.write_debug_log(f"  capturing command {cmd}.. failed", pfx="[-]")
-				command_exec_dict[cmd] = "failed"
-				all_ok = False
+		if self.pipeline_commands:
+			self.execute_commands_pipelined(cmds, command_exec_dict, failed_retry)
+		else:
+			for cmd in cmds:
+				self.execute_command(cmd, command_exec_dict, failed_retry)
 		self.write_debug_log(f"Completed Executing list of commands")
 		return command_exec_dict
 
+	# execute a command and wait for its output, re-tries with higher read timeout on timeouts.
+	def execute_command(self, cmd, command_exec_dict, failed_retry=2):
+		self.write_debug_log(f"  capturing command: {cmd}")
+		read_timeout = self.get_read_timeout(cmd)
+		for attempt in range(failed_retry):
+			start_time = time()
+			try:
+				with self.span('command', cat='command', cmd=cmd, attempt=attempt+1) as tags:
+					output = self.get_output(cmd, read_timeout)
+					tags['bytes'] = len(output)
+				self.record_duration(cmd, time() - start_time)
+				self.record_command_output(cmd, output, command_exec_dict, start_time=start_time, retries=attempt)
+				return True
+			except netmiko.exceptions.ReadTimeout:
+				self.record_duration(cmd, time() - start_time, timed_out=True)
+				if self.timeout_profile:
+					read_timeout = min(max(read_timeout or 0, self.read_timeout_override) * 2, self.timeout_profile.max_timeout)
+				else:
+					self.conn.read_timeout_override = self.read_timeout_override
+		self.command_exec_summary[cmd] = 'Failed'
+		self.store_command(cmd, None, 'Failed', retries=failed_retry-1)
+		if self.metrics: self.metrics.command_failed()
+		self.write_debug_log(f"  capturing command {cmd}.. failed", pfx="[-]")
+		command_exec_dict[cmd] = "failed"
+		return False
+
+	# read timeout for command from timeout profile, None (netmiko default) if not known
+	def get_read_timeout(self, cmd):
+		if not self.timeout_profile: return None
+		return self.timeout_profile.timeout_for(self.current_hop, cmd)
+
+	def record_duration(self, cmd, duration, timed_out=False):
+		if not self.timeout_profile: return
+		self.timeout_profile.record(self.current_hop, cmd, duration, timed_out)
+
+	# writes command output to output files (and capture store), and runs its evaluator
+	def record_command_output(self, cmd, output, command_exec_dict, start_time=None, retries=0, duration=None):
+		command_exec_dict[cmd] = output
+		if self.capture_writer:
+			self.capture_writer.command(cmd, output)
+		elif self.output_file:
+			cmd_output_to_file(cmd, output=output, file=self.output_file)
+			cmd_output_to_html_file(cmd, output=output, file=self.output_file_html)
+		self.run_command_evaluator(cmd, output)
+		self.command_exec_summary[cmd] = 'Success'
+		self.store_command(cmd, output, 'Success', retries=retries, start_time=start_time, duration=duration)
+		if self.metrics: self.metrics.command_done(output)
+
+	# records command result to capture store (if enabled), duration defaults to time since start_time
+	def store_command(self, cmd, output, status, retries=0, start_time=None, duration=None):
+		if not self.capture_store: return
+		if duration is None and start_time: duration = time() - start_time
+		if duration is not None: duration = round(duration, 3)
+		try:
+			self.capture_store.record(self.instance_identifier, self.capture_hop, self.capture_mode, cmd, output, status, retries, start_time, duration)
+		except Exception as e:
+			self.write_debug_log(f"  storing command {cmd} result failed\n{e}", pfx="[-]", onscreen=False)
+
+	# execute commands in batches, each batch written at once and its output split back per command.
+	# commands which could not be identified in pipelined output are executed one by one.
+	# shell commands are chained in one line with end markers, cli commands are typed ahead (a line each).
+	# duration of each command is from arrival of its start boundary (echo/previous marker) to its end boundary.
+	def execute_commands_pipelined(self, cmds, command_exec_dict, failed_retry=2):
+		prompt = self.find_prompt()
+		at_cli = prompt.rstrip().endswith(">")
+		for batch in self.pipeline_batches(cmds, prompt, chained=not at_cli):
+			if len(batch) == 1:
+				self.execute_command(batch[0], command_exec_dict, failed_retry)
+				continue
+			self.write_debug_log(f"  capturing commands (pipelined): {batch}")
+			try:
+				with self.span('commands pipelined', cat='command', cmds=len(batch)) as tags:
+					outputs = self.get_outputs_pipelined(batch, prompt, at_cli=at_cli)
+					tags['identified'] = len(outputs)
+			except Exception as e:
+				self.write_debug_log(f"  pipelined capture failed, falling back to sequential\n{e}", pfx="[-]", onscreen=False)
+				outputs = {}
+			for cmd in batch:
+				if cmd not in outputs:
+					self.execute_command(cmd, command_exec_dict, failed_retry)
+					continue
+				output, start_time, duration = outputs[cmd]
+				self.trace_timed('command', start_time, start_time + duration, cat='command', cmd=cmd, bytes=len(output), pipelined=True)
+				self.record_duration(cmd, duration)
+				self.record_command_output(cmd, output, command_exec_dict, start_time=start_time, duration=duration)
+
+	# split commands in batches of `pipeline_batch_size`, 
+	# chained command line (after prompt) is kept within terminal width, as a wrapped line echo can't be matched.
+	# (not chained: each command line is kept within terminal width)
+	# a command not fitting in line alone forms its own batch (executed without pipelining).
+	def pipeline_batches(self, cmds, prompt, chained=True):
+		line_length = self.terminal_width - len(prompt.strip()) - 2
+		batches, batch, length = [], [], 0
+		for cmd in cmds:
+			cmd_length = len(cmd) + len(PIPELINE_MARKER) + 25 if chained else len(cmd)
+			line = length + cmd_length if chained else cmd_length
+			if batch and (len(batch) >= self.pipeline_batch_size or line > line_length or length > line_length):
+				batches.append(batch)
+				batch, length = [], 0
+			batch.append(cmd)
+			length = length + cmd_length if chained else max(length, cmd_length)
+		if batch: batches.append(batch)
+		return batches
+
+	# writes all commands at once and split the returned stream back to per command outputs.
+	# shell: commands are chained in a single line with unique end marker echoed after each.
+	# cli: commands are typed ahead, output of each ends at echo of next command (last one at prompt).
+	# a batch not finished in time is broken and drained, so that its output doesn't mix with fallback commands,
+	# only commands finished before timeout are returned. returns {cmd: (output, start time, duration)}
+	def get_outputs_pipelined(self, cmds, prompt, at_cli=False, poll_interval=0.1):
+		if not self.conn or not cmds: return {}
+		if at_cli:
+			boundaries = cli_pipeline_boundaries(cmds, prompt)
+			self.write_channel("".join([ f"{cmd}\n" for cmd in cmds ]))
+		else:
+			markers = [ f"{PIPELINE_MARKER}-{uuid4().hex[:8]}-{n}" for n in range(len(cmds)) ]
+			boundaries = shell_pipeline_boundaries(markers)
+			self.write_channel("; ".join([ f"{cmd}; echo {marker}" for cmd, marker in zip(cmds, markers) ]) + "\n")
+		output, found, completed = self._read_pipelined_output(boundaries, self.get_batch_timeout(cmds), poll_interval)
+		if not completed:
+			self._drain_pipelined_output(boundaries, output, found)
+		return split_pipelined_output(cmds, output, found)
+
+	# total read timeout for a batch of commands
+	def get_batch_timeout(self, cmds):
+		return sum([ self.get_read_timeout(cmd) or self.read_timeout_override for cmd in cmds ])
+
+	# reads channel till all `boundaries` appeared (in sequence) and a prompt is back, or timeout expires.
+	# arrival time of each boundary is the read in which it appeared.
+	# returns tuple of (output (\r removed), found boundaries [(arrival time, start, end),], completed)
+	def _read_pipelined_output(self, boundaries, timeout, poll_interval):
+		end_time = time() + timeout
+		output, found = "", []
+		while time() < end_time:
+			sleep(poll_interval)
+			output += self.read_channel().replace("\r", "")
+			find_pipeline_boundaries(output, boundaries, found, time())
+			if len(found) == len(boundaries) and re.search(PROMPT_PATTERN[1], output):
+				return output, found, True
+		return output, found, False
+
+	# timed out batch: running command is broken (shell doesn't run rest of chained line, cli runs rest of typed
+	# ahead commands), and channel is read till remaining boundaries appeared, or prompt is back and channel is quiet.
+	def _drain_pipelined_output(self, boundaries, output, found, quiet=1, poll_interval=0.1):
+		found = list(found)
+		if len(found) < len(boundaries): self.write_channel(CTRL_C)
+		self.write_debug_log(f"  pipelined batch timed out, draining channel", pfx="[-]", onscreen=False)
+		last_read = time()
+		end_time = last_read + self.read_timeout_override
+		while time() < end_time and len(found) < len(boundaries):
+			data = self.read_channel().replace("\r", "")
+			if data:
+				output, last_read = output + data, time()
+				find_pipeline_boundaries(output, boundaries, found, last_read)
+			elif time() - last_read >= quiet and re.search(PROMPT_PATTERN[1], output):
+				break
+			sleep(poll_interval)
+		self.clear_channel()
+
 	# Command evaluations 
 	# `interactive_command_evaluator` requires to be provided from outside first 
 	# in order to map cmd with validation function
@@ -299,20 +621,23 @@ class FlexLogin():
 
 	## ~~~~~~~~~~~~~~~~~~~~~~~~ Terminations ~~~~~~~~~~~~~~~~~~~~~~~~ ##
 
-	# exit out from current session, 
+	# exit out from current session, returns as soon as previous prompt is back (or exit_timeout expires)
 	# send additional spl_character if need to terminate via different key codes.
-	def exit(self, exit_delay=1, spl_char=None):
+	def exit(self, exit_timeout=5, spl_char=None):
 		self.write_debug_log(f"Exiting out")
 		try:
 			current_prompt = self.find_prompt()
 		except:
-			new_prompt = None
+			current_prompt = None
+		if self.jump_conn and current_prompt in (self.tunnel_prompt, None):   ## exit from tunneled device session
+			return self.close_tunnel()
 		###			
 		if spl_char: 
 			self.write_channel(spl_char)
+			if spl_char == self.GS: self.terminal_width = TERMINAL_WIDTH       ## console escaped, back to ssh session
 		else:
 			self.write_channel("exit\n")
-		sleep(exit_delay)
+		self.wait_for(EXIT_PATTERNS, timeout=exit_timeout)
 		###			
 		try:
 			new_prompt = self.find_prompt()
@@ -321,12 +646,12 @@ class FlexLogin():
 		self.write_debug_log(f"Prompt Changed: from {current_prompt} to {new_prompt}")
 
 	# exit out completely.
-	def bye(self, display_change=False):
+	def bye(self, display_change=False, exit_timeout=5):
 		self.write_debug_log(f"Pulling out")
 		while True:
 			try:
 				self.write_channel("exit\n")
-				sleep(1)
+				self.wait_for(EXIT_PATTERNS, timeout=exit_timeout)
 				prompt = self.find_prompt()
 			except:
 				break
@@ -337,12 +662,11 @@ class FlexLogin():
 		return True
 
 	# print and/or write log message ( debug write controlled via local debug variable )
+	# debug record is queued to shared debug log writer, written in background.
 	def write_debug_log(self, msg, pfx="[+]", onscreen=True):
-		s = f"{pfx} {self.instance_identifier}: {msg}"
-		if onscreen: print_banner(s)
+		if onscreen: print_banner(f"{pfx} {self.instance_identifier}: {msg}")
 		if self.debug:
-			with open(f"{self.output_file}-debug.log", 'a') as f:
-				f.write(s)
+			DEBUG_LOG_WRITER.write(f"{self.output_file}-debug.log", debug_record(self.instance_identifier, msg, pfx))
 
 # ------------------------------------------------------------------------------------------------------
 #   MAIN
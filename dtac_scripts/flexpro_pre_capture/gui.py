@@ -6,11 +6,19 @@ import PySimpleGUI as sg
 from nettoolkit.nettoolkit.forms.formitems import *
 from nettoolkit.nettoolkit_common import open_text_file, open_folder
 from collections import OrderedDict
-import datetime as dt
 
 from .flex_connect import FlxConnectCapture
 from .identify_pollers import ActionPollers
-from .common import pull_variables, pull_cmds_lists_dict
+from .poller_pool import PollerPool
+from .poller_health import PollerHealth
+from .poller_scheduler import PollerScheduler
+from .ip_cache import DeviceIPCache
+from .timeout_profile import CommandTimeoutProfile
+from .capture_manifest import get_last_run_folder
+from .tracing import CaptureTracer, TRACE_FILE
+from .capture_metrics import CaptureMetrics
+from ..capture_store import CaptureStore, STORE_FILE
+from .common import pull_variables, pull_cmds_lists_dict, get_run_output_path, MAX_CONNECTIONS
 from .colorprint import print_banner
 
 # -----------------------------------------------------------------------------------
@@ -25,6 +33,9 @@ POLLERS = [
 	'rlpv12151.gcsc.att.com',
 	'rlpv12152.gcsc.att.com',
 ]
+IP_CACHE_FILE = '.dtac_ip_cache.json'                           ## device ip cache file, within output folder
+IP_CACHE_TTL = 3*24*60*60                                       ## seconds
+TIMEOUT_PROFILE_FILE = '.dtac_cmd_timeouts.json'                ## learned command timeouts file, within output folder
 
 # -----------------------------------------------------------------------------------
 #  Define all your frames here 
@@ -66,6 +77,26 @@ def dtac_pre_capture():
 		[sg.Text('Concurrent connections:\t', text_color="black"), 
 		 sg.InputText(12,  key='pc_max_connections', size=(5,1) ), sg.Text('Use 1 for sequential', text_color="white"), 
 		],
+		[sg.Text('action_info sessions:\t', text_color="black"), 
+		 sg.InputText(1,  key='pc_sessions_per_poller', size=(5,1) ), sg.Text('per poller', text_color="white"), 
+		 sg.Checkbox('Use IP cache', key='pc_ip_cache', default=False, text_color='black'),
+		],
+		[sg.Text('Retry failed devices:\t', text_color="black"), 
+		 sg.InputText(0,  key='pc_retry_budget', size=(5,1) ), sg.Text('times, at end of run (0 to disable)', text_color="white"), 
+		],
+		[sg.Text('Poller sessions:\t', text_color="black"), 
+		 sg.Checkbox('Pool poller sessions', key='pc_poller_pool', default=False, text_color='black'),
+		 sg.Checkbox('Poller failover', key='pc_poller_health', default=False, text_color='black'),
+		 sg.Checkbox('Schedule by latency', key='pc_scheduler', default=False, text_color='black'),
+		 sg.InputText(PollerPool.max_sessions_per_transport,  key='pc_max_sessions_per_poller', size=(5,1) ), sg.Text('sessions per poller', text_color="white"), 
+		],
+		[sg.Text('Capture options:\t', text_color="black"), 
+		 sg.Checkbox('ProxyJump to JDM', key='pc_proxy_jump', default=False, text_color='black'),
+		 sg.Checkbox('Pipeline commands', key='pc_pipeline', default=False, text_color='black'),
+		 sg.Checkbox('Resume last run', key='pc_resume', default=False, text_color='black'),
+		 sg.Checkbox('Parallel hops', key='pc_parallel_hops', default=False, text_color='black'),
+		 sg.Checkbox('Capture store', key='pc_capture_store', default=False, text_color='black'),
+		],
 		# [sg.Checkbox('JCP', key='pc_jcp', default=True, text_color='black'),
 		#  sg.Checkbox('NMTE', key='pc_nmte', default=True, text_color='black'),
 		#  sg.Checkbox('VeloVM', key='pc_velovm', default=True, text_color='black'),
@@ -160,17 +191,31 @@ def pc_start_executor(obj, i):
 		if not COMMANDS or not DYN_VARS: return None
 
 		## Output Path :  Sample path will be  ==> "C:/NFV-PreCheck/date/time LT" 
-		CAPTURED_DATE_TIME = str(dt.datetime.today()).split(".")[0].replace(":", ".") 
-		CAPTURED_DATE = CAPTURED_DATE_TIME.split()[0]
-		CAPTURED_TIME = CAPTURED_DATE_TIME.split()[1][:5] + " LT"
 		op_folder = get_output_folder(i)
-		OUTPUT_PATH = f"{op_folder}/{CAPTURED_DATE}/{CAPTURED_TIME}"
+		OUTPUT_PATH = get_run_output_path(op_folder)
+		if i['pc_resume']:
+			LAST_RUN_PATH = get_last_run_folder(op_folder)
+			if LAST_RUN_PATH: 
+				OUTPUT_PATH = LAST_RUN_PATH
+				print_banner(f"[+] Resuming capture run {OUTPUT_PATH}")
+			else:
+				print_banner(f"[-] No earlier capture run found to resume, starting new run")
 		obj.event_update_element(pc_output_path={'value': OUTPUT_PATH})	
 		CSV_REPORT_FILE_NAME = f"{OUTPUT_PATH}/{obj.custom_var_dict['CSV_REPORT_FILE_NAME']}"
 		INTERFACE_SUMMARY_REPORT_FILE_NAME = f"{OUTPUT_PATH}/{obj.custom_var_dict['INTERFACE_SUMMARY_REPORT_FILE_NAME']}"
 		CMDS_EXEC_SUMMARY_REPORT_FILE_NAME = f"{OUTPUT_PATH}/{obj.custom_var_dict['CMDS_EXEC_SUMMARY_REPORT_FILE_NAME']}"
 		CSV_REPORT_COLS_SEQ = obj.custom_var_dict['CSV_REPORT_COLS_SEQ']
 
+		TRACER = CaptureTracer()
+
+		POOL = None
+		if i['pc_poller_pool']:
+			POOL = PollerPool(
+				server_auth_user = DYN_VARS['attuid'],
+				server_auth_psk  = DYN_VARS['key_file_1024bit'],
+				passphrase       = i['pc_passphrase'],
+			)
+
 		try:
 			# ---------- 1. Identify device ips
 			AP = ActionPollers(
@@ -180,12 +225,24 @@ def pc_start_executor(obj, i):
 				server_auth_psk  = DYN_VARS['key_file_1024bit'],
 				passphrase       = i['pc_passphrase'],
 			)
+			AP.poller_pool = POOL
+			if i['pc_poller_health']:
+				AP.poller_health = PollerHealth()
+			if i['pc_scheduler']:
+				max_sessions = int(i['pc_max_sessions_per_poller'])
+				if POOL: max_sessions = POOL.max_sessions_per_server(max_sessions)
+				AP.scheduler = PollerScheduler(i['pc_pollers_list'].splitlines(), max_inflight=max_sessions, health=AP.poller_health)
+			AP.sessions_per_poller = int(i['pc_sessions_per_poller'])
+			AP.tracer = TRACER
+			if i['pc_ip_cache']:
+				AP.ip_cache = DeviceIPCache(f"{op_folder}/{IP_CACHE_FILE}", ttl=IP_CACHE_TTL)
 			AP()
 			AP.exit()
 			AP.print_summary_report()
 		except Exception as e:
 			print_banner(f"[-] Error Accessing Poller..\n{e}")
 			print_banner("")
+			if POOL: POOL.close_all()
 			return
 
 		try:
@@ -198,7 +255,17 @@ def pc_start_executor(obj, i):
 			FCC.output_csv_report_file_col_seq = CSV_REPORT_COLS_SEQ
 			FCC.output_intf_summary_report_file = INTERFACE_SUMMARY_REPORT_FILE_NAME
 			FCC.output_cmds_exec_summary_report_file = CMDS_EXEC_SUMMARY_REPORT_FILE_NAME
-			FCC.max_connections = min(int(i['pc_max_connections']) , 50)
+			FCC.poller_pool = POOL
+			FCC.jdm_proxy_jump = i['pc_proxy_jump']
+			FCC.pipeline_commands = i['pc_pipeline']
+			FCC.parallel_hops = i['pc_parallel_hops']
+			FCC.timeout_profile = CommandTimeoutProfile(f"{op_folder}/{TIMEOUT_PROFILE_FILE}")
+			FCC.retry_budget = int(i['pc_retry_budget'])
+			FCC.max_connections = min(int(i['pc_max_connections']) , MAX_CONNECTIONS)
+			FCC.tracer = TRACER
+			FCC.metrics = CaptureMetrics(OUTPUT_PATH)
+			if i['pc_capture_store']:
+				FCC.capture_store = CaptureStore(f"{OUTPUT_PATH}/{STORE_FILE}")
 			# FCC.display_final_summary = i['pc_fc_summary']
 			# FCC.pc_jcp = i['pc_jcp']
 			# FCC.pc_nmte = i['pc_nmte']
@@ -209,7 +276,10 @@ def pc_start_executor(obj, i):
 		except Exception as e:
 			print_banner(f"[-] Error Capturing output..\n{e}")
 			print_banner("")
+			TRACER.export(f"{OUTPUT_PATH}/{TRACE_FILE}")
 			return
+		finally:
+			if POOL: POOL.close_all()
 
 		try:
 			# ----------- 4. Gen Reports
@@ -218,6 +288,8 @@ def pc_start_executor(obj, i):
 			print_banner(f"[-] Error while Generating Report..\n{e}")
 			print_banner("")
 			return
+		finally:
+			TRACER.export(f"{OUTPUT_PATH}/{TRACE_FILE}")
 
 		print_banner(f"[+] All Activity Finished")
 		print_banner("")
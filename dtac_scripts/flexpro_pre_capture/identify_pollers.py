@@ -7,15 +7,25 @@
 from netmiko import ConnectHandler
 from dataclasses import dataclass, field
 from collections import OrderedDict
-from time import sleep
+from time import sleep, time
+import re
 from nettoolkit.nettoolkit_common import print_banner as display_banner
+from nettoolkit.nettoolkit_common import Multi_Execution
 
 from .common import print_report
+from .tracing import trace_span
 from .colorprint import print_banner
 
 # ----------------------------------------------------------------------------------------
 #  Some PreDefined Static Entries
 # ----------------------------------------------------------------------------------------
+## one shell command probing a chunk of ips parallelly from poller, prints `PROBE <ip> UP <avg rtt>` / `PROBE <ip> DOWN` per ip
+## run under `sh -c` (POSIX syntax), as login shell of poller user may not be a bourne shell (ex: csh)
+PROBE_COMMAND = (
+	"sh -c 'for ip in {ips}; do (r=$(ping -c {count} -W 1 -q $ip 2>/dev/null | grep -E \"rtt|round-trip\"); "
+	"if [ -n \"$r\" ]; then echo \"PROBE $ip UP $(echo $r | cut -d/ -f5)\"; else echo \"PROBE $ip DOWN\"; fi) & done; wait'"
+)
+PROBE_RESULT = re.compile(r"^PROBE (\d+\.\d+\.\d+\.\d+|[0-9a-fA-F:]*:[0-9a-fA-F:]+) (UP|DOWN)\s*([\d.]*)")
 
 # ----------------------------------------------------------------------------------------
 #  Class that defines an object and property for action_info retrival 
@@ -36,9 +46,20 @@ class ActionPollers():
 	def __post_init__(self):	
 		display_banner(self.banner, 'blue')
 		self.conn = None
+		self.pooled_conn = False                                ## True when self.conn is a channel handed out by poller_pool
 		self.display_progress = True
 		self.devices_report = {}
 		self.servers_type = 'terminal_server'                   ## Default
+		self.poller_pool = None                                 ## PollerPool, to keep authenticated session alive for captures
+		self.sessions_per_poller = 1                            ## concurrent action_info sessions on each poller
+		self.probe_command = PROBE_COMMAND
+		self.probe_count = 2                                    ## ping count per ip in probe
+		self.probe_chunk_size = 50                              ## ips per probe command (limits command length and slow ip waits)
+		self.reachability = {}                                  ## { ip: {'reachable': bool, 'rtt': ms, 'time': epoch, 'server': poller} }
+		self.ip_cache = None                                    ## DeviceIPCache, consulted before running action_info
+		self.poller_health = None                               ## PollerHealth, unhealthy pollers devices are reassigned
+		self.scheduler = None                                   ## PollerScheduler, assigns pollers by rtt/load instead of round robin
+		self.tracer = None                                      ## CaptureTracer, poller connects, action_info and probes are timed as spans
 		if not self.server: self.server = self.servers_list[0]
 		self._set_jump_server_initial_parameters()
 
@@ -56,35 +77,190 @@ class ActionPollers():
 			'port': 22, 'passphrase': self.passphrase
 		}
 
-	def find_prompt(self):
-		if not self.conn: return "" 
-		return self.conn.find_prompt()
+	def find_prompt(self, conn=None):
+		conn = conn or self.conn
+		if not conn: return "" 
+		return conn.find_prompt()
 
-	def read_channel(self):
-		if not self.conn: return "" 
-		return self.conn.read_channel()
+	def read_channel(self, conn=None):
+		conn = conn or self.conn
+		if not conn: return "" 
+		return conn.read_channel()
 
-	def write_channel(self, command):
-		if not self.conn: return 
-		return self.conn.write_channel(command)
+	def write_channel(self, command, conn=None):
+		conn = conn or self.conn
+		if not conn: return 
+		return conn.write_channel(command)
 
-	def get_output(self, cmd):
-		if not self.conn: return "" 
-		return self.conn.send_command(cmd, expect_string=f"{self.server.split('.')[0]}  :")
+	def get_output(self, cmd, conn=None, server=None, read_timeout=10):
+		conn, server = conn or self.conn, server or self.server
+		if not conn: return "" 
+		return conn.send_command(cmd, expect_string=f"{server.split('.')[0]}  :", read_timeout=read_timeout)
 
-	# 1. Login to Jump Server and creates a connection obj
+	# 1. Login to Jump Server and creates a connection obj (a channel on pooled transport if already connected)
+	# fails over to next healthy poller if unable to connect (when poller health tracked)
 	def connect_jump_server(self):
-		self.print_message(f"[+] Connecting to {self.server}")
-		self.conn = ConnectHandler(**self.jump_server_parameters)
+		tried = []
+		while True:
+			try:
+				self.print_message(f"[+] Connecting to {self.server}")
+				if self.poller_pool and self.poller_pool.is_connected(self.server):
+					self.conn = self.timed_connect(self.server, lambda: self.poller_pool.get_connection(self.server))
+					self.pooled_conn = True
+				else:
+					self.conn = self.timed_connect(self.server, lambda: ConnectHandler(**self.jump_server_parameters))
+				break
+			except Exception as e:
+				tried.append(self.server)
+				server = self.poller_health.pick(self.server, self.servers_list, exclude=tried) if self.poller_health else None
+				if not server: raise
+				self.print_message(f"[-] Unable to connect to {self.server}, switching to {server}\n{e}")
+				self.server = server
+				self._set_jump_server_initial_parameters()
+		if self.poller_pool and not self.pooled_conn: self.poller_pool.adopt(self.server, self.conn)
 		self.print_message(f"[+] Connected to {self.server}")
 
-	# 2. Go thru all provided devices
+	# 1.5 additional session to a poller (pooled channel if pool available)
+	def open_session(self, server):
+		self.print_message(f"[+] Connecting to {server}")
+		if self.poller_pool: 
+			conn = self.timed_connect(server, lambda: self.poller_pool.get_connection(server))
+		else:
+			conn = self.timed_connect(server, lambda: ConnectHandler(**dict(self.jump_server_parameters, ip=server)))
+		self.print_message(f"[+] Connected to {server}")
+		return conn
+
+	# connects using given connect function, and records connect latency/failure to poller health
+	def timed_connect(self, server, connect):
+		start = time()
+		try:
+			with trace_span(self.tracer, 'poller connect', cat='poller', poller=server):
+				conn = connect()
+		except:
+			if self.poller_health: self.poller_health.record_failure(server, time()-start)
+			raise
+		if self.poller_health: self.poller_health.record_success(server, time()-start)
+		return conn
+
+	def close_session(self, conn):
+		if self.poller_pool: 
+			self.poller_pool.release(conn)
+			return
+		try:
+			conn.disconnect()
+		except:
+			pass
+
+	# 2. Go thru all provided devices, devices are sharded across all pollers and sessions
 	def iterrate_over_devices(self):
 		self.devices_updated = OrderedDict()
 		for device in self.devices:
-			self.devices_updated[device] = {}
-			self.devices_updated[device]['jdm_device'] = self.change_JZZ_to_JDM(device)
-			self.devices_updated[device]['device_ip'] = self.collect_ip(self.devices_updated[device]['jdm_device'])
+			jdm_device = self.change_JZZ_to_JDM(device)
+			self.devices_updated[device] = {'jdm_device': jdm_device, 'device_ip': None}
+			self.devices_report[jdm_device] = {'Hostname': jdm_device}
+		devices = self.resolve_from_cache(list(self.devices_updated.keys()))
+		if devices:
+			shards = self.get_shards(devices)
+			if len(shards) == 1:
+				self.resolve_shard(shards[0])
+			else:
+				AIS = ActionInfoShards(self, shards)
+				AIS.start()
+		if self.ip_cache: self.ip_cache.save()
+
+	# 2.0 take device ips from cache, cached ips are verified by probe (same as action_info resolved ips).
+	# returns devices to be resolved by action_info (cache misses, expired or unreachable entries)
+	def resolve_from_cache(self, devices):
+		if not self.ip_cache: return devices
+		cached = [ device for device in devices if self.ip_cache.get(device) ]
+		if not cached: return devices
+		self.print_message(f"[+] {len(cached)} device(s) ip found in cache, verifying reachability")
+		for device in cached:
+			self.devices_updated[device]['device_ip'] = self.ip_cache.get(device)['device_ip']
+		self.probe_shard(cached, self.conn, self.server)
+		misses = []
+		for device in devices:
+			jdm_device = self.devices_updated[device]['jdm_device']
+			if self.devices_report[jdm_device].get('Status') == 'Reachable': continue
+			self.devices_updated[device]['device_ip'] = None
+			misses.append(device)
+		return misses
+
+	# 2.1 split devices in shards, round robin over (poller, session) pairs. First shard uses existing connection.
+	def get_shards(self, devices):
+		servers = self.poller_health.healthy_servers(self.servers_list) if self.poller_health else self.servers_list
+		sessions = [ (server, n) for n in range(max(self.sessions_per_poller, 1)) for server in servers ]
+		if (self.server, 0) in sessions: sessions.remove((self.server, 0))
+		sessions.insert(0, (self.server, 0))
+		sessions = sessions[:max(len(devices), 1)]
+		shards = [ {'server': server, 'conn': None, 'devices': []} for server, n in sessions ]
+		shards[0]['conn'] = self.conn
+		for i, device in enumerate(devices):
+			shards[i % len(shards)]['devices'].append(device)
+		return shards
+
+	# 2.2 resolve ips of devices of a shard over shard connection, then probe all resolved ips at once
+	# if poller fails, remaining devices of shard are reassigned to a healthy poller (when poller health tracked)
+	def resolve_shard(self, shard):
+		server, conn = shard['server'], shard['conn']
+		try:
+			if not conn: conn = self.open_session(server)
+		except Exception as e:
+			self.print_message(f"[-] Unable to connect to {server}, devices unresolved: {shard['devices']}\n{e}")
+			self.reassign_shard(shard, shard['devices'])
+			return
+		for i, device in enumerate(shard['devices']):
+			try:
+				self.devices_updated[device]['device_ip'] = self.collect_ip(self.devices_updated[device]['jdm_device'], conn, server)
+			except Exception as e:
+				self.print_message(f"[-] Session to {server} failed\n{e}")
+				if self.poller_health: self.poller_health.record_failure(server)
+				self.probe_shard(shard['devices'][:i], conn, server)
+				if conn is not self.conn: self.close_session(conn)
+				self.reassign_shard(shard, shard['devices'][i:])
+				return
+		self.probe_shard(shard['devices'], conn, server)
+		if conn is not self.conn: self.close_session(conn)
+
+	# 2.2.1 resolve devices over another healthy poller, devices remain unresolved if none available.
+	def reassign_shard(self, shard, devices):
+		tried = shard.get('tried', []) + [shard['server']]
+		server = self.poller_health.pick(shard['server'], self.servers_list, exclude=tried) if self.poller_health else None
+		if not server:
+			for device in devices:
+				self.devices_report[self.devices_updated[device]['jdm_device']]['Status'] = 'Poller unreachable'
+			return
+		self.print_message(f"[+] Reassigning {len(devices)} device(s) from {shard['server']} to {server}")
+		self.resolve_shard({'server': server, 'conn': None, 'devices': devices, 'tried': tried})
+
+	# 2.3 update reachability status of resolved devices of a shard, probed in chunks of probe_chunk_size ips.
+	# only ips probed DOWN are unreachable, ips missing in probe output are pinged individually.
+	# reachable device ips are cached, unreachable ones are removed from cache.
+	def probe_shard(self, devices, conn, server):
+		ips = [ self.devices_updated[device]['device_ip'] for device in devices if self.devices_updated[device]['device_ip'] ]
+		if not ips: return
+		reachability = self.probe_reachability(ips, conn, server)
+		for device in devices:
+			jdm_device, device_ip = self.devices_updated[device]['jdm_device'], self.devices_updated[device]['device_ip']
+			if not device_ip: continue
+			reachable = reachability[device_ip]['reachable'] if device_ip in reachability else self.is_ip_pinging(jdm_device, device_ip, conn)
+			if reachable:
+				self.devices_report[jdm_device]['Status'] = 'Reachable'
+				self.print_message(f"[+] {jdm_device} OK")
+				if self.ip_cache: self.ip_cache.update(device, **self.devices_updated[device])
+			elif reachable is None:
+				self.print_message(f"[-] {jdm_device} reachability unknown, {device_ip}")
+			else:
+				self.devices_report[jdm_device]['Status'] = 'Unreachable'
+				self.devices_updated[device]['device_ip'] = None
+				self.print_message( f"[-] Device Unreachable: {jdm_device}, {device_ip}")
+				if self.ip_cache: self.ip_cache.remove(device)
+
+	# 2.4 removes cached ip of device (ex: device capture failed to connect to it), saved with next cache save.
+	def forget_device_ip(self, jdm_device):
+		if not self.ip_cache: return
+		for device, v in self.devices_updated.items():
+			if v['jdm_device'] == jdm_device: self.ip_cache.remove(device)
 
 	# 3. update device name from JZZ to JDM
 	@staticmethod
@@ -94,43 +270,65 @@ class ActionPollers():
 		return device
 
 	# 4. collects ip address from action_info commmand output
-	def collect_ip(self, device):
+	def collect_ip(self, device, conn=None, server=None):
 		self.devices_report[device] = {'Hostname': device}
-		result_line = self.get_output(f"action_info {device}\n")
+		with trace_span(self.tracer, 'action_info', cat='action_info', device=device, poller=server or self.server):
+			result_line = self.get_output(f"action_info {device}\n", conn, server)
 		for line in result_line.splitlines():
 			if not line.strip(): continue
 			spl = line.split(",")
 			if len(spl) > 2:
-				device_ip = spl[2].strip()
-				if not self.is_ip_pinging(device, device_ip):  
-					self.devices_report[device]['Status'] = 'Unreachable'
-					return None
-				self.devices_report[device]['Status'] = 'Reachable'
-				self.print_message(f"[+] {device} OK")
-				return device_ip
+				self.devices_report[device]['Status'] = 'Resolved'
+				return spl[2].strip()
 		self.devices_report[device]['Status'] = 'action_info failed'
 		self.print_message( f"[-] Cannot identify Device {device}")
 		return None
 
-	# 4.5 checks if device ip is reachable or not, return False for 100% packet loss.
-	def is_ip_pinging(self, device, device_ip):
+	# 4.5 probes ips from poller, one command per chunk of probe_chunk_size ips (ips of a chunk are probed parallelly).
+	# returns dictionary of probe result for each ip.
+	def probe_reachability(self, ips, conn=None, server=None):
+		result = {}
+		size = max(self.probe_chunk_size, 1)
+		for i in range(0, len(ips), size):
+			result.update(self.probe_chunk(ips[i:i+size], conn, server))
+		return result
+
+	# 4.5.1 probes a chunk of ips in one shell command
+	def probe_chunk(self, ips, conn=None, server=None):
+		command = self.probe_command.format(ips=" ".join(ips), count=self.probe_count)
+		with trace_span(self.tracer, 'probe', cat='reachability', poller=server or self.server, ips=len(ips)):
+			output = self.get_output(command, conn, server, read_timeout=self.probe_count+20)
+		probe_time = time()
+		result = {}
+		for line in output.splitlines():
+			m = PROBE_RESULT.match(line.strip())
+			if not m: continue
+			ip, state, rtt = m.groups()
+			result[ip] = {'reachable': state == 'UP', 'rtt': float(rtt) if rtt else None, 'time': probe_time, 'server': server or self.server}
+			if self.scheduler: self.scheduler.record_rtt(server or self.server, ip, result[ip]['rtt'])
+		self.reachability.update(result)
+		return result
+
+	# 4.6 checks if device ip is reachable or not, return False for 100% packet loss, None if ping result not found.
+	# (single ip, for ips missing in probe_reachability output)
+	def is_ip_pinging(self, device, device_ip, conn=None):
 		if not device_ip: return False
-		self.write_channel(f"ping {device_ip}\r\n")
+		self.write_channel(f"ping {device_ip}\r\n", conn)
 		sleep(4)                                                  ## Sleep Seconds
-		self.write_channel("\003")
+		self.write_channel("\003", conn)
 		sleep(1)
-		result_line = self.read_channel()
+		result_line = self.read_channel(conn)
 		for line in result_line.splitlines():
 			if not "packet loss" in line: continue
-			if "100% packet loss" in line:
-				self.print_message( f"[-] Device Unreachable: {device}, {device_ip}")
-				return False
-			return True
-		self.print_message( f"[-] Device Unreachable: {device}, {device_ip}")
-		return False
+			return "100% packet loss" not in line
+		return None
 
 	## Exit out from Poller
 	def exit(self, exit_delay=1, spl_char=None, display_change=True):
+		if self.poller_pool:
+			self.print_message(f"[+] Keeping {self.server} session alive in pool")
+			if self.pooled_conn: self.poller_pool.release(self.conn)
+			return
 		self.print_message(f"[+] Exiting out")
 		if display_change: current_prompt = self.find_prompt()
 		self.write_channel("exit\n")
@@ -151,24 +349,48 @@ class ActionPollers():
 		print_banner(msg, color)
 
 	# object instance property that returns all devices, ip, and its pollers in list of dict.
-	# Pollers are chose round robin base.
+	# Pollers are chose round robin base (or by rtt/load when scheduler is set).
 	# multiple pollers used to share load between provided pollers during multithred execution
+	# pollers marked unhealthy (poller health) are left out.
 	@property
 	def dict_info(self):
+		if self.scheduler: return self.scheduled_dict_info()
 		i = 0
 		list_of_devices = []
+		servers_list = self.poller_health.healthy_servers(self.servers_list) if self.poller_health else []
+		servers_list = servers_list or self.servers_list
 		for v in self.devices_updated.values():
-			if i >= len(self.servers_list): i = 0
+			if i >= len(servers_list): i = 0
 			if v['device_ip']:
-				list_of_devices.append({'server': self.servers_list[i], 'device': v['jdm_device'], 'device_ip': v['device_ip'] })
+				list_of_devices.append({'server': servers_list[i], 'device': v['jdm_device'], 'device_ip': v['device_ip'] })
 				i+=1
 		return list_of_devices
 
+	# devices assigned to pollers by scheduler plan (rtt and load balanced)
+	def scheduled_dict_info(self):
+		resolved = [ v for v in self.devices_updated.values() if v['device_ip'] ]
+		assignment = self.scheduler.plan([ v['device_ip'] for v in resolved ])
+		return [ {'server': assignment[v['device_ip']], 'device': v['jdm_device'], 'device_ip': v['device_ip'] } for v in resolved ]
+
 	def print_summary_report(self):
 		display_banner('Summary', 'magenta')
 		print_report(self.devices_report)
 
 
+# ----------------------------------------------------------------------------------------
+#  Multithreaded action_info executions, one thread per shard (poller session)
+# ----------------------------------------------------------------------------------------
+class ActionInfoShards(Multi_Execution):
+
+	def __init__(self, AP, shards):
+		super().__init__(shards)
+		self.AP = AP
+		self.max_connections = len(shards)
+
+	def execute(self, shard):
+		self.AP.resolve_shard(shard)
+
+
 # ----------------------------------------------------------------------------------------
 #  main
 # ----------------------------------------------------------------------------------------
@@ -0,0 +1,74 @@
+""" Device to IP resolution cache.
+Keeps hostname, JDM name and management ip of devices on disk, to skip `action_info` on re-runs.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from pathlib import Path
+from time import time
+import threading
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+DEFAULT_TTL = 3*24*60*60                          ## 3 days, in seconds
+
+# ----------------------------------------------------------------------------------------
+#  Device IP cache class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class DeviceIPCache():
+	cache_file: str                               # json file to store cache
+	ttl: int = DEFAULT_TTL                        # seconds, entries older than this are expired
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.entries = self.load()
+
+	# read cache entries from file, empty on missing/corrupt file
+	def load(self):
+		try:
+			with open(self.cache_file, 'r') as f:
+				return json.load(f)
+		except FileNotFoundError:
+			return {}
+		except Exception as e:
+			print_banner(f"[-] IP cache read error, ignoring cache\n{e}")
+			return {}
+
+	# write cache entries to file (via temporary file, to avoid partial writes)
+	def save(self):
+		Path(self.cache_file).parent.mkdir(parents=True, exist_ok=True)
+		tmp_file = f"{self.cache_file}.tmp"
+		with self.lock:
+			with open(tmp_file, 'w') as f:
+				json.dump(self.entries, f, indent=2)
+			os.replace(tmp_file, self.cache_file)
+
+	# returns cached entry {'jdm_device', 'device_ip', 'time'} for device, None if missing or expired
+	def get(self, device):
+		entry = self.entries.get(device)
+		if not entry: return None
+		if time() - entry['time'] > self.ttl: return None
+		return entry
+
+	def update(self, device, jdm_device, device_ip):
+		with self.lock:
+			self.entries[device] = {'jdm_device': jdm_device, 'device_ip': device_ip, 'time': time()}
+
+	def remove(self, device):
+		with self.lock:
+			self.entries.pop(device, None)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
@@ -0,0 +1,138 @@
+""" Poller health tracking.
+Keeps connect latency and error rate of each poller, with a circuit breaker per poller.
+Devices of a poller whose circuit is open are reassigned to healthy pollers.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from collections import deque
+from time import time
+import threading
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+CLOSED = 'closed'                                 ## healthy, poller in use
+OPEN = 'open'                                     ## unhealthy, poller not used until open_timeout expires
+HALF_OPEN = 'half-open'                           ## trial, a single connection allowed to verify poller recovered
+
+# ----------------------------------------------------------------------------------------
+#  Poller Health class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class PollerHealth():
+	failure_threshold: int = 3                    # consecutive failures opening the circuit
+	error_rate_threshold: float = 0.5             # error rate (of recent window) opening the circuit
+	window: int = 20                              # recent connect attempts considered for error rate/latency
+	min_samples: int = 4                          # attempts required before error rate is considered
+	open_timeout: int = 60                        # seconds, circuit stays open before a trial connection
+	slow_connect: float = 30                      # seconds, a connect slower than this is counted as failure
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.pollers = {}                         # { server: {'state', 'results': deque[(ok, latency)], 'consecutive_failures', 'opened_at', 'trial'} }
+		self.display_progress = True
+
+	def _poller(self, server):
+		if server not in self.pollers:
+			self.pollers[server] = {'state': CLOSED, 'results': deque(maxlen=self.window), 'consecutive_failures': 0, 'opened_at': 0, 'trial': False}
+		return self.pollers[server]
+
+	def _open(self, server, p):
+		if p['state'] != OPEN: self.print_message(f"[-] Poller {server} marked unhealthy, devices will be reassigned")
+		p['state'], p['opened_at'], p['trial'] = OPEN, time(), False
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ updates ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def record_success(self, server, latency):
+		if latency > self.slow_connect:
+			return self.record_failure(server, latency)
+		with self.lock:
+			p = self._poller(server)
+			if p['state'] != CLOSED:
+				self.print_message(f"[+] Poller {server} recovered")
+				p['results'].clear()                  ## error rate restarts after recovery
+			p['results'].append((True, latency))
+			p['consecutive_failures'] = 0
+			p['state'], p['trial'] = CLOSED, False
+
+	def record_failure(self, server, latency=None):
+		with self.lock:
+			p = self._poller(server)
+			p['results'].append((False, latency))
+			p['consecutive_failures'] += 1
+			if (p['state'] == HALF_OPEN
+				or p['consecutive_failures'] >= self.failure_threshold
+				or (len(p['results']) >= self.min_samples and self._error_rate(p) >= self.error_rate_threshold)
+				):
+				self._open(server, p)
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ queries ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	@staticmethod
+	def _error_rate(p):
+		if not p['results']: return 0.0
+		return sum(1 for ok, _ in p['results'] if not ok) / len(p['results'])
+
+	def error_rate(self, server):
+		with self.lock:
+			return self._error_rate(self._poller(server))
+
+	# average connect latency of recent successful connects, None if never connected
+	def latency(self, server):
+		with self.lock:
+			latencies = [ latency for ok, latency in self._poller(server)['results'] if ok ]
+		return sum(latencies)/len(latencies) if latencies else None
+
+	def state(self, server):
+		with self.lock:
+			return self._poller(server)['state']
+
+	# True if a connection to server can be attempted. open circuit turns half-open after open_timeout,
+	# and allows a single trial connection.
+	def allow(self, server):
+		with self.lock:
+			p = self._poller(server)
+			if p['state'] == OPEN and time() - p['opened_at'] >= self.open_timeout:
+				p['state'], p['trial'] = HALF_OPEN, False
+			if p['state'] == CLOSED: return True
+			if p['state'] == HALF_OPEN and not p['trial']:
+				p['trial'] = True
+				return True
+			return False
+
+	# pollers from given list, whose circuit is not open
+	def healthy_servers(self, servers):
+		with self.lock:
+			return [ server for server in servers if self._poller(server)['state'] != OPEN ]
+
+	# returns server to be used instead of `server`: itself if allowed, else healthiest allowed alternative (None if none)
+	def pick(self, server, servers, exclude=()):
+		if server not in exclude and self.allow(server): return server
+		candidates = sorted(
+			[ s for s in servers if s != server and s not in exclude ],
+			key=lambda s: (self.error_rate(s), self.latency(s) or 0),
+		)
+		for candidate in candidates:
+			if self.allow(candidate): return candidate
+		return None
+
+	def report(self):
+		return { server: {'state': self.state(server), 'error_rate': round(self.error_rate(server), 2), 'latency': self.latency(server)}
+			for server in list(self.pollers) }
+
+	# Local print function controlled by display_progress
+	def print_message(self, msg):
+		if not self.display_progress: return
+		print_banner(msg)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
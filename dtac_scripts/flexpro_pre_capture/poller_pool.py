@@ -0,0 +1,172 @@
+""" Poller Connection Pool.
+Keeps one authenticated SSH transport per poller and hands out a separate shell channel
+on it to each device worker, instead of a fresh SSH login to poller per device.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from netmiko import ConnectHandler
+from netmiko.channel import SSHChannel
+from collections import OrderedDict
+import threading
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+SERVER_TYPE = 'terminal_server'
+
+# ----------------------------------------------------------------------------------------
+#  Poller Pool class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class PollerPool():
+	server_auth_user: str                       # poller user name to login (att uid)
+	server_auth_pass: str=''                    # poller auth password (RSA Token)
+	server_auth_psk : str=''                    # poller auth via PSK (if shared already, Preffered over auth_pass)
+	passphrase: str=''
+	max_sessions_per_transport: int=8           # channels per transport, keep below pollers sshd `MaxSessions` (default 10)
+	keepalive: int=0                            # seconds, ssh keepalive interval on transports (0 to disable)
+
+	def __post_init__(self):
+		self.transports = OrderedDict()         # { server: [ {'conn': base connection, 'sessions': n}, ] }
+		self.channels = {}                      # { id(handed out connection): transport dict }
+		self.lock = threading.Lock()
+		self.server_locks = {}
+		self.display_progress = True
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ internals ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def _jump_server_parameters(self, server):
+		return {
+			'ip': server, 'device_type': SERVER_TYPE,
+			'username': self.server_auth_user, 'password': self.server_auth_pass, 'key_file': self.server_auth_psk,
+			'port': 22, 'passphrase': self.passphrase,
+		}
+
+	def _server_lock(self, server):
+		with self.lock:
+			if server not in self.server_locks: self.server_locks[server] = threading.Lock()
+			return self.server_locks[server]
+
+	@staticmethod
+	def _is_active(transport):
+		try:
+			return transport['conn'].remote_conn_pre.get_transport().is_active()
+		except:
+			return False
+
+	# returns a transport of server having a free session slot, None if not available
+	def _free_transport(self, server):
+		with self.lock:
+			self.transports[server] = [ t for t in self.transports.get(server, []) if self._is_active(t) ]
+			for t in self.transports[server]:
+				if t['sessions'] < self.max_sessions_per_transport:
+					t['sessions'] += 1
+					return t
+		return None
+
+	# new authenticated transport to server, its own shell channel counts as first session
+	def _new_transport(self, server):
+		self.print_message(f"[+] Pool: Connecting to {server}")
+		conn = ConnectHandler(**self._jump_server_parameters(server))
+		if self.keepalive: conn.remote_conn_pre.get_transport().set_keepalive(self.keepalive)
+		self.print_message(f"[+] Pool: Connected to {server}")
+		return self.adopt(server, conn, sessions=2)
+
+	# opens new shell channel on existing transport, and prepares a netmiko connection object over it
+	def _open_channel(self, server, transport):
+		base = transport['conn']
+		conn = ConnectHandler(**self._jump_server_parameters(server), auto_connect=False)
+		conn.remote_conn_pre = base.remote_conn_pre
+		conn.remote_conn = base.remote_conn_pre.invoke_shell(term="vt100", width=511, height=1000)
+		conn.remote_conn.settimeout(conn.blocking_timeout)
+		conn.channel = SSHChannel(conn=conn.remote_conn, encoding=conn.encoding)
+		try:
+			conn.write_channel(conn.RETURN)
+			conn.session_preparation()
+		except:
+			conn.remote_conn.close()                           ## never disconnect(), it closes shared transport
+			raise
+		with self.lock:
+			self.channels[id(conn)] = transport
+		return conn
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ Connections ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	# device sessions ceiling per poller (for scheduler), kept within channels of a transport
+	def max_sessions_per_server(self, sessions=None):
+		return min(sessions or self.max_sessions_per_transport, self.max_sessions_per_transport)
+
+	# register an already authenticated connection (ex: ActionPollers session) as a transport of server
+	def adopt(self, server, conn, sessions=1):
+		transport = {'conn': conn, 'sessions': sessions}
+		with self.lock:
+			self.transports.setdefault(server, []).append(transport)
+		return transport
+
+	# get a netmiko connection on its own channel to given server
+	def get_connection(self, server):
+		with self._server_lock(server):
+			transport = self._free_transport(server)
+			if not transport:
+				transport = self._new_transport(server)
+		try:
+			return self._open_channel(server, transport)
+		except:
+			with self.lock: transport['sessions'] -= 1
+			raise
+
+	# True if an active transport to server is available in pool
+	def is_connected(self, server):
+		with self.lock:
+			return any(self._is_active(t) for t in self.transports.get(server, []))
+
+	# connects transports to given servers in advance, returns list of servers failed to connect
+	def warm_up(self, servers):
+		failed = []
+		for server in servers:
+			if self.is_connected(server): continue
+			try:
+				self.release(self.get_connection(server))
+			except Exception as e:
+				self.print_message(f"[-] Pool: Unable to connect to {server}\n{e}")
+				failed.append(server)
+		return failed
+
+	# close channel of handed out connection, transport stays open for next worker
+	def release(self, conn):
+		with self.lock:
+			transport = self.channels.pop(id(conn), None)
+			if transport: transport['sessions'] -= 1
+		try:
+			conn.remote_conn.close()
+		except:
+			pass
+
+	# close all transports
+	def close_all(self):
+		with self.lock:
+			transports = [ t for server_transports in self.transports.values() for t in server_transports ]
+			self.transports.clear()
+			self.channels.clear()
+		for t in transports:
+			try:
+				t['conn'].disconnect()
+			except:
+				pass
+
+	# Local print function controlled by display_progress
+	def print_message(self, msg):
+		if not self.display_progress: return
+		print_banner(msg)
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
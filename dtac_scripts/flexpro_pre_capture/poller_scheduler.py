@@ -0,0 +1,120 @@
+""" Latency and load aware poller scheduler.
+Assigns each device to a poller by measured round trip time (poller to device) and
+sessions currently in flight on poller, with a concurrency ceiling per poller.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass, field
+from collections import defaultdict
+from time import monotonic
+import threading
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+DEFAULT_RTT = 50.0                                ## ms, assumed round trip time when nothing measured
+ACQUIRE_TIMEOUT = 120                             ## seconds, a device waits for a free slot before falling back to its planned poller
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# region of an ip, ipv4 /16 network (ex: 10.20.0.0 for 10.20.30.40), ipv6 first four hextets
+def ip_region(ip):
+	if ':' in ip: return ":".join(ip.split(":")[:4])
+	return ".".join(ip.split(".")[:2])
+
+# ----------------------------------------------------------------------------------------
+#  Poller Scheduler class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class PollerScheduler():
+	servers: list = field(default_factory=list)   # available pollers
+	max_inflight: int = 8                         # concurrency ceiling, device sessions at a time per poller (as poller pool channels per transport)
+	health: object = None                         # PollerHealth, unhealthy pollers are not scheduled
+
+	def __post_init__(self):
+		self.cv = threading.Condition()
+		self.inflight = defaultdict(int)          # { server: sessions in flight }
+		self.rtts = {}                            # { (server, ip): rtt ms }
+		self.region_rtts = defaultdict(list)      # { (server, region): [rtt ms, ] }
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ measurements ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def record_rtt(self, server, ip, rtt):
+		if rtt is None: return
+		with self.cv:
+			self.rtts[(server, ip)] = rtt
+			self.region_rtts[(server, ip_region(ip))].append(rtt)
+
+	# round trip time estimate from server to ip: measured for ip, else average of its region, else average of server.
+	def rtt(self, server, ip):
+		if (server, ip) in self.rtts: return self.rtts[(server, ip)]
+		region_rtts = self.region_rtts.get((server, ip_region(ip)))
+		if region_rtts: return sum(region_rtts)/len(region_rtts)
+		server_rtts = [ rtt for (s, _), rtt in self.rtts.items() if s == server ]
+		if server_rtts: return sum(server_rtts)/len(server_rtts)
+		return DEFAULT_RTT
+
+	## ~~~~~~~~~~~~~~~~~~~~~~~~ scheduling ~~~~~~~~~~~~~~~~~~~~~~~~ ##
+
+	def _candidates(self, exclude=()):
+		servers = [ server for server in self.servers if server not in exclude ]
+		if self.health: servers = self.health.healthy_servers(servers)
+		return servers
+
+	# lower is better. rtt weighted by load, so a near but busy poller loses to a farther idle one.
+	def _score(self, server, ip, load):
+		return (self.rtt(server, ip) or DEFAULT_RTT) * (1 + load)
+
+	# initial assignment of device ips to pollers, by rtt and devices already planned on each poller.
+	# returns { ip: server }
+	def plan(self, ips):
+		planned = defaultdict(int)
+		assignment = {}
+		servers = self._candidates() or self.servers
+		with self.cv:
+			for ip in ips:
+				server = min(servers, key=lambda s: self._score(s, ip, planned[s]))
+				assignment[ip] = server
+				planned[server] += 1
+		return assignment
+
+	# reserves a session slot for device ip, on its planned (preferred) poller if free, else on best free poller.
+	# waits while all pollers are at ceiling, up to timeout; then slot is taken on planned poller (or best one) over ceiling.
+	# returns server, None if no poller is available.
+	def acquire(self, ip, preferred=None, exclude=(), timeout=ACQUIRE_TIMEOUT):
+		deadline = monotonic() + timeout
+		with self.cv:
+			while True:
+				servers = self._candidates(exclude)
+				if not servers: return None
+				free = [ server for server in servers if self.inflight[server] < self.max_inflight ]
+				remaining = deadline - monotonic()
+				if preferred in free or (remaining <= 0 and preferred in servers):
+					server = preferred
+				elif free or remaining <= 0:
+					server = min(free or servers, key=lambda s: self._score(s, ip, self.inflight[s]))
+				else:
+					self.cv.wait(remaining)
+					continue
+				self.inflight[server] += 1
+				return server
+
+	def release(self, server):
+		with self.cv:
+			if self.inflight[server] > 0: self.inflight[server] -= 1
+			self.cv.notify_all()
+
+	def report(self):
+		with self.cv:
+			return { server: {'inflight': self.inflight[server]} for server in self.servers }
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
@@ -10,26 +10,20 @@
 #  Some common Functions
 # ----------------------------------------------------------------------------------------
 
-def html_file_header(device, file):
-	s = f"""
+def html_header_text(device):
+	return f"""
 <!DOCTYPE html>
 <html><body>
 <h1>{device}</h1>
 """
-	with open(file, 'w') as f:
-		f.write(s)
 
-def html_file_h2_header(item, file):
-	s = f"""
+def html_h2_header_text(item):
+	return f"""
 <h2>{item}</h2>
 """
-	with open(file, 'a') as f:
-		f.write(s)
-
 
-# writes provided command and its output to given file (append mode)
-def cmd_output_to_html_file(cmd, output, file):
-	s = f"""
+def cmd_output_html_text(cmd, output):
+	return f"""
 <details>
 <summary>{cmd}</summary>
 <pre>
@@ -37,16 +31,30 @@ def cmd_output_to_html_file(cmd, output, file):
 </pre>
 </details>
 """
+
+def html_footer_text():
+	return f"""
+</body></html>
+"""
+
+def html_file_header(device, file):
+	with open(file, 'w') as f:
+		f.write(html_header_text(device))
+
+def html_file_h2_header(item, file):
 	with open(file, 'a') as f:
-		f.write(s)
+		f.write(html_h2_header_text(item))
+
+
+# writes provided command and its output to given file (append mode)
+def cmd_output_to_html_file(cmd, output, file):
+	with open(file, 'a') as f:
+		f.write(cmd_output_html_text(cmd, output))
 
 
 def html_file_footer(file):
-	s = f"""
-</body></html>
-"""
 	with open(file, 'a') as f:
-		f.write(s)
+		f.write(html_footer_text())
 
 
 # ----------------------------------------------------------------------------------------
@@ -0,0 +1,78 @@
+""" Per command read timeout profiles.
+Learns command execution durations (per hop) from previous runs and suggests read timeout for next execution.
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from pathlib import Path
+import threading
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Command Timeout Profile class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CommandTimeoutProfile():
+	profile_file: str                             # json file to store measured durations
+	min_timeout: float = 5                        # seconds, lower bound for fast commands
+	max_timeout: float = 180                      # seconds, upper bound for slow commands
+	factor: float = 2.0                           # timeout = slowest recent duration * factor + margin
+	margin: float = 2.0                           # seconds
+	history: int = 20                             # durations kept per command
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.durations = self.load()              # { "hop | command": [durations, ] }
+
+	@staticmethod
+	def _key(hop, cmd):
+		return f"{hop} | {cmd}"
+
+	# read profiles from file, empty on missing/corrupt file
+	def load(self):
+		try:
+			with open(self.profile_file, 'r') as f:
+				return json.load(f)
+		except FileNotFoundError:
+			return {}
+		except Exception as e:
+			print_banner(f"[-] Timeout profile read error, ignoring profile\n{e}")
+			return {}
+
+	# write profiles to file (via temporary file, to avoid partial writes)
+	def save(self):
+		Path(self.profile_file).parent.mkdir(parents=True, exist_ok=True)
+		tmp_file = f"{self.profile_file}.tmp"
+		with self.lock:
+			with open(tmp_file, 'w') as f:
+				json.dump(self.durations, f, indent=2)
+			os.replace(tmp_file, self.profile_file)
+
+	# suggested read timeout for command on hop, None if command never measured
+	def timeout_for(self, hop, cmd):
+		durations = self.durations.get(self._key(hop, cmd))
+		if not durations: return None
+		timeout = max(durations) * self.factor + self.margin
+		return round(min(max(timeout, self.min_timeout), self.max_timeout), 1)
+
+	# record measured duration of a command.
+	# for a timed out execution duration is only a lower bound, hence recorded with factor to grow next timeout.
+	def record(self, hop, cmd, duration, timed_out=False):
+		if timed_out: duration = duration * self.factor
+		key = self._key(hop, cmd)
+		with self.lock:
+			durations = self.durations.setdefault(key, [])
+			durations.append(round(duration, 2))
+			del durations[:-self.history]
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------
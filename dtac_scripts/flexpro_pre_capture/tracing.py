@@ -0,0 +1,102 @@
+""" Capture tracing.
+Records timed spans of capture stages (poller connect, action_info, ping, hop logins, commands, validators, reports),
+tagged with device, poller and hop. Spans are exported as Chrome trace json (open in chrome://tracing or ui.perfetto.dev).
+"""
+
+# ----------------------------------------------------------------------------------------
+#  Imports
+# ----------------------------------------------------------------------------------------
+from dataclasses import dataclass
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from time import perf_counter, time
+import threading
+import json
+import os
+
+from .colorprint import print_banner
+
+# ----------------------------------------------------------------------------------------
+#  Some PreDefined Static Entries
+# ----------------------------------------------------------------------------------------
+TRACE_FILE = 'capture-trace.json'
+MAX_EVENTS = 500000                               ## spans beyond are counted as dropped, to bound memory on huge runs
+
+# ----------------------------------------------------------------------------------------
+#  Some common Functions
+# ----------------------------------------------------------------------------------------
+
+# span of `tracer` if tracing enabled, else a no-op context ( yields tags dict in both cases )
+def trace_span(tracer, name, cat='capture', **tags):
+	if not tracer: return nullcontext(tags)
+	return tracer.span(name, cat=cat, **tags)
+
+# ----------------------------------------------------------------------------------------
+#  Capture Tracer class
+# ----------------------------------------------------------------------------------------
+@dataclass
+class CaptureTracer():
+	max_events: int = MAX_EVENTS
+
+	def __post_init__(self):
+		self.lock = threading.Lock()
+		self.events = []                          ## chrome trace complete events ( ph: X )
+		self.threads = {}                         ## { thread ident: tid }, small tids for trace viewers
+		self.dropped = 0
+		self.origin = perf_counter()
+		self.start_time = time()
+
+	# times enclosed block, yields tags dict ( results can be added to it, ex: tags['status'] = 'Failed' )
+	@contextmanager
+	def span(self, name, cat='capture', **tags):
+		start = perf_counter()
+		try:
+			yield tags
+		except BaseException as e:
+			tags['error'] = repr(e)
+			raise
+		finally:
+			self.add(name, cat, start, perf_counter(), tags)
+
+	def add(self, name, cat, start, end, tags):
+		thread = threading.current_thread()
+		with self.lock:
+			if len(self.events) >= self.max_events:
+				self.dropped += 1
+				return
+			if thread.ident not in self.threads:
+				self.threads[thread.ident] = len(self.threads) + 1
+				self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': self.threads[thread.ident], 'args': {'name': thread.name}})
+			self.events.append({
+				'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': self.threads[thread.ident],
+				'ts': round((start - self.origin) * 1e6), 'dur': round((end - start) * 1e6),
+				'args': { k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in tags.items() if v is not None },
+			})
+
+	# span timed by caller in epoch times (as time()), converted to tracer clock
+	def add_timed(self, name, cat, start_time, end_time, tags):
+		start = self.origin + (start_time - self.start_time)
+		self.add(name, cat, start, start + (end_time - start_time), tags)
+
+	# writes chrome trace json to file
+	def export(self, file):
+		with self.lock:
+			trace = {
+				'traceEvents': list(self.events),
+				'displayTimeUnit': 'ms',
+				'otherData': {'start_time': self.start_time, 'dropped_spans': self.dropped},
+			}
+		try:
+			Path(file).parent.mkdir(parents=True, exist_ok=True)
+			with open(file, 'w') as f:
+				json.dump(trace, f)
+			print_banner(f"[+] Capture trace written to {file}")
+		except Exception as e:
+			print_banner(f"[-] Writing capture trace failed\n{e}")
+
+# ----------------------------------------------------------------------------------------
+#  main
+# ----------------------------------------------------------------------------------------
+if __name__ == '__main__':
+	pass
+# ----------------------------------------------------------------------------------------